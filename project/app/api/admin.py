@@ -0,0 +1,89 @@
+import secrets
+from typing import Annotated, Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, Path, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from app.api import crud
+from app.api.custom_exceptions import (
+    AdminDisabledException,
+    AdminKeyInvalidException,
+    ProfileNotFoundException,
+    ProfilingDisabledException,
+)
+from app.config import Settings, get_settings
+from app.profiling import render_profile
+
+router = APIRouter()
+
+
+def require_admin(
+    settings: Annotated[Settings, Depends(get_settings)],
+    x_admin_key: Annotated[Optional[str], Header()] = None,
+) -> None:
+    """
+    Reject requests without the configured admin key in the `X-Admin-Key` header. The admin
+    endpoints fail closed: they are disabled until an admin key is configured.
+
+    Raises
+    ------
+    AdminDisabledException
+        If no admin key is configured.
+    AdminKeyInvalidException
+        If the request does not carry the admin key.
+    """
+    if not settings.admin_api_key:
+        raise AdminDisabledException
+    if not (x_admin_key and secrets.compare_digest(x_admin_key, settings.admin_api_key)):
+        raise AdminKeyInvalidException
+
+
+@router.get("/profiles/{id}/", dependencies=[Depends(require_admin)])
+async def read_summary_profile(
+    id: Annotated[int, Path(title="The ID of the profiled text summary", gt=0)],
+    settings: Annotated[Settings, Depends(get_settings)],
+    format: Annotated[Literal["pstats", "text"], Query()] = "pstats",
+    sort: Annotated[Literal["cumulative", "tottime", "ncalls"], Query()] = "cumulative",
+    limit: Annotated[int, Query(gt=0, le=1000)] = 50,
+) -> Response:
+    """
+    Download the profile of a summarization job that was run with the `X-Profile` header.
+
+    Parameters
+    ----------
+    id : int
+        The ID of the profiled text summary; must be greater than 0.
+    settings : Settings
+        The application settings.
+    format : Literal["pstats", "text"]
+        'pstats' downloads the profile file, e.g., for `python -m pstats` or snakeviz; 'text'
+        returns the top functions as a plain text report.
+    sort : Literal["cumulative", "tottime", "ncalls"]
+        The sort key of the functions in the text report.
+    limit : int
+        The number of functions in the text report.
+
+    Returns
+    -------
+    Response
+        The profile file or its text report.
+
+    Raises
+    ------
+    ProfilingDisabledException
+        If profiling is disabled in this environment.
+    ProfileNotFoundException
+        If the summary was not profiled or its job has not completed yet.
+    """
+    if not settings.profiling_enabled:
+        raise ProfilingDisabledException
+    profile = await crud.get_profile(id)
+    if not profile:
+        raise ProfileNotFoundException
+    if format == "text":
+        return PlainTextResponse(render_profile(profile, sort, limit))
+    return Response(
+        content=profile,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="summary-{id}.prof"'},
+    )
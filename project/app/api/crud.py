@@ -1,19 +1,66 @@
-from typing import Dict, List, Union
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
 
-from app.models.pydantic_model import SummaryPayloadSchema, SummaryUpdatePayloadSchema
-from app.models.tortoise_model import TextSummary
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
+from app.db import get_read_connection, has_replica
+from app.models.pydantic_model import (
+    DeliveryStatus,
+    Language,
+    SummarizationMethod,
+    SummaryPayloadSchema,
+    SummaryStatus,
+    SummaryUpdatePayloadSchema,
+)
+from app.models.tortoise_model import (
+    ContentFingerprint,
+    SourceDocument,
+    SummaryDiagnostics,
+    SummaryDiagnosticsSchema,
+    SummaryProfile,
+    TextSummary,
+    TextSummarySchema,
+    WebhookDelivery,
+)
 
-async def post(payload: SummaryPayloadSchema) -> int:
+# Only select the columns exposed by the API schema; internal bookkeeping columns are excluded
+SCHEMA_FIELDS = tuple(TextSummarySchema.model_fields)
+DIAGNOSTICS_FIELDS = tuple(SummaryDiagnosticsSchema.model_fields)
+# The text search configuration of the generated `search_vector` column (see migration 10)
+SEARCH_CONFIG = "english"
+
+
+async def post(
+    payload: SummaryPayloadSchema,
+    source_hash: Optional[str] = None,
+    canonical_url: Optional[str] = None,
+    cached_summary: Optional[str] = None,
+    selected_method: Optional[str] = None,
+) -> int:
     """
     Create a new summary record and save it to the database. The summary field is initially
-    left as an empty string and is updated once the background task completes.
+    left as an empty string and is updated once the background task completes, unless a cached
+    summary is reused, in which case the record is created completed. If the payload has a
+    callback URL, its delivery is recorded as well, due at once for a cached summary and
+    otherwise waiting for the background task.
 
     Parameters
     ----------
     payload : SummaryPayloadSchema
         The payload containing a valid url, the string name of the algorithm to use, and optionally
         an integer representing the number of sentences to include in the output.
+    source_hash : Optional[str]
+        The content hash of an already stored source document for the url, if any.
+    canonical_url : Optional[str]
+        The canonical form of the url.
+    cached_summary : Optional[str]
+        The text of a completed summary of the same canonical url, method, and sentence count to
+        reuse, if any.
+    selected_method : Optional[str]
+        The method that ranked the sentences of the reused summary, if any.
 
     Returns
     -------
@@ -22,20 +69,95 @@ async def post(payload: SummaryPayloadSchema) -> int:
     """
     summary = TextSummary(
         url=payload.url,
-        summary="",
+        summary=cached_summary or "",
         summarization_method=payload.summarization_method,
         sentence_count=payload.sentence_count,
+        source_hash=source_hash,
+        canonical_url=canonical_url,
+        status=SummaryStatus.completed if cached_summary else SummaryStatus.pending,
+        language=payload.language,
+        selected_method=selected_method,
     )
     # Create/update the model object
     await summary.save()
+    if payload.callback_url:
+        await WebhookDelivery.create(
+            summary_id=summary.id,
+            callback_url=str(payload.callback_url),
+            status=DeliveryStatus.pending if cached_summary else DeliveryStatus.waiting,
+            next_attempt_at=datetime.now(timezone.utc) if cached_summary else None,
+        )
     # Return the key
     return summary.id
 
 
+async def find_reusable(
+    canonical_url: str,
+    summarization_method: SummarizationMethod,
+    sentence_count: int,
+    max_age: float,
+    language: Optional[Language] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Find what a new summary of a canonical url can reuse from the recent summaries of the same
+    canonical url: a completed summary with the same method, sentence count, and language,
+    otherwise the stored source document of any of them. Served by the read replica when one is
+    configured.
+
+    Parameters
+    ----------
+    canonical_url : str
+        The canonical url of the new summary.
+    summarization_method : SummarizationMethod
+        The summarization method of the new summary.
+    sentence_count : int
+        The number of sentences of the new summary.
+    max_age : float
+        The age in seconds up to which summaries are reused.
+    language : Optional[Language]
+        The language of the new summary set by its request, or None if it is detected.
+
+    Returns
+    -------
+    Dict[str, Optional[str]]
+        The reusable `summary` text, with the `selected_method` that ranked its sentences, and
+        `source_hash`, each None if there is none.
+    """
+    recent = TextSummary.filter(
+        canonical_url=canonical_url,
+        created_at__gte=datetime.now(timezone.utc) - timedelta(seconds=max_age),
+    ).using_db(get_read_connection())
+    cached = (
+        await recent.filter(
+            summarization_method=summarization_method.value,
+            sentence_count=sentence_count,
+            status=SummaryStatus.completed,
+            language=language.value if language else None,
+        )
+        .order_by("-id")
+        .first()
+        .values("summary", "source_hash", "selected_method")
+    )
+    if cached:
+        return cached
+    source_hash = (
+        await recent.filter(source_hash__not_isnull=True)
+        .order_by("-id")
+        .first()
+        .values_list("source_hash", flat=True)
+    )
+    return {"summary": None, "source_hash": source_hash, "selected_method": None}
+
+
 async def get(id: int) -> Union[Dict, None]:
     """
     Retrieve a summary by its ID from the database.
 
+    The read is served by the read replica when one is configured. Since the replica may lag
+    behind the primary, a summary that is missing (just created) or still empty (the background
+    task has just written it on the primary) is re-read from the primary, so clients polling for
+    a summary see it as soon as the primary does.
+
     Parameters
     ----------
     id : int
@@ -47,15 +169,68 @@ async def get(id: int) -> Union[Dict, None]:
         A dictionary representation of the summary if found, otherwise None.
     """
     # Generates a QuerySet with the filter applied, limit queryset to one object, and make QuerySet return dicts instead of objects
-    summary = await TextSummary.filter(id=id).first().values()
+    summary = (
+        await TextSummary.filter(id=id)
+        .using_db(get_read_connection())
+        .first()
+        .values(*SCHEMA_FIELDS)
+    )
+    # Read-your-writes fallback to the primary for rows that may not have replicated yet
+    if has_replica() and (not summary or not summary["summary"]):
+        summary = await TextSummary.filter(id=id).first().values(*SCHEMA_FIELDS)
     if summary:
         return summary
     return None
 
 
+async def get_source(id: int) -> Union[Dict, None]:
+    """
+    Retrieve the url, the canonical url, and the stored source document hash of a summary by
+    its ID.
+
+    Parameters
+    ----------
+    id : int
+        The ID of the summary whose source to retrieve.
+
+    Returns
+    -------
+    Union[Dict, None]
+        A dictionary with the `url`, `canonical_url`, and `source_hash` of the summary if found,
+        otherwise None.
+    """
+    source = await TextSummary.filter(id=id).first().values("url", "canonical_url", "source_hash")
+    if source:
+        return source
+    return None
+
+
+async def get_document_size(source_hash: str) -> Optional[int]:
+    """
+    Retrieve the uncompressed size of a stored source document, served by the read replica when
+    one is configured.
+
+    Parameters
+    ----------
+    source_hash : str
+        The content hash of the source document.
+
+    Returns
+    -------
+    Optional[int]
+        The size of the document in bytes if it is stored, otherwise None.
+    """
+    return (
+        await SourceDocument.filter(content_hash=source_hash)
+        .using_db(get_read_connection())
+        .first()
+        .values_list("raw_size", flat=True)
+    )
+
+
 async def get_all() -> List[Dict]:
     """
-    Retrieve all summaries from the database.
+    Retrieve all summaries from the database, served by the read replica when one is configured.
 
     Returns
     -------
@@ -63,10 +238,193 @@ async def get_all() -> List[Dict]:
         A list of dictionaries, each representing a summary.
     """
     # All returns the complete QuerySet
-    summaries = await TextSummary.all().values()
+    summaries = await TextSummary.all().using_db(get_read_connection()).values(*SCHEMA_FIELDS)
     return summaries
 
 
+async def get_many(ids: List[int]) -> List[Dict]:
+    """
+    Retrieve the summaries with the given IDs from the database in a single query.
+
+    As with `get`, the read is served by the read replica when one is configured, and the rows
+    that are missing or still empty on the replica are re-read from the primary in one query.
+
+    Parameters
+    ----------
+    ids : List[int]
+        The IDs of the summaries to retrieve.
+
+    Returns
+    -------
+    List[Dict]
+        A list of dictionaries, each representing a summary, ordered by ID. IDs that do not exist
+        are omitted.
+    """
+    # Postgres plans `id IN (...)` as `id = ANY(ARRAY[...])`, a single index scan over all the ids
+    summaries = (
+        await TextSummary.filter(id__in=ids)
+        .using_db(get_read_connection())
+        .order_by("id")
+        .values(*SCHEMA_FIELDS)
+    )
+    if has_replica():
+        found = {summary["id"]: summary for summary in summaries if summary["summary"]}
+        pending = [id for id in set(ids) if id not in found]
+        if pending:
+            # Read-your-writes fallback to the primary for rows that may not have replicated yet
+            for summary in await TextSummary.filter(id__in=pending).values(*SCHEMA_FIELDS):
+                found[summary["id"]] = summary
+            summaries = [found[id] for id in sorted(found)]
+    return summaries
+
+
+def encode_cursor(rank: Optional[float], id: int) -> str:
+    """
+    The opaque cursor of the search results after a result with the given rank and ID.
+    """
+    return base64.urlsafe_b64encode(json.dumps([rank, id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], int]:
+    """
+    The rank and ID of the result of a cursor made by `encode_cursor`.
+
+    Raises
+    ------
+    ValueError
+        If the cursor is malformed.
+    """
+    try:
+        rank, id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+    if not isinstance(id, int) or not (rank is None or isinstance(rank, (int, float))):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return rank, id
+
+
+async def search(
+    query: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Search the summaries by the words of their text and URL, served by the read replica when one
+    is configured.
+
+    On PostgreSQL, the query is parsed as a web search (quoted phrases, `or`, and `-` to exclude
+    a word) and matched against the generated `search_vector` column through its GIN index. The
+    results are ordered by rank, the summary text weighing more than the URL, then by descending
+    ID, and paginated by keyset: the cursor holds the rank and ID of the last result, so that
+    every page costs the same whatever its depth. Elsewhere (SQLite), each word must appear in
+    the text or URL, without ranking, and the results are ordered by descending ID.
+
+    Parameters
+    ----------
+    query : str
+        The search query.
+    limit : int
+        The number of results per page.
+    cursor : Optional[str]
+        The `next_cursor` of the previous page, if any.
+
+    Returns
+    -------
+    Tuple[List[Dict], Optional[str]]
+        The page of results, each a dictionary representing a summary, and the cursor of the
+        next page, or None if this is the last page.
+
+    Raises
+    ------
+    ValueError
+        If the cursor is malformed.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    connection = get_read_connection()
+    if connection.capabilities.dialect == "postgres":
+        columns = ", ".join(f'"{field}"' for field in SCHEMA_FIELDS)
+        values: List = [query, limit + 1]
+        keyset = ""
+        if after is not None:
+            keyset = 'AND (ts_rank("search_vector", query)::float8, "id") < ($3, $4)'
+            values += [after[0] or 0.0, after[1]]
+        rows = await connection.execute_query_dict(
+            f"""
+            SELECT {columns}, ts_rank("search_vector", query)::float8 AS "rank"
+            FROM "{TextSummary._meta.db_table}",
+                websearch_to_tsquery('{SEARCH_CONFIG}'::regconfig, $1) AS query
+            WHERE "search_vector" @@ query {keyset}
+            ORDER BY "rank" DESC, "id" DESC
+            LIMIT $2
+            """,
+            values,
+        )
+        ranks = [row.pop("rank") for row in rows]
+    else:
+        words = Q(
+            *(Q(summary__icontains=word) | Q(url__icontains=word) for word in query.split()),
+            join_type="AND",
+        )
+        queryset = TextSummary.filter(words).using_db(connection)
+        if after is not None:
+            queryset = queryset.filter(id__lt=after[1])
+        rows = await queryset.order_by("-id").limit(limit + 1).values(*SCHEMA_FIELDS)
+        ranks = [None] * len(rows)
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(ranks[limit - 1], rows[limit - 1]["id"])
+
+
+async def get_diagnostics(id: int) -> Union[Dict, None]:
+    """
+    Retrieve the diagnostics of a summary by its ID, served by the read replica when one is
+    configured. As with `get`, diagnostics missing on the replica are re-read from the primary.
+
+    Parameters
+    ----------
+    id : int
+        The ID of the summary whose diagnostics to retrieve.
+
+    Returns
+    -------
+    Union[Dict, None]
+        A dictionary representation of the diagnostics if recorded, otherwise None.
+    """
+    diagnostics = (
+        await SummaryDiagnostics.filter(summary_id=id)
+        .using_db(get_read_connection())
+        .first()
+        .values(*DIAGNOSTICS_FIELDS)
+    )
+    # Read-your-writes fallback to the primary for rows that may not have replicated yet
+    if has_replica() and not diagnostics:
+        diagnostics = (
+            await SummaryDiagnostics.filter(summary_id=id).first().values(*DIAGNOSTICS_FIELDS)
+        )
+    if diagnostics:
+        return diagnostics
+    return None
+
+
+async def get_profile(id: int) -> Union[bytes, None]:
+    """
+    Retrieve the stored profile of a summary by its ID from the primary database, since profiles
+    are rare, large, and read right after they are written.
+
+    Parameters
+    ----------
+    id : int
+        The ID of the summary whose profile to retrieve.
+
+    Returns
+    -------
+    Union[bytes, None]
+        The profile in the `pstats` file format if one was stored, otherwise None.
+    """
+    profile = await SummaryProfile.filter(summary_id=id).first().values_list("content", flat=True)
+    if profile:
+        return bytes(profile)  # type: ignore[arg-type]
+    return None
+
+
 async def delete(id: int) -> None:
     """
     Delete a summary by its ID from the database.
@@ -82,9 +440,52 @@ async def delete(id: int) -> None:
     """
     # First and delete are not coroutines and so awaiting will resolve a single instance of the model object and delete it
     await TextSummary.filter(id=id).first().delete()  # type: ignore
+    await SummaryDiagnostics.filter(summary_id=id).delete()
+    await SummaryProfile.filter(summary_id=id).delete()
+    await ContentFingerprint.filter(summary_id=id).delete()
+    await WebhookDelivery.filter(summary_id=id).delete()
     return None
 
 
+async def delete_many(ids: List[int]) -> List[Dict]:
+    """
+    Delete the summaries with the given IDs from the database.
+
+    The rows are selected and deleted within a single transaction, so the returned rows are
+    exactly the ones that were deleted.
+
+    Parameters
+    ----------
+    ids : List[int]
+        The IDs of the summaries to delete.
+
+    Returns
+    -------
+    List[Dict]
+        A list of dictionaries, each representing a deleted summary, ordered by ID. IDs that do not
+        exist are omitted.
+    """
+    async with in_transaction() as connection:
+        summaries = (
+            await TextSummary.filter(id__in=ids)
+            .using_db(connection)
+            .order_by("id")
+            .values(*SCHEMA_FIELDS)
+        )
+        if summaries:
+            deleted_ids = [summary["id"] for summary in summaries]
+            await TextSummary.filter(id__in=deleted_ids).using_db(connection).delete()
+            await SummaryDiagnostics.filter(summary_id__in=deleted_ids).using_db(
+                connection
+            ).delete()
+            await SummaryProfile.filter(summary_id__in=deleted_ids).using_db(connection).delete()
+            await ContentFingerprint.filter(summary_id__in=deleted_ids).using_db(
+                connection
+            ).delete()
+            await WebhookDelivery.filter(summary_id__in=deleted_ids).using_db(connection).delete()
+    return summaries
+
+
 async def put(id: int, payload: SummaryUpdatePayloadSchema) -> Union[Dict, None]:
     """
     Update a summary in the database by its ID.
@@ -101,12 +502,18 @@ async def put(id: int, payload: SummaryUpdatePayloadSchema) -> Union[Dict, None]
     Union[Dict, None]
         The updated summary as a dictionary if successful, or None if no summary was found for the given ID.
     """
-    # The return object is an instance of UpdateQuery or None depending on if filter finds the given ID
+    # The return object is an instance of UpdateQuery or None depending on if filter finds the given ID.
+    # A summary written by the client is complete, whatever the outcome of its generation was,
+    # and is not reused for the other requests of its canonical url or near-duplicate articles
     summary = await TextSummary.filter(id=id).update(
-        url=payload.url, summary=payload.update_summary
+        url=payload.url,
+        summary=payload.update_summary,
+        status=SummaryStatus.completed,
+        canonical_url=None,
     )
+    await ContentFingerprint.filter(summary_id=id).delete()
     if summary:
         # Update and return the updated summary schema {"id": ..., "url": ..., "summary": ...}
-        updated_summary_schema = await TextSummary.filter(id=id).first().values()
+        updated_summary_schema = await TextSummary.filter(id=id).first().values(*SCHEMA_FIELDS)
         return updated_summary_schema
     return None
@@ -1,6 +1,45 @@
 from fastapi import HTTPException
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY, HTTP_503_SERVICE_UNAVAILABLE
 
 # Define reusable HTTPExceptions
 SummaryNotFoundException = HTTPException(
     status_code=404, detail="Summary not found; please try another ID"
 )
+DiagnosticsNotFoundException = HTTPException(
+    status_code=404,
+    detail="Diagnostics not found; the summary does not exist or has not been generated yet",
+)
+ProfileNotFoundException = HTTPException(
+    status_code=404,
+    detail="Profile not found; the summary was not profiled or has not been generated yet",
+)
+ProfilingDisabledException = HTTPException(
+    status_code=403, detail="Profiling is disabled in this environment"
+)
+AdminKeyInvalidException = HTTPException(status_code=401, detail="Invalid or missing admin key")
+AdminDisabledException = HTTPException(
+    status_code=403, detail="The admin endpoints are disabled; no admin key is configured"
+)
+InvalidCursorException = HTTPException(
+    status_code=400, detail="Invalid cursor; please pass the next_cursor of a previous page"
+)
+
+
+def callback_forbidden_exception(reason: str) -> HTTPException:
+    """
+    The HTTPException rejecting a callback URL that may not receive deliveries, see
+    `app.webhooks.check_callback_url`.
+    """
+    return HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail=reason)
+
+
+def service_saturated_exception(retry_after: int) -> HTTPException:
+    """
+    The HTTPException rejecting a summarization job while the service is saturated, telling the
+    client when to retry.
+    """
+    return HTTPException(
+        status_code=HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The service is saturated; please retry later",
+        headers={"Retry-After": str(retry_after)},
+    )
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app.metrics import get_registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Expose the application metrics in the Prometheus text format, aggregated across the
+    gunicorn workers in multiprocess mode.
+    """
+    return Response(content=generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,32 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+class TrustedRowsResponse(ORJSONResponse):
+    """
+    A JSON response for rows read from the database that already match the response schema.
+
+    Returning a `Response` instance from a path operation makes FastAPI skip validating the
+    content against the `response_model` and encoding it with `jsonable_encoder`, so the rows
+    are serialized exactly once by orjson. Only use this for data that is trusted to match the
+    documented schema, such as the output of `.values()` restricted to the schema fields.
+    """
+
+    def render(self, content: Any) -> bytes:
+        """
+        Serialize the content with orjson, formatting UTC datetimes with a 'Z' suffix to match
+        the output of Pydantic's serializer.
+
+        Parameters
+        ----------
+        content : Any
+            The rows (dictionaries or lists of dictionaries) to serialize.
+
+        Returns
+        -------
+        bytes
+            The serialized JSON content.
+        """
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
@@ -1,29 +1,253 @@
-from typing import Annotated, List
+from contextlib import contextmanager
+from typing import Annotated, Any, Dict, Iterator, List, Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, Path
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Path, Query, Request
+from pydantic import PositiveInt
+from starlette.background import BackgroundTask
 
 from app.api import crud
-from app.api.custom_exceptions import SummaryNotFoundException
-from app.custom_rate_limiter import CustomRateLimiter
+from app.api.custom_exceptions import (
+    DiagnosticsNotFoundException,
+    InvalidCursorException,
+    ProfilingDisabledException,
+    SummaryNotFoundException,
+    callback_forbidden_exception,
+    service_saturated_exception,
+)
+from app.api.responses import TrustedRowsResponse
+from app.canonical import canonicalize_url
+from app.config import Settings, get_settings
+from app.custom_rate_limiter import CustomRateLimiter, client_identity
+from app.deadline import Deadline
+from app.metrics import SUMMARY_JOBS_IN_PROGRESS, SUMMARY_JOBS_REJECTED, SUMMARY_REUSE
 from app.models.pydantic_model import (
+    LINEAR_TIME_METHODS,
+    MAX_BULK_IDS,
+    JobPriority,
+    SummarizationMethod,
+    SummaryIdsPayloadSchema,
     SummaryPayloadSchema,
     SummaryResponseSchema,
+    SummaryResummarizePayloadSchema,
     SummaryUpdatePayloadSchema,
 )
-from app.models.tortoise_model import TextSummarySchema
-from app.summarizer import generate_summary
+from app.models.tortoise_model import (
+    SummaryDiagnosticsSchema,
+    SummarySearchResultsSchema,
+    TextSummarySchema,
+)
+from app.profiling import profile_summary
+from app.scheduler import QueuedJob, job_scheduler
+from app.webhooks import CallbackForbiddenError, check_callback_url, webhook_dispatcher
 
 router = APIRouter()
 
 
+async def generate_summary(*args: Any, **kwargs: Any) -> None:
+    """
+    Run `app.summarizer.generate_summary`, importing the summarization stack (sumy, nltk, numpy)
+    on the first job, so that processes that never summarize do not pay for it. Under gunicorn,
+    the stack is preloaded by the master process instead, see `gunicorn.conf.py`.
+    """
+    from app.summarizer import generate_summary
+
+    await generate_summary(*args, **kwargs)
+
+
+@contextmanager
+def admit_job(settings: Settings, admit: bool = True) -> Iterator[None]:
+    """
+    Reject a new summarization job with a 503 response and a `Retry-After` header while the
+    jobs in flight in this process exceed `summary_max_in_flight_jobs`, or while the estimated
+    wait of the job exceeds `summary_max_queue_wait_seconds` (see `JobScheduler.admit`).
+
+    An admitted job holds a slot in flight from its admission, so that concurrent requests
+    cannot all be admitted before any of them submits its job. The block must end with the
+    `enqueue_summary` call that submits the job; if the request fails before, the slot is
+    released.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings, which configure the admission control.
+    admit : bool
+        Whether a job is admitted at all; a request that reuses a recent summary runs no job.
+
+    Raises
+    ------
+    HTTPException
+        If the job is rejected.
+    """
+    if not admit:
+        yield
+        return
+    rejection = job_scheduler.admit(
+        settings.summary_max_in_flight_jobs,
+        settings.summary_max_queue_wait_seconds,
+        settings.summary_job_concurrency,
+    )
+    if rejection is not None:
+        reason, retry_after = rejection
+        SUMMARY_JOBS_REJECTED.labels(reason=reason).inc()
+        raise service_saturated_exception(retry_after)
+    try:
+        yield
+    except BaseException:
+        job_scheduler.cancel_reservation()
+        raise
+
+
+def enqueue_summary(
+    background_tasks: BackgroundTasks,
+    *args: Any,
+    deadline: Deadline,
+    lane: str,
+    tenant: str,
+    settings: Settings,
+    profile: bool = False,
+    **kwargs: Any,
+) -> None:
+    """
+    Submit a summarization job admitted by `admit_job` to the fair schedule of `job_scheduler`,
+    and schedule it as a background task that runs `generate_summary` once the job gets a slot.
+
+    Parameters
+    ----------
+    background_tasks : BackgroundTasks
+        The background tasks of the current request.
+    *args : Any
+        The positional arguments of `generate_summary`, starting with the summary ID.
+    deadline : Deadline
+        The deadline of the job, started when its request was accepted so that the time spent
+        in the queue counts against it.
+    lane : str
+        The lane of the job, see `job_lane`.
+    tenant : str
+        The tenant of the job, the identity of its client.
+    settings : Settings
+        The application settings, which configure the scheduler.
+    profile : bool
+        Whether to run the job under the profiler and store its profile.
+    **kwargs : Any
+        The other keyword arguments of `generate_summary`.
+    """
+    weight = settings.summary_lane_weights.get(lane, 1.0)
+    job = job_scheduler.submit(lane, tenant, weight, reserved=True)
+    background_tasks.add_task(
+        run_summary_job,
+        job,
+        *args,
+        deadline=deadline,
+        concurrency=settings.summary_job_concurrency,
+        profile=profile,
+        **kwargs,
+    )
+
+
+async def run_summary_job(
+    job: QueuedJob,
+    *args: Any,
+    deadline: Deadline,
+    concurrency: int,
+    profile: bool = False,
+    **kwargs: Any,
+) -> None:
+    """
+    Run a summarization job scheduled by `enqueue_summary`, once it gets one of the
+    `concurrency` slots of the scheduler.
+    """
+    async with job_scheduler.run(job, concurrency):
+        with SUMMARY_JOBS_IN_PROGRESS.track_inprogress():
+            # BackgroundTask runs both coroutine functions and plain functions, as `add_task` does
+            task = BackgroundTask(generate_summary, *args, deadline=deadline, **kwargs)
+            if not profile:
+                await task()
+                return
+            async with profile_summary(args[0]):
+                await task()
+
+
+async def job_lane(
+    priority: JobPriority,
+    summarization_method: SummarizationMethod,
+    source_hash: Optional[str],
+    settings: Settings,
+) -> str:
+    """
+    The lane of a summarization job: 'fast' for interactive jobs, for the jobs of a linear-time
+    method, and for the jobs of a short stored source document, 'bulk' for bulk jobs, and
+    'normal' otherwise.
+    """
+    if priority == JobPriority.interactive:
+        return "fast"
+    if priority == JobPriority.bulk:
+        return "bulk"
+    if summarization_method in LINEAR_TIME_METHODS:
+        return "fast"
+    if source_hash:
+        size = await crud.get_document_size(source_hash)
+        if size is not None and size <= settings.fast_lane_max_document_bytes:
+            return "fast"
+    return "normal"
+
+
+async def find_reusable(
+    canonical_url: str, payload: SummaryPayloadSchema, settings: Settings
+) -> Dict[str, Optional[str]]:
+    """
+    Find what a new summary can reuse from the recent summaries of the same canonical URL (see
+    `crud.find_reusable`), counting the outcome in `summary_reuse`.
+    """
+    reusable: Dict[str, Optional[str]] = dict.fromkeys(
+        ("summary", "source_hash", "selected_method")
+    )
+    if settings.summary_cache_ttl_seconds:
+        reusable = await crud.find_reusable(
+            canonical_url,
+            payload.summarization_method,
+            payload.sentence_count,
+            settings.summary_cache_ttl_seconds,
+            payload.language,
+        )
+    if reusable["summary"] is not None:
+        SUMMARY_REUSE.labels(reused="summary").inc()
+    elif reusable["source_hash"] is not None:
+        SUMMARY_REUSE.labels(reused="source").inc()
+    else:
+        SUMMARY_REUSE.labels(reused="none").inc()
+    return reusable
+
+
+def check_profiling(
+    settings: Annotated[Settings, Depends(get_settings)],
+    x_profile: Annotated[bool, Header()] = False,
+) -> bool:
+    """
+    Whether the summarization job of the request should be profiled, as requested by the
+    `X-Profile` header.
+
+    Raises
+    ------
+    ProfilingDisabledException
+        If profiling is requested but disabled in this environment.
+    """
+    if x_profile and not settings.profiling_enabled:
+        raise ProfilingDisabledException
+    return x_profile
+
+
 @router.post(
     "/",
     response_model=SummaryResponseSchema,
     status_code=201,
-    dependencies=[Depends(CustomRateLimiter(times=5, seconds=60))],
+    dependencies=[Depends(CustomRateLimiter("create_summary"))],
 )
 async def create_summary(
-    payload: SummaryPayloadSchema, background_tasks: BackgroundTasks
+    payload: SummaryPayloadSchema,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    profile: Annotated[bool, Depends(check_profiling)],
+    settings: Annotated[Settings, Depends(get_settings)],
 ) -> SummaryResponseSchema:
     """
     Create a new summary based on the provided payload.
@@ -32,40 +256,189 @@ async def create_summary(
     ----------
     payload : SummaryPayloadSchema
         The payload containing a valid url required to create the new summary.
+    request : Request
+        The incoming request, whose client is the tenant of the summarization job.
     background_tasks : BackgroundTasks
         A collection of background tasks that will be called after a response has been sent to the client.
+    profile : bool
+        Whether to profile the summarization job, requested with the `X-Profile` header.
+    settings : Settings
+        The application settings, which provide the default deadline of the job and configure
+        its scheduling.
 
     Returns
     -------
     SummaryResponseSchema
-        The newly created summary's response, including the `url`, `id`, `summarization_method`, and `sentence_count`.
+        The newly created summary's response, including the `url`, `id`, `summarization_method`,
+        `sentence_count`, and the `deadline_seconds`, `priority`, and `language` of the job.
+
+    Raises
+    ------
+    HTTPException
+        A 422 error if the callback URL may not receive deliveries, see
+        `app.webhooks.check_callback_url`, or a 503 error with a `Retry-After` header if the job
+        is rejected by `admit_job`.
     """
-    summary_id = await crud.post(payload)
-    # Generate summary as a background task
-    background_tasks.add_task(
-        generate_summary,
-        summary_id,
-        str(payload.url),
-        payload.summarization_method,
-        int(payload.sentence_count),
-    )
+    if payload.callback_url:
+        try:
+            await check_callback_url(str(payload.callback_url), settings)
+        except CallbackForbiddenError as error:
+            raise callback_forbidden_exception(str(error)) from error
+        except OSError as error:
+            detail = "The host of the callback URL does not resolve"
+            raise callback_forbidden_exception(detail) from error
+    deadline = Deadline(payload.deadline_seconds or settings.summary_deadline_seconds)
+    canonical_url = canonicalize_url(str(payload.url), settings.canonical_strip_params)
+    reusable = await find_reusable(canonical_url, payload, settings)
+    with admit_job(settings, admit=reusable["summary"] is None):
+        summary_id = await crud.post(
+            payload,
+            source_hash=reusable["source_hash"],
+            canonical_url=canonical_url,
+            cached_summary=reusable["summary"],
+            selected_method=reusable["selected_method"],
+        )
+        # Generate summary as a background task, unless a recent summary was reused
+        if reusable["summary"] is not None:
+            if payload.callback_url:
+                webhook_dispatcher.notify()
+        else:
+            enqueue_summary(
+                background_tasks,
+                summary_id,
+                str(payload.url),
+                payload.summarization_method,
+                int(payload.sentence_count),
+                deadline=deadline,
+                lane=await job_lane(
+                    payload.priority,
+                    payload.summarization_method,
+                    reusable["source_hash"],
+                    settings,
+                ),
+                tenant=client_identity(request, settings)[1],
+                settings=settings,
+                profile=profile,
+                source_hash=reusable["source_hash"],
+                canonical_url=canonical_url,
+                language=payload.language,
+            )
     response = SummaryResponseSchema(
         url=payload.url,
         id=summary_id,
         summarization_method=payload.summarization_method,
         sentence_count=payload.sentence_count,
+        deadline_seconds=deadline.seconds,
+        priority=payload.priority,
+        callback_url=payload.callback_url,
+        language=payload.language,
     )
     return response
 
 
+@router.post(
+    "/{id}/resummarize/",
+    response_model=SummaryResponseSchema,
+    status_code=201,
+    dependencies=[Depends(CustomRateLimiter("resummarize_summary"))],
+)
+async def resummarize_summary(
+    id: Annotated[int, Path(title="The ID of the text summary to regenerate", gt=0)],
+    payload: SummaryResummarizePayloadSchema,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    profile: Annotated[bool, Depends(check_profiling)],
+    settings: Annotated[Settings, Depends(get_settings)],
+) -> SummaryResponseSchema:
+    """
+    Create a new summary of the same URL as an existing summary, reusing its stored source
+    document when available so that the article is not fetched again.
+
+    Parameters
+    ----------
+    id : int
+        The ID of the existing text summary; must be greater than 0.
+    payload : SummaryResummarizePayloadSchema
+        The payload containing the summarization method and sentence count for the new summary.
+    request : Request
+        The incoming request, whose client is the tenant of the summarization job.
+    background_tasks : BackgroundTasks
+        A collection of background tasks that will be called after a response has been sent to the client.
+    profile : bool
+        Whether to profile the summarization job, requested with the `X-Profile` header.
+    settings : Settings
+        The application settings, which provide the default deadline of the job and configure
+        its scheduling.
+
+    Returns
+    -------
+    SummaryResponseSchema
+        The newly created summary's response, including the `url`, `id`, `summarization_method`,
+        `sentence_count`, and the `deadline_seconds`, `priority`, and `language` of the job.
+
+    Raises
+    ------
+    SummaryNotFoundException
+        If the summary with the given ID is not found.
+    HTTPException
+        A 503 error with a `Retry-After` header if the job is rejected by `admit_job`.
+    """
+    deadline = Deadline(payload.deadline_seconds or settings.summary_deadline_seconds)
+    source = await crud.get_source(id)
+    # Raise a 404 Not Found error if an id is non-existent
+    if not source:
+        raise SummaryNotFoundException
+    source_hash = source["source_hash"]
+    new_payload = SummaryPayloadSchema(
+        url=source["url"],
+        summarization_method=payload.summarization_method,
+        sentence_count=payload.sentence_count,
+        language=payload.language,
+    )
+    canonical_url = source["canonical_url"] or canonicalize_url(
+        source["url"], settings.canonical_strip_params
+    )
+    with admit_job(settings):
+        summary_id = await crud.post(
+            new_payload, source_hash=source_hash, canonical_url=canonical_url
+        )
+        # Generate summary from the stored source document as a background task
+        enqueue_summary(
+            background_tasks,
+            summary_id,
+            str(new_payload.url),
+            new_payload.summarization_method,
+            int(new_payload.sentence_count),
+            deadline=deadline,
+            lane=await job_lane(
+                payload.priority, payload.summarization_method, source_hash, settings
+            ),
+            tenant=client_identity(request, settings)[1],
+            settings=settings,
+            profile=profile,
+            source_hash=source_hash,
+            canonical_url=canonical_url,
+            language=new_payload.language,
+        )
+    return SummaryResponseSchema(
+        url=new_payload.url,
+        id=summary_id,
+        summarization_method=new_payload.summarization_method,
+        sentence_count=new_payload.sentence_count,
+        deadline_seconds=deadline.seconds,
+        priority=payload.priority,
+        language=new_payload.language,
+    )
+
+
 @router.get(
     "/{id}/",
     response_model=TextSummarySchema,
-    dependencies=[Depends(CustomRateLimiter(times=3, seconds=60))],
+    dependencies=[Depends(CustomRateLimiter("read_summary"))],
 )
 async def read_summary(
     id: Annotated[int, Path(title="The ID of the text summary to query", gt=0)],
-) -> TextSummarySchema:  # type: ignore
+) -> TrustedRowsResponse:
     """
     Retrieve a single summary based on its ID (i.e., primary key).
 
@@ -76,8 +449,8 @@ async def read_summary(
 
     Returns
     -------
-    TextSummarySchema
-        The retrieved summary object.
+    TrustedRowsResponse
+        The retrieved summary object, serialized directly without re-validation.
 
     Raises
     ------
@@ -88,24 +461,141 @@ async def read_summary(
     # Raise a 404 Not Found error if an id is non-existent
     if not summary:
         raise SummaryNotFoundException
-    return summary
+    # The row only contains the schema fields, so it is encoded without a second validation pass
+    return TrustedRowsResponse(summary)
+
+
+@router.get(
+    "/{id}/diagnostics/",
+    response_model=SummaryDiagnosticsSchema,
+    dependencies=[Depends(CustomRateLimiter("read_summary_diagnostics"))],
+)
+async def read_summary_diagnostics(
+    id: Annotated[int, Path(title="The ID of the text summary whose diagnostics to query", gt=0)],
+) -> TrustedRowsResponse:
+    """
+    Retrieve how a summary was generated: the engine used, the duration of each pipeline stage,
+    and the size of the extracted article.
+
+    Parameters
+    ----------
+    id : int
+        The ID of the text summary; must be greater than 0.
+
+    Returns
+    -------
+    TrustedRowsResponse
+        The diagnostics of the summary, serialized directly without re-validation.
+
+    Raises
+    ------
+    DiagnosticsNotFoundException
+        If the summary does not exist or its generation has not completed yet.
+    """
+    diagnostics = await crud.get_diagnostics(id)
+    if not diagnostics:
+        raise DiagnosticsNotFoundException
+    return TrustedRowsResponse(diagnostics)
 
 
 @router.get(
     "/",
     response_model=List[TextSummarySchema],  # type: ignore
-    dependencies=[Depends(CustomRateLimiter(times=3, seconds=60))],
+    dependencies=[Depends(CustomRateLimiter("read_all_summaries"))],
+)
+async def read_all_summaries(
+    ids: Annotated[
+        Optional[List[PositiveInt]],
+        Query(
+            title="The IDs of the text summaries to query, e.g., ?ids=1&ids=2",
+            max_length=MAX_BULK_IDS,
+        ),
+    ] = None,
+) -> TrustedRowsResponse:
+    """
+    Retrieve all summaries, or only the summaries with the given IDs in a single query. A bulk
+    fetch counts as one request against the rate limit.
+
+    Parameters
+    ----------
+    ids : Optional[List[int]]
+        The IDs of the text summaries to query; if omitted, all summaries are returned.
+
+    Returns
+    -------
+    TrustedRowsResponse
+        A list of the summaries, serialized directly without re-validation. IDs that do not exist
+        are omitted.
+    """
+    if ids:
+        return TrustedRowsResponse(await crud.get_many(ids))
+    return TrustedRowsResponse(await crud.get_all())
+
+
+@router.get(
+    "/search",
+    response_model=SummarySearchResultsSchema,
+    dependencies=[Depends(CustomRateLimiter("search_summaries"))],
+)
+async def search_summaries(
+    q: Annotated[str, Query(title="The words to search for", min_length=1, max_length=256)],
+    limit: Annotated[int, Query(title="The number of results per page", ge=1, le=100)] = 20,
+    cursor: Annotated[
+        Optional[str], Query(title="The next_cursor of the previous page", max_length=256)
+    ] = None,
+) -> TrustedRowsResponse:
+    """
+    Search the summaries by the words of their text and URL, the best match first, one page at
+    a time (see `crud.search`).
+
+    Parameters
+    ----------
+    q : str
+        The search query, e.g., `climate "sea level" -opinion`.
+    limit : int
+        The number of results per page, from 1 to 100. Default is 20.
+    cursor : Optional[str]
+        The `next_cursor` of the previous page; if omitted, the first page is returned.
+
+    Returns
+    -------
+    TrustedRowsResponse
+        The page of matching summaries and the cursor of the next page, serialized directly
+        without re-validation.
+
+    Raises
+    ------
+    InvalidCursorException
+        If the cursor is malformed.
+    """
+    try:
+        results, next_cursor = await crud.search(q, limit, cursor)
+    except ValueError:
+        raise InvalidCursorException
+    return TrustedRowsResponse({"results": results, "next_cursor": next_cursor})
+
+
+@router.post(
+    "/delete",
+    response_model=List[TextSummarySchema],  # type: ignore
+    dependencies=[Depends(CustomRateLimiter("remove_summaries"))],
 )
-async def read_all_summaries() -> List[TextSummarySchema]:  # type: ignore
+async def remove_summaries(payload: SummaryIdsPayloadSchema) -> TrustedRowsResponse:
     """
-    Retrieve all summaries.
+    Delete the summaries with the given IDs in a single transaction. A bulk delete counts as one
+    request against the rate limit.
+
+    Parameters
+    ----------
+    payload : SummaryIdsPayloadSchema
+        The payload containing the IDs of the summaries to delete.
 
     Returns
     -------
-    List[TextSummarySchema]
-        A list of all the summaries.
+    TrustedRowsResponse
+        A list of the summary records that were deleted. IDs that do not exist are omitted.
     """
-    return await crud.get_all()
+    return TrustedRowsResponse(await crud.delete_many(payload.ids))
 
 
 @router.delete(
@@ -150,7 +640,7 @@ async def remove_summary(
 async def update_summary(
     id: Annotated[int, Path(title="The ID of the text summary to update", gt=0)],
     payload: SummaryUpdatePayloadSchema,
-) -> TextSummarySchema:  # type:ignore
+) -> TextSummarySchema:  # type: ignore
     """
     Update a text summary by its ID. Both the URL and the summary text are updated based on the provided payload.
 
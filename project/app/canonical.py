@@ -0,0 +1,92 @@
+import posixpath
+import re
+from fnmatch import fnmatchcase
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# The default ports of the schemes, omitted from canonical URLs
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# The host prefixes of the mobile and AMP editions of a site, e.g., 'amp.example.com'
+EDITION_HOST_PREFIXES = ("amp.", "m.", "www.")
+# The query parameters selecting the AMP edition of a page, e.g., '?amp=1' or '?outputType=amp'
+AMP_PARAMS = {"amp", "outputtype"}
+PERCENT_ESCAPE = re.compile(r"%[0-9a-fA-F]{2}")
+
+
+def strip_amp_path(path: str) -> str:
+    """
+    The path of the regular edition of a page from the path of its AMP edition: '/amp/a',
+    '/a/amp', and '/a.amp.html' are '/a', '/a', and '/a.html'.
+    """
+    segments = path.split("/")
+    if len(segments) > 2 and segments[1] == "amp":
+        del segments[1]
+    if len(segments) > 2 and segments[-1] == "amp":
+        del segments[-1]
+    return re.sub(r"\.amp(\.html?)$", r"\1", "/".join(segments))
+
+
+def canonicalize_url(url: str, strip_params: Iterable[str]) -> str:
+    """
+    The canonical form of a URL, so that the variants of the same article share a single key
+    for caching, single-flight, and the URL index of the summaries.
+
+    The canonical form has:
+
+    - the scheme and host in lowercase, without the default port or the fragment
+    - the path without dot segments, duplicate slashes, or trailing slash, and with uppercase
+      percent escapes
+    - the path and query of the regular edition of AMP pages ('/amp/...', '.../amp', '.amp.html',
+      '?amp=1', '?outputType=amp')
+    - the query parameters sorted, without the tracking parameters matching `strip_params`
+
+    Parameters
+    ----------
+    url : str
+        An absolute HTTP or HTTPS URL.
+    strip_params : Iterable[str]
+        The names of the tracking query parameters to remove, as case-insensitive glob patterns,
+        e.g., 'utm_*' or 'fbclid'.
+
+    Returns
+    -------
+    str
+        The canonical URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username is not None:
+        credentials = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        netloc = f"{credentials}@{netloc}"
+
+    path = PERCENT_ESCAPE.sub(lambda escape: escape.group().upper(), parts.path)
+    # Also drops the trailing slash
+    path = strip_amp_path(posixpath.normpath(re.sub(r"/+", "/", path or "/")))
+
+    patterns = [pattern.lower() for pattern in strip_params]
+    params = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not any(fnmatchcase(name.lower(), pattern) for pattern in patterns)
+        and not (name.lower() in AMP_PARAMS and value.lower() in ("", "1", "true", "amp"))
+    ]
+    query = urlencode(sorted(params))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def site(url: str) -> Optional[str]:
+    """
+    The host of a URL without the prefixes of the mobile and AMP editions of a site, to compare
+    whether two URLs belong to the same site.
+    """
+    host = (urlsplit(url).hostname or "").rstrip(".")
+    for prefix in EDITION_HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            return host[len(prefix) :]
+    return host or None
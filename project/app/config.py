@@ -1,12 +1,67 @@
 import logging
 from functools import lru_cache
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
-from pydantic import AnyUrl
+from pydantic import AnyUrl, BaseModel, Field, ValidationInfo, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from app.cost_model import DEFAULT_AUTO_METHODS, DEFAULT_COST_MODELS, CostModel
+from app.models.pydantic_model import Language, SummarizationMethod
+
 logger = logging.getLogger("uvicorn")
 
+# The tier of clients without a recognized API key, identified by their IP address
+DEFAULT_RATE_LIMIT_TIER = "default"
+
+
+class RateLimitPolicy(BaseModel):
+    """
+    The number of requests a client may make within a sliding window.
+
+    Attributes
+    ----------
+    times : int
+        The number of requests allowed within the window.
+    seconds : int
+        The size of the window in seconds.
+    """
+
+    times: int = Field(gt=0)
+    seconds: int = Field(gt=0)
+
+
+# The policies of the rate limited routes, keyed by route name and then by client tier
+DEFAULT_RATE_LIMIT_POLICIES: Dict[str, Dict[str, RateLimitPolicy]] = {
+    "create_summary": {DEFAULT_RATE_LIMIT_TIER: RateLimitPolicy(times=5, seconds=60)},
+    "resummarize_summary": {DEFAULT_RATE_LIMIT_TIER: RateLimitPolicy(times=5, seconds=60)},
+    "remove_summaries": {DEFAULT_RATE_LIMIT_TIER: RateLimitPolicy(times=5, seconds=60)},
+    "read_summary": {DEFAULT_RATE_LIMIT_TIER: RateLimitPolicy(times=3, seconds=60)},
+    "read_all_summaries": {DEFAULT_RATE_LIMIT_TIER: RateLimitPolicy(times=3, seconds=60)},
+    "search_summaries": {DEFAULT_RATE_LIMIT_TIER: RateLimitPolicy(times=3, seconds=60)},
+    "read_summary_diagnostics": {DEFAULT_RATE_LIMIT_TIER: RateLimitPolicy(times=3, seconds=60)},
+}
+
+# The query parameters that only track where a visitor came from, stripped from canonical URLs
+DEFAULT_TRACKING_PARAMS = [
+    "utm_*",
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "_ga",
+    "_hsenc",
+    "_hsmi",
+    "ref_src",
+]
+
+# The weights of the lanes of the summarization jobs, the share of the job slots of a tenant's
+# jobs in each lane relative to the others (see app/scheduler.py)
+DEFAULT_LANE_WEIGHTS = {"fast": 8.0, "normal": 4.0, "bulk": 1.0}
+
 
 class Settings(BaseSettings):
     """
@@ -24,14 +79,282 @@ class Settings(BaseSettings):
         The environment the application is running in, defaulting to 'dev'.
     testing : bool
         A flag to indicate if the application is in testing mode. Default is False.
+    embedded : bool
+        Whether to run without external services, in a single process: the database is SQLite
+        (the `DATABASE_URL` if set, otherwise in memory) with the schema generated at startup, and
+        rate limiting uses the in-process 'memory' mode. Default is False.
     database_url : Optional[AnyUrl]
         The URL for connecting to the database, parsed as an optional AnyUrl.
+    database_replica_url : Optional[AnyUrl]
+        The URL of an optional read replica; when set, read-only queries are routed to it.
+    store_source_documents : bool
+        Whether to persist the compressed extracted article of each fetched URL. Default is False.
+    source_compression_level : int
+        The zlib compression level (1-9) used for stored source documents. Default is 6.
+    db_pool_min_size : int
+        The number of connections each worker's PostgreSQL pool is initialized with. Default is 1.
+    db_pool_max_size : int
+        The maximum number of connections in each worker's PostgreSQL pool; the total across all
+        gunicorn workers must stay within the database's connection limit. Default is 5.
+    db_statement_cache_size : int
+        The size of asyncpg's per-connection prepared statement cache; 0 disables it, which is
+        required behind transaction-pooling proxies such as PgBouncer. Default is 100.
+    db_max_inactive_connection_lifetime : float
+        The number of seconds after which idle pooled connections are closed; 0 keeps them open
+        indefinitely. Default is 300.0.
+    rate_limiter_mode : Literal["redis", "hybrid", "memory"]
+        'redis' checks every limited request against Redis; 'hybrid' counts requests in local
+        per-process buckets that are reconciled with Redis in periodic batched syncs; 'memory'
+        counts requests in the process only, without Redis, and is forced in embedded mode.
+        Default is 'redis'.
+    rate_limiter_sync_interval : float
+        The number of seconds between batched syncs of the local buckets in hybrid mode. Default is 1.0.
+    rate_limiter_sync_threshold : float
+        The fraction of a limit beyond which hybrid mode checks Redis synchronously. Default is 0.8.
+    rate_limiter_fail_open : bool
+        Whether hybrid mode allows requests based on local counts when Redis is unreachable; if
+        False, such requests are rejected with 503. Default is True.
+    rate_limit_policies : Dict[str, Dict[str, RateLimitPolicy]]
+        The rate limit policies keyed by route name and then by client tier, e.g.,
+        `{"create_summary": {"default": {"times": 5, "seconds": 60}, "pro": {...}}}`. Routes that
+        are not given keep their default policies, and every route must have a 'default' tier.
+    rate_limit_api_keys : Dict[str, str]
+        The client tier of each API key sent in the `X-API-Key` header; clients without a
+        recognized key are limited by IP address under the 'default' tier. Default is empty.
+    trusted_proxy_hops : int
+        The number of proxies in front of the application that append the address of their
+        client to `X-Forwarded-For`, e.g., 1 for Heroku's router. The IP address of a client is
+        the entry that many hops from the right of the header, as the entries to its left are
+        sent by the client and can be forged; 0 ignores the header. Default is 1.
+    profiling_enabled : bool
+        Whether summarization jobs can be profiled on request (`X-Profile` header) and their
+        profiles downloaded from the admin endpoints. Defaults to True, except in the 'prod'
+        environment, where it must be enabled explicitly.
+    admin_api_key : Optional[str]
+        The key required in the `X-Admin-Key` header of the admin endpoints; if unset, the admin
+        endpoints are disabled and respond with 403. Default is None.
+    preload_nlp : bool
+        Whether the gunicorn master process loads the application and the summarization stack
+        before forking the workers, which then share it copy-on-write; if False, each worker
+        imports the stack on its first summarization job. Default is True.
+    summary_deadline_seconds : float
+        The time budget of a summarization job in seconds, from when its request is accepted to
+        when its summary must be written, unless the request sets its own `deadline_seconds`.
+        A job out of budget stops at its next checkpoint and is marked 'timed_out'. Default is
+        120.0.
+    summary_retention_days : Optional[int]
+        The number of days summaries are kept; older summaries are expired by the retention job,
+        along with their diagnostics and profiles. On PostgreSQL, the summaries table is
+        partitioned by month and a month is expired once all of it is older than the retention,
+        so summaries are kept for up to one month longer. If unset, summaries are kept
+        indefinitely. Default is None.
+    summary_retention_mode : Literal["archive", "drop"]
+        How the retention job expires a monthly partition: 'archive' detaches it and keeps it as
+        the standalone `textsummary_archive_pYYYYMM` table (e.g., to dump it to cold storage
+        before dropping it), 'drop' drops it. Default is 'archive'.
+    summary_partition_premake_months : int
+        The number of monthly partitions the retention job creates ahead of the current month.
+        Default is 3.
+    retention_interval_seconds : float
+        The number of seconds between runs of the retention job in each application process;
+        0 disables the in-process job, e.g., to run `python -m
+        app.retention` from a scheduler instead. Default is 3600.0.
+    canonical_strip_params : List[str]
+        The tracking query parameters removed from the canonical URL of a summary, as
+        case-insensitive glob patterns (e.g., 'utm_*'). Default is `DEFAULT_TRACKING_PARAMS`.
+    canonical_link_resolution : bool
+        Whether the `<link rel="canonical">` of the fetched page is recorded in the
+        `canonical_link` of its summary, if it points to the same site. Default is True.
+    summary_cache_ttl_seconds : float
+        The age up to which a completed summary of the same canonical URL, method, and sentence
+        count is reused for a new summary instead of running a job, and a stored source document
+        of the same canonical URL is reused instead of fetching the page again; 0 disables the
+        reuse. Default is 86400.0.
+    near_duplicate_detection : bool
+        Whether a job reuses the completed summary of a near-duplicate article with the same
+        method and sentence count instead of ranking its sentences (see `app.fingerprint`).
+        Default is True.
+    near_duplicate_max_distance : int
+        The largest number of bits in which the SimHash fingerprints of two articles differ for
+        them to be near-duplicates, from 0 (nearly identical) to 3. Default is 3.
+    summary_job_concurrency : int
+        The number of summarization jobs that run at a time in each process; the others wait
+        in the fair schedule of `app.scheduler`. Default is 4.
+    summary_lane_weights : Dict[str, float]
+        The share of the job slots of each lane ('fast', 'normal', 'bulk') relative to the
+        others, per tenant. Default is `DEFAULT_LANE_WEIGHTS`.
+    fast_lane_max_document_bytes : int
+        The size up to which the stored source document of a job puts it in the fast lane, for
+        jobs of the normal priority. Default is 32768.
+    summary_max_in_flight_jobs : int
+        The largest number of summarization jobs waiting or running in each process; new jobs
+        are rejected with a 503 response beyond it. Default is 256.
+    summary_max_queue_wait_seconds : float
+        The longest estimated wait of a new summarization job for a slot, from the jobs in
+        flight and their measured duration, beyond which it is rejected with a 503 response, or
+        0 for no limit. Default is 60.
+    webhook_secret : Optional[str]
+        The secret of the HMAC-SHA256 signature of the deliveries to callback URLs, in the
+        `X-Webhook-Signature` header; deliveries are unsigned if it is not set. Default is None.
+    webhook_max_concurrency : int
+        The number of deliveries to callback URLs in progress at a time in each process, and the
+        size of the connection pool shared by them. Default is 8.
+    webhook_timeout_seconds : float
+        The timeout of each delivery attempt. Default is 10.0.
+    webhook_max_attempts : int
+        The number of attempts of a delivery before it is marked failed. Default is 8.
+    webhook_backoff_seconds : float
+        The delay before the first retry of a delivery, doubled for each later retry.
+        Default is 1.0.
+    webhook_max_backoff_seconds : float
+        The longest delay between two attempts of a delivery. Default is 600.0.
+    webhook_poll_interval_seconds : float
+        The number of seconds between the lookups of due deliveries in each process, which
+        picks up the retries and the deliveries left over by a restart; 0 disables the delivery
+        in this process. Default is 5.0.
+    webhook_allowed_hosts : List[str]
+        The only host names accepted in callback URLs, trusted to resolve to internal addresses
+        (see `app.webhooks.check_callback_url`); if empty, any host name whose addresses are all
+        public is accepted. Default is [].
+    default_language : Language
+        The language of the articles whose request does not set one, when their language is not
+        detected, and the language whose NLP resources are preloaded. Default is 'english'.
+    language_detection : bool
+        Whether the language of an article whose request does not set one is detected from its
+        extracted text (see `app.languages`); if False, it is the `default_language`.
+        Default is True.
+    language_cache_size : int
+        The number of languages whose tokenizer, stemmer, and stop words are kept loaded in each
+        process, the least recently used being evicted beyond it. Default is 4.
+    auto_methods : List[SummarizationMethod]
+        The methods the 'auto' method chooses from, the preferred first: a job takes the first
+        one predicted to rank the sentences of its document within its budget, or the fastest
+        one if none is. Default is `DEFAULT_AUTO_METHODS`.
+    auto_rank_budget_seconds : float
+        The largest predicted time to rank the sentences of a document of the method chosen by
+        'auto', further limited to a share of the remaining time of the job. Default is 1.0.
+    summary_cost_models : Dict[SummarizationMethod, CostModel]
+        The cost model of each method, which predicts its time to rank the sentences of a
+        document from the statistics of the document, as fitted by `benchmarks.cost_models`.
+        Methods that are not given keep their default models. Default is `DEFAULT_COST_MODELS`.
     """
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
     environment: str = "dev"
     testing: bool = False
+    embedded: bool = False
     database_url: Optional[AnyUrl] = None
+    database_replica_url: Optional[AnyUrl] = None
+    store_source_documents: bool = False
+    source_compression_level: int = Field(default=6, ge=1, le=9)
+    db_pool_min_size: int = Field(default=1, ge=0)
+    db_pool_max_size: int = Field(default=5, ge=1)
+    db_statement_cache_size: int = Field(default=100, ge=0)
+    db_max_inactive_connection_lifetime: float = Field(default=300.0, ge=0)
+    rate_limiter_mode: Literal["redis", "hybrid", "memory"] = Field(
+        default="redis", validate_default=True
+    )
+    rate_limiter_sync_interval: float = Field(default=1.0, gt=0)
+    rate_limiter_sync_threshold: float = Field(default=0.8, gt=0, le=1)
+    rate_limiter_fail_open: bool = True
+    rate_limit_policies: Dict[str, Dict[str, RateLimitPolicy]] = Field(
+        default_factory=lambda: dict(DEFAULT_RATE_LIMIT_POLICIES)
+    )
+    rate_limit_api_keys: Dict[str, str] = Field(default_factory=dict)
+    trusted_proxy_hops: int = Field(default=1, ge=0)
+    profiling_enabled: Optional[bool] = Field(default=None, validate_default=True)
+    admin_api_key: Optional[str] = None
+    preload_nlp: bool = True
+    summary_deadline_seconds: float = Field(default=120.0, gt=0)
+    summary_retention_days: Optional[int] = Field(default=None, gt=0)
+    summary_retention_mode: Literal["archive", "drop"] = "archive"
+    summary_partition_premake_months: int = Field(default=3, ge=1)
+    retention_interval_seconds: float = Field(default=3600.0, ge=0)
+    canonical_strip_params: List[str] = Field(default_factory=lambda: list(DEFAULT_TRACKING_PARAMS))
+    canonical_link_resolution: bool = True
+    summary_cache_ttl_seconds: float = Field(default=86400.0, ge=0)
+    near_duplicate_detection: bool = True
+    near_duplicate_max_distance: int = Field(default=3, ge=0, le=3)
+    summary_job_concurrency: int = Field(default=4, ge=1)
+    summary_lane_weights: Dict[str, float] = Field(
+        default_factory=lambda: dict(DEFAULT_LANE_WEIGHTS)
+    )
+    fast_lane_max_document_bytes: int = Field(default=32768, ge=0)
+    summary_max_in_flight_jobs: int = Field(default=256, ge=1)
+    summary_max_queue_wait_seconds: float = Field(default=60.0, ge=0)
+    webhook_secret: Optional[str] = None
+    webhook_max_concurrency: int = Field(default=8, ge=1)
+    webhook_timeout_seconds: float = Field(default=10.0, gt=0)
+    webhook_max_attempts: int = Field(default=8, ge=1)
+    webhook_backoff_seconds: float = Field(default=1.0, ge=0)
+    webhook_max_backoff_seconds: float = Field(default=600.0, ge=0)
+    webhook_poll_interval_seconds: float = Field(default=5.0, ge=0)
+    webhook_allowed_hosts: List[str] = Field(default_factory=list)
+    default_language: Language = Language.english
+    language_detection: bool = True
+    language_cache_size: int = Field(default=4, ge=1)
+    auto_methods: List[SummarizationMethod] = Field(
+        default_factory=lambda: list(DEFAULT_AUTO_METHODS), min_length=1
+    )
+    auto_rank_budget_seconds: float = Field(default=1.0, gt=0)
+    summary_cost_models: Dict[SummarizationMethod, CostModel] = Field(
+        default_factory=lambda: dict(DEFAULT_COST_MODELS)
+    )
+
+    @field_validator("rate_limiter_mode")
+    @classmethod
+    def embedded_rate_limiter_mode(
+        cls, mode: Literal["redis", "hybrid", "memory"], info: ValidationInfo
+    ) -> Literal["redis", "hybrid", "memory"]:
+        """
+        Count requests in the process in embedded mode, where there is no Redis.
+        """
+        return "memory" if info.data.get("embedded") else mode
+
+    @field_validator("rate_limit_policies")
+    @classmethod
+    def merge_default_policies(
+        cls, policies: Dict[str, Dict[str, RateLimitPolicy]]
+    ) -> Dict[str, Dict[str, RateLimitPolicy]]:
+        """
+        Fill in the default policies of the routes that are not configured, and ensure that every
+        route has a policy for the default tier.
+        """
+        policies = {**DEFAULT_RATE_LIMIT_POLICIES, **policies}
+        for route, tiers in policies.items():
+            if DEFAULT_RATE_LIMIT_TIER not in tiers:
+                raise ValueError(f"Route '{route}' has no '{DEFAULT_RATE_LIMIT_TIER}' tier policy")
+        return policies
+
+    @field_validator("auto_methods")
+    @classmethod
+    def concrete_auto_methods(cls, methods: List[SummarizationMethod]) -> List[SummarizationMethod]:
+        """
+        Ensure that 'auto' does not choose itself.
+        """
+        if SummarizationMethod.auto in methods:
+            raise ValueError("The 'auto' method cannot choose itself")
+        return methods
+
+    @field_validator("summary_cost_models")
+    @classmethod
+    def merge_default_cost_models(
+        cls, cost_models: Dict[SummarizationMethod, CostModel]
+    ) -> Dict[SummarizationMethod, CostModel]:
+        """
+        Fill in the default cost models of the methods that are not configured.
+        """
+        return {**DEFAULT_COST_MODELS, **cost_models}
+
+    @field_validator("profiling_enabled")
+    @classmethod
+    def default_profiling_enabled(cls, enabled: Optional[bool], info: ValidationInfo) -> bool:
+        """
+        Disable profiling in production unless it is explicitly enabled.
+        """
+        if enabled is None:
+            return info.data.get("environment") != "prod"
+        return enabled
 
 
 @lru_cache()
@@ -0,0 +1,129 @@
+from typing import Dict, Mapping, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from app.models.pydantic_model import SummarizationMethod
+
+# The share of the remaining time of a job that the predicted ranking time of the method chosen
+# for 'auto' may use, a margin for the error of the cost models
+DEADLINE_SHARE = 0.5
+
+
+def document_features(sentences: int, words: int, terms: int) -> Tuple[float, ...]:
+    """
+    The statistics of a document that the cost of ranking its sentences grows with, in the order
+    of the coefficients of `CostModel`: a constant, the number of words (each one is stemmed),
+    the number of pairs of sentences (compared by the graph-based methods), and the cost of the
+    singular value decomposition of the term-sentence matrix (LSA).
+
+    Parameters
+    ----------
+    sentences : int
+        The number of sentences of the document.
+    words : int
+        The number of words of the document.
+    terms : int
+        The size of the vocabulary of the document, its number of unique (case-insensitive)
+        words.
+
+    Returns
+    -------
+    Tuple[float, ...]
+        The features of the document.
+    """
+    smaller, larger = sorted((sentences, terms))
+    return (1.0, float(words), float(sentences) ** 2, float(smaller) ** 2 * larger)
+
+
+class CostModel(BaseModel):
+    """
+    The time a summarization method takes to rank the sentences of a document, predicted as a
+    linear combination of the `document_features` of the document. The coefficients are fitted
+    to the timings of the method over the benchmark corpus (see `benchmarks.cost_models`).
+
+    Attributes
+    ----------
+    base_seconds : float
+        The fixed cost of a document.
+    word_seconds : float
+        The cost of each word.
+    pair_seconds : float
+        The cost of each pair of sentences.
+    svd_seconds : float
+        The cost of each unit of `min(sentences, terms) ** 2 * max(sentences, terms)`, the
+        complexity of the singular value decomposition.
+    """
+
+    base_seconds: float = Field(default=0.0, ge=0)
+    word_seconds: float = Field(default=0.0, ge=0)
+    pair_seconds: float = Field(default=0.0, ge=0)
+    svd_seconds: float = Field(default=0.0, ge=0)
+
+    def predict(self, sentences: int, words: int, terms: int) -> float:
+        """
+        The predicted time in seconds to rank the sentences of a document.
+        """
+        coefficients = (self.base_seconds, self.word_seconds, self.pair_seconds, self.svd_seconds)
+        features = document_features(sentences, words, terms)
+        return sum(coefficient * feature for coefficient, feature in zip(coefficients, features))
+
+
+# The cost models of the methods, fitted with `python -m benchmarks.cost_models --max-seconds 3`
+# on one core of an x86-64 server; refit them on the hardware of the deployment
+DEFAULT_COST_MODELS: Dict[SummarizationMethod, CostModel] = {
+    SummarizationMethod.lsa: CostModel(word_seconds=3.64e-5, svd_seconds=9.88e-10),
+    SummarizationMethod.lex_rank: CostModel(word_seconds=1.53e-5, pair_seconds=1.08e-5),
+    SummarizationMethod.text_rank: CostModel(word_seconds=1.32e-5, pair_seconds=2.84e-6),
+    SummarizationMethod.edmundson: CostModel(word_seconds=3.11e-5, pair_seconds=1.45e-8),
+    SummarizationMethod.centroid: CostModel(base_seconds=2.03e-3, word_seconds=5.13e-7),
+    SummarizationMethod.sum_basic: CostModel(base_seconds=3.84e-3, word_seconds=4.45e-7),
+    SummarizationMethod.luhn: CostModel(base_seconds=2.12e-3, word_seconds=5.69e-7),
+}
+
+# The methods 'auto' chooses from, the preferred first
+DEFAULT_AUTO_METHODS = [
+    SummarizationMethod.lex_rank,
+    SummarizationMethod.lsa,
+    SummarizationMethod.text_rank,
+    SummarizationMethod.centroid,
+]
+
+
+def choose_method(
+    methods: Sequence[SummarizationMethod],
+    cost_models: Mapping[SummarizationMethod, CostModel],
+    budget: float,
+    sentences: int,
+    words: int,
+    terms: int,
+) -> SummarizationMethod:
+    """
+    Choose the method of a summarization job of the 'auto' method: the first of the preferred
+    methods whose predicted time to rank the sentences of the document is within the budget, or
+    the fastest of them if none is.
+
+    Parameters
+    ----------
+    methods : Sequence[SummarizationMethod]
+        The methods to choose from, the preferred first; each one has a cost model.
+    cost_models : Mapping[SummarizationMethod, CostModel]
+        The cost model of each method.
+    budget : float
+        The time in seconds the ranking may take.
+    sentences : int
+        The number of sentences of the document.
+    words : int
+        The number of words of the document.
+    terms : int
+        The size of the vocabulary of the document.
+
+    Returns
+    -------
+    SummarizationMethod
+        The chosen method.
+    """
+    costs = [cost_models[method].predict(sentences, words, terms) for method in methods]
+    for method, cost in zip(methods, costs):
+        if cost <= budget:
+            return method
+    return min(zip(methods, costs), key=lambda item: item[1])[0]
@@ -1,43 +1,577 @@
-from fastapi_limiter.depends import RateLimiter
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from math import ceil
+from typing import Any, Dict, List, Optional, Tuple
 
+import redis as pyredis
+from fastapi import HTTPException
+from fastapi_limiter import FastAPILimiter
+from starlette.requests import Request
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS, HTTP_503_SERVICE_UNAVAILABLE
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class CustomRateLimiter(RateLimiter):
+from app.config import DEFAULT_RATE_LIMIT_TIER, Settings, get_settings
+
+logger = logging.getLogger("uvicorn")
+
+# The header carrying the API key that selects a client's rate limit tier
+API_KEY_HEADER = "X-API-Key"
+
+# Counts a hit in a sliding window approximated by weighting the previous fixed window's count by
+# its overlap with the sliding window; the window position is taken from the Redis clock so that
+# all replicas agree on it
+# KEYS[1]: rate limit key, ARGV[1]: limit, ARGV[2]: window in milliseconds
+# Returns {remaining, retry_after} where retry_after is 0 if the hit is allowed, otherwise the
+# number of milliseconds until a hit would be allowed again
+SLIDING_WINDOW_LUA_SCRIPT = """local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local index = math.floor(now / window)
+local elapsed = now - index * window
+local current_key = KEYS[1] .. ':' .. index
+local previous = tonumber(redis.call('GET', KEYS[1] .. ':' .. (index - 1)) or '0')
+local current = tonumber(redis.call('GET', current_key) or '0')
+local estimate = previous * (window - elapsed) / window + current
+if estimate + 1 > limit then
+    local retry_after
+    if current + 1 > limit then
+        retry_after = window - elapsed + window * (1 - (limit - 1) / current)
+    else
+        retry_after = window * (1 - (limit - current - 1) / previous) - elapsed
+    end
+    return {0, math.max(1, math.ceil(retry_after))}
+end
+redis.call('INCR', current_key)
+redis.call('PEXPIRE', current_key, window * 2)
+return {math.floor(limit - estimate - 1), 0}"""
+
+# Adds the hits already allowed locally to the window, then admits one more hit if the limit allows
+# KEYS[1]: window key, ARGV[1]: locally allowed hits, ARGV[2]: limit, ARGV[3]: window in milliseconds
+# Returns {count, pexpire} where pexpire is 0 if the hit is allowed
+SYNC_CHECK_LUA_SCRIPT = """local key = KEYS[1]
+local pending = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local current = redis.call('INCRBY', key, pending)
+if redis.call('PTTL', key) < 0 then
+    redis.call('PEXPIRE', key, ARGV[3])
+end
+if current + 1 > limit then
+    return {current, redis.call('PTTL', key)}
+end
+redis.call('INCR', key)
+return {current + 1, 0}"""
+
+
+# The SHA1 digests of the scripts loaded with SCRIPT LOAD, keyed by script
+script_shas: Dict[str, str] = {}
+
+
+async def eval_script(script: str, key: str, *args: Any) -> Any:
+    """
+    Run a Lua script on a single key with EVALSHA, loading it with SCRIPT LOAD first if this
+    process has not loaded it yet or if the Redis script cache was flushed.
+
+    Parameters
+    ----------
+    script : str
+        The Lua script.
+    key : str
+        The Redis key passed to the script as `KEYS[1]`.
+    *args : Any
+        The arguments passed to the script as `ARGV`.
+
+    Returns
+    -------
+    Any
+        The reply of the script.
+    """
+    redis = FastAPILimiter.redis
+    if redis is None:
+        raise pyredis.exceptions.ConnectionError("FastAPILimiter has not been initialized")
+    if script not in script_shas:
+        script_shas[script] = await redis.script_load(script)
+    try:
+        return await redis.evalsha(script_shas[script], 1, key, *args)
+    except pyredis.exceptions.NoScriptError:
+        # The script cache was flushed, e.g., after a Redis restart
+        script_shas[script] = await redis.script_load(script)
+        return await redis.evalsha(script_shas[script], 1, key, *args)
+
+
+@dataclass
+class LocalBucket:
+    """
+    The local view of one rate limit key within a fixed window.
+
+    Attributes
+    ----------
+    window : int
+        The index of the fixed window (milliseconds since the epoch divided by the window size).
+    milliseconds : int
+        The size of the window in milliseconds.
+    pending : int
+        The number of hits allowed locally that have not been flushed to Redis yet.
+    in_flight : int
+        The number of hits being flushed to Redis, owned by the flush that sends them so that
+        a concurrent flush does not send them again.
+    synced : int
+        The total number of hits in the window across all processes, as of the last sync.
+    reconciled : bool
+        Whether Redis has been consulted for this window; until then, the hits of the other
+        processes are unknown and no hit is allowed locally.
+    """
+
+    window: int
+    milliseconds: int
+    pending: int = 0
+    in_flight: int = 0
+    synced: int = 0
+    reconciled: bool = False
+
+    @property
+    def estimate(self) -> int:
+        return self.synced + self.in_flight + self.pending
+
+    def start_flush(self) -> int:
+        """
+        Take the pending hits over for a flush to Redis, returning their number.
+        """
+        pending, self.pending = self.pending, 0
+        self.in_flight += pending
+        return pending
+
+    def end_flush(self, flushed: int, count: Optional[int]) -> None:
+        """
+        End a flush of hits taken over by `start_flush`, with the count of the window in Redis
+        after it, or None if it failed, in which case its hits are pending again.
+        """
+        self.in_flight -= flushed
+        if count is None:
+            self.pending += flushed
+        else:
+            # A concurrent flush may have returned a later count first
+            self.synced = max(self.synced, count)
+            self.reconciled = True
+
+
+class HybridRateLimitState(object):
+    """
+    The per-process state of the hybrid rate limiter.
+
+    Hits are counted in local buckets and flushed to Redis in periodic, pipelined batches, which
+    also refresh each bucket's view of the hits counted by the other processes. Redis is only
+    consulted synchronously once a bucket's estimate gets close to the limit.
+    """
+
+    def __init__(self) -> None:
+        self.buckets: Dict[str, LocalBucket] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, interval: float) -> None:
+        """
+        Start the periodic background sync of the local buckets with Redis.
+
+        Parameters
+        ----------
+        interval : float
+            The number of seconds between syncs.
+        """
+        self.buckets.clear()
+        self._task = asyncio.create_task(self._sync_forever(interval))
+
+    async def stop(self) -> None:
+        """
+        Stop the periodic sync and flush the remaining local hits to Redis.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.sync()
+        except (pyredis.exceptions.RedisError, OSError) as error:
+            logger.warning(f"Failed to flush local rate limit buckets to Redis: {error}")
+        self.buckets.clear()
+
+    async def _sync_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except (pyredis.exceptions.RedisError, OSError) as error:
+                # Pending hits are kept and flushed by the next successful sync
+                logger.warning(f"Failed to sync local rate limit buckets with Redis: {error}")
+
+    async def sync(self) -> None:
+        """
+        Flush the pending hits of all current buckets to Redis in a single pipeline and refresh
+        their view of the global counts. Buckets of expired windows are dropped.
+        """
+        now = int(time.time() * 1000)
+        self.buckets = {
+            key: bucket
+            for key, bucket in self.buckets.items()
+            if bucket.window == now // bucket.milliseconds
+        }
+        if not self.buckets or FastAPILimiter.redis is None:
+            return
+        items: List[Tuple[str, LocalBucket, int]] = [
+            (key, bucket, bucket.start_flush()) for key, bucket in self.buckets.items()
+        ]
+        try:
+            async with FastAPILimiter.redis.pipeline(transaction=False) as pipe:
+                for key, bucket, pending in items:
+                    pipe.incrby(window_key(key, bucket.window), pending)
+                    pipe.pexpire(window_key(key, bucket.window), bucket.milliseconds)
+                results = await pipe.execute()
+        except BaseException:
+            for key, bucket, pending in items:
+                bucket.end_flush(pending, None)
+            raise
+        for (key, bucket, pending), count in zip(items, results[::2]):
+            # Hits allowed locally while the pipeline was in flight remain pending
+            bucket.end_flush(pending, int(count))
+
+    async def check(
+        self, key: str, times: int, milliseconds: int, threshold: float, fail_open: bool = True
+    ) -> int:
+        """
+        Count a hit against the limit of a key.
+
+        Parameters
+        ----------
+        key : str
+            The rate limit key of the client, route, and dependency.
+        times : int
+            The number of hits allowed per window.
+        milliseconds : int
+            The size of the window in milliseconds.
+        threshold : float
+            The fraction of the limit beyond which Redis is checked synchronously.
+        fail_open : bool
+            Whether the hit is allowed, and so counted locally, if Redis has to be checked
+            synchronously but is unreachable.
+
+        Returns
+        -------
+        int
+            0 if the hit is allowed, otherwise the number of milliseconds until the window resets.
+
+        Raises
+        ------
+        redis.exceptions.RedisError, OSError
+            If Redis has to be checked synchronously but is unreachable; the hit is then counted
+            locally if `fail_open`, for the caller to allow it.
+        """
+        now = int(time.time() * 1000)
+        window = now // milliseconds
+        bucket = self.buckets.get(key)
+        if bucket is None or bucket.window != window or bucket.milliseconds != milliseconds:
+            bucket = self.buckets[key] = LocalBucket(window=window, milliseconds=milliseconds)
+        window_remaining = (window + 1) * milliseconds - now
+        # The global count only grows within a window, so a local estimate over the limit is final
+        if bucket.estimate + 1 > times:
+            return window_remaining
+        if bucket.reconciled and bucket.estimate + 1 < times * threshold:
+            bucket.pending += 1
+            return 0
+        # First hit of the window or close to the limit: reconcile with Redis before allowing it
+        pending = bucket.start_flush()
+        bucket.reconciled = True
+        try:
+            count, pexpire = await self._sync_check(
+                window_key(key, window), pending, times, milliseconds
+            )
+        except BaseException as error:
+            bucket.end_flush(pending, None)
+            if fail_open and isinstance(error, (pyredis.exceptions.RedisError, OSError)):
+                bucket.pending += 1
+            raise
+        bucket.end_flush(pending, count)
+        return pexpire
+
+    async def _sync_check(
+        self, key: str, pending: int, times: int, milliseconds: int
+    ) -> Tuple[int, int]:
+        count, pexpire = await eval_script(
+            SYNC_CHECK_LUA_SCRIPT, key, str(pending), str(times), str(milliseconds)
+        )
+        return int(count), int(pexpire)
+
+    def remaining(self, key: str, times: int) -> int:
+        """
+        The number of hits this process estimates are left in the current window of a key.
+        """
+        bucket = self.buckets.get(key)
+        return max(times - (bucket.estimate if bucket else 0), 0)
+
+
+def window_key(key: str, window: int) -> str:
     """
-    A custom implementation of RateLimiter with hashability and equality
-    to support FastAPI's dependency overrides mechanism.
+    The Redis key that counts the hits of a rate limit key within a fixed window.
+    """
+    return f"{key}:{window}"
+
 
-    This class ensures that instances are comparable and hashable, which allows
-    FastAPI to correctly override the dependency in tests.
+# Shared by all limiter instances of this process; started and stopped in the app lifespan
+hybrid_state = HybridRateLimitState()
+
+
+async def sliding_window_check(key: str, times: int, milliseconds: int) -> Tuple[int, int]:
     """
+    Count a hit against the limit of a key in a sliding window, with a single Redis round trip.
+
+    Parameters
+    ----------
+    key : str
+        The rate limit key of the client and route.
+    times : int
+        The number of hits allowed per window.
+    milliseconds : int
+        The size of the window in milliseconds.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The number of hits left in the window, and 0 if the hit is allowed, otherwise the number
+        of milliseconds until a hit would be allowed again.
+    """
+    remaining, retry_after = await eval_script(
+        SLIDING_WINDOW_LUA_SCRIPT, key, str(times), str(milliseconds)
+    )
+    return int(remaining), int(retry_after)
+
+
+class MemoryRateLimitState(object):
+    """
+    The state of the in-process rate limiter of embedded runs, which have no Redis.
+
+    Hits are counted in the same sliding window as `SLIDING_WINDOW_LUA_SCRIPT`, in fixed window
+    counters that expire after two windows like the Redis keys of the script. The limits only hold
+    within a single process.
+    """
+
+    def __init__(self) -> None:
+        # The count and the expiry time in milliseconds of each fixed window counter
+        self.counters: Dict[str, Tuple[int, int]] = {}
+        self._next_prune = 0
 
-    def __init__(self, times: int, seconds: int) -> None:
+    def _get(self, key: str, now: int) -> int:
+        count, expires_at = self.counters.get(key, (0, 0))
+        return count if expires_at > now else 0
+
+    def prune(self, now: int) -> None:
+        """
+        Drop the expired counters, at most once per second.
+        """
+        if now < self._next_prune:
+            return
+        self.counters = {key: counter for key, counter in self.counters.items() if counter[1] > now}
+        self._next_prune = now + 1000
+
+    def check(self, key: str, times: int, milliseconds: int) -> Tuple[int, int]:
         """
-        Initialize a new CustomRateLimiter instance with the specified rate limiting settings.
+        Count a hit against the limit of a key in a sliding window.
 
         Parameters
         ----------
+        key : str
+            The rate limit key of the client and route.
         times : int
-            The number of requests allowed within the specified time window.
-        seconds : int
-            The time window in seconds within which the specified number of requests are allowed.
+            The number of hits allowed per window.
+        milliseconds : int
+            The size of the window in milliseconds.
+
+        Returns
+        -------
+        Tuple[int, int]
+            The number of hits left in the window, and 0 if the hit is allowed, otherwise the
+            number of milliseconds until a hit would be allowed again.
         """
-        super().__init__(times=times, seconds=seconds)
-        self.times = times
-        self.seconds = seconds
+        now = int(time.time() * 1000)
+        self.prune(now)
+        index = now // milliseconds
+        elapsed = now - index * milliseconds
+        current_key = window_key(key, index)
+        previous = self._get(window_key(key, index - 1), now)
+        current = self._get(current_key, now)
+        estimate = previous * (milliseconds - elapsed) / milliseconds + current
+        if estimate + 1 > times:
+            if current + 1 > times:
+                retry_after = milliseconds - elapsed + milliseconds * (1 - (times - 1) / current)
+            else:
+                retry_after = milliseconds * (1 - (times - current - 1) / previous) - elapsed
+            return 0, max(1, ceil(retry_after))
+        self.counters[current_key] = (current + 1, now + 2 * milliseconds)
+        return int(times - estimate - 1), 0
+
+
+# The counters of the 'memory' mode, shared by all limiter instances of this process
+memory_state = MemoryRateLimitState()
+
+
+def client_identity(request: Request, settings: Settings) -> Tuple[str, str]:
+    """
+    Identify the client of a request and its rate limit tier.
+
+    Clients sending a recognized API key in the `X-API-Key` header are identified by a digest of
+    the key, so that keys are never stored in Redis, and get the tier of that key. All other
+    clients are identified by their IP address under the default tier: the address appended to
+    `X-Forwarded-For` by the outermost of the `trusted_proxy_hops` proxies, or the peer address
+    of the connection without trusted proxies.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    settings : Settings
+        The application settings holding the API keys and the number of trusted proxies.
+
+    Returns
+    -------
+    Tuple[str, str]
+        The client tier and the client identifier.
+    """
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key and api_key in settings.rate_limit_api_keys:
+        digest = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return settings.rate_limit_api_keys[api_key], f"key:{digest}"
+    ip = getattr(request.client, "host", "")
+    # Each trusted proxy, e.g., Heroku's router, appends the address of its client to
+    # X-Forwarded-For; the entries before those are sent by the client and can be forged
+    hops = settings.trusted_proxy_hops
+    forwarded = [entry.strip() for entry in request.headers.get("X-Forwarded-For", "").split(",")]
+    if hops and len(forwarded) >= hops and forwarded[-hops]:
+        ip = forwarded[-hops]
+    return DEFAULT_RATE_LIMIT_TIER, f"ip:{ip}"
+
+
+class CustomRateLimiter(object):
+    """
+    A rate limiting dependency that enforces the policies of a route from the settings.
+
+    The policy is selected by the client's tier (see `client_identity`) from the route's entry in
+    `rate_limit_policies`. This class is hashable and comparable by route name, which allows
+    FastAPI's dependency overrides mechanism to replace it in tests.
+
+    In the default 'redis' `rate_limiter_mode`, every hit is counted atomically in a sliding window
+    with a single Lua script call. In the 'hybrid' mode, hits are counted in local per-process
+    fixed-window buckets that are synced with Redis in periodic batches, so most requests do not
+    wait on a Redis round trip and Redis is no longer a single point of failure. In the 'memory'
+    mode of embedded runs, hits are counted in the same sliding window within the process.
+
+    The `X-RateLimit-Limit` and `X-RateLimit-Remaining` headers, and `Retry-After` for rejected
+    requests, are added to the response by `RateLimitHeadersMiddleware`.
+    """
+
+    def __init__(self, route: str) -> None:
+        """
+        Initialize a new CustomRateLimiter instance for a route.
+
+        Parameters
+        ----------
+        route : str
+            The name of the route in `rate_limit_policies`.
+        """
+        self.route = route
 
     def __hash__(self) -> int:
         """
-        Generate a unique hash value based on a string representation of the rate limiting settings.
-        This allows instances of this class to be used as keys in dictionaries so FastAPI's dependency
-        overrides mechanism can correctly override the dependency in tests.
+        Generate a hash value based on the route name. This allows instances of this class to be
+        used as keys in dictionaries so FastAPI's dependency overrides mechanism can correctly
+        override the dependency in tests.
         """
-        return hash(f"limiter-{self.times}-{self.seconds}")
+        return hash(f"limiter-{self.route}")
 
     def __eq__(self, other: object) -> bool:
         """
-        Compare two CustomRateLimiter instances based on their `times` and `seconds` values.
-        This ensures that two instances with the same rate limiting settings are considered equal.
+        Compare two CustomRateLimiter instances based on their route names.
         """
         if isinstance(other, CustomRateLimiter):
-            return self.times == other.times and self.seconds == other.seconds
+            return self.route == other.route
         return False
+
+    async def __call__(self, request: Request) -> None:
+        """
+        Count the request against the limit of the client's tier, using the configured
+        `rate_limiter_mode`.
+
+        Raises
+        ------
+        HTTPException
+            429 if the limit is exceeded, or 503 if Redis is unreachable in hybrid mode and
+            `rate_limiter_fail_open` is False.
+        """
+        settings = get_settings()
+        tier, client = client_identity(request, settings)
+        policies = settings.rate_limit_policies[self.route]
+        policy = policies.get(tier, policies[DEFAULT_RATE_LIMIT_TIER])
+        milliseconds = policy.seconds * 1000
+        key = f"{FastAPILimiter.prefix}:{self.route}:{client}"
+
+        if settings.rate_limiter_mode == "hybrid":
+            try:
+                retry_after = await hybrid_state.check(
+                    key,
+                    policy.times,
+                    milliseconds,
+                    settings.rate_limiter_sync_threshold,
+                    settings.rate_limiter_fail_open,
+                )
+            except (pyredis.exceptions.RedisError, OSError) as error:
+                if not settings.rate_limiter_fail_open:
+                    raise HTTPException(HTTP_503_SERVICE_UNAVAILABLE, "Rate limiter unavailable")
+                # Fail open: the request was counted locally and the counts are flushed once Redis is back
+                logger.warning(f"Rate limiter failing open as Redis is unreachable: {error}")
+                retry_after = 0
+            remaining = hybrid_state.remaining(key, policy.times)
+        elif settings.rate_limiter_mode == "memory":
+            remaining, retry_after = memory_state.check(key, policy.times, milliseconds)
+        else:
+            remaining, retry_after = await sliding_window_check(key, policy.times, milliseconds)
+
+        headers = {"X-RateLimit-Limit": str(policy.times), "X-RateLimit-Remaining": str(remaining)}
+        if retry_after != 0:
+            headers["Retry-After"] = str(ceil(retry_after / 1000))
+        request.state.rate_limit_headers = headers
+        if retry_after != 0:
+            raise HTTPException(HTTP_429_TOO_MANY_REQUESTS, "Too Many Requests")
+
+
+class RateLimitHeadersMiddleware(object):
+    """
+    An ASGI middleware that adds the rate limit headers set by `CustomRateLimiter` to the
+    response.
+
+    The headers cannot be set on the response injected into the limiter dependency, since they
+    are discarded when an endpoint returns its own `Response`, as the read endpoints do.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Requests share this dict as their `state`, so the limiter's headers are visible here
+        state = scope.setdefault("state", {})
+
+        async def send_with_headers(message: Message) -> None:
+            headers = state.get("rate_limit_headers")
+            if message["type"] == "http.response.start" and headers:
+                raw_headers = [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in headers.items()
+                ]
+                message = {**message, "headers": [*message.get("headers", []), *raw_headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
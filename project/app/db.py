@@ -1,35 +1,132 @@
 import logging
 import os
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict, Optional, Union
 from urllib.parse import quote
 
 import redis.asyncio as redis
 from fastapi import FastAPI
 from fastapi_limiter import FastAPILimiter
-from tortoise import Tortoise, run_async
+from tortoise import BaseDBAsyncClient, Tortoise, connections, run_async
+from tortoise.backends.base.config_generator import expand_db_url
 from tortoise.contrib.fastapi import RegisterTortoise
 
+from app.config import Settings, get_settings
+from app.custom_rate_limiter import hybrid_state
+
 logger = logging.getLogger("uvicorn")
 
-# Configuration for Tortoise ORM and Aerich migrations: docker compose exec <service-name> aerich init -t app.db.TORTOISE_ORM
-TORTOISE_ORM = {
+# Tortoise connection aliases of the primary database and of the optional read replica
+PRIMARY_CONNECTION = "default"
+REPLICA_CONNECTION = "replica"
+
+# The database of embedded runs without a DATABASE_URL, private to the process
+EMBEDDED_DATABASE_URL = "sqlite://:memory:"
+
+
+def get_connection_config(
+    db_url: Optional[str], settings: Settings
+) -> Union[Dict[str, Any], str, None]:
+    """
+    Build the Tortoise connection config for a database URL.
+
+    PostgreSQL URLs are expanded so that the asyncpg pool is sized from the settings and uses the
+    instrumented client in `app.db_pool`, which records pool telemetry. Other URLs (e.g., SQLite
+    for tests) are returned unchanged.
+
+    Parameters
+    ----------
+    db_url : Optional[str]
+        The database URL.
+    settings : Settings
+        The application settings holding the connection pool configuration.
+
+    Returns
+    -------
+    Union[Dict[str, Any], str, None]
+        The connection config accepted by Tortoise for this URL.
+    """
+    if not db_url:
+        return db_url
+    config = expand_db_url(db_url)
+    if config["engine"] != "tortoise.backends.asyncpg":
+        return db_url
+    config["engine"] = "app.db_pool"
+    config["credentials"].update(
+        {
+            "minsize": settings.db_pool_min_size,
+            "maxsize": settings.db_pool_max_size,
+            "statement_cache_size": settings.db_statement_cache_size,
+            "max_inactive_connection_lifetime": settings.db_max_inactive_connection_lifetime,
+        }
+    )
+    return config
+
+
+def get_tortoise_config(settings: Settings) -> Dict[str, Any]:
+    """
+    Build the Tortoise ORM config from the environment and the application settings. The read
+    replica connection is only registered if `database_replica_url` is set. In embedded mode, the
+    database defaults to an in-memory SQLite database.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The Tortoise ORM config.
+    """
     # During production, the DATABASE_URL environment variable is automatically set by Heroku
-    "connections": {"default": os.getenv("DATABASE_URL")},
-    "apps": {
-        "models": {
-            "models": ["app.models.tortoise_model", "aerich.models"],
-            "default_connection": "default",
+    db_url = os.getenv("DATABASE_URL") or (EMBEDDED_DATABASE_URL if settings.embedded else None)
+    db_connections = {PRIMARY_CONNECTION: get_connection_config(db_url, settings)}
+    if settings.database_replica_url:
+        db_connections[REPLICA_CONNECTION] = get_connection_config(
+            str(settings.database_replica_url), settings
+        )
+    return {
+        "connections": db_connections,
+        "apps": {
+            "models": {
+                "models": ["app.models.tortoise_model", "aerich.models"],
+                "default_connection": PRIMARY_CONNECTION,
+            },
         },
-    },
-}
+    }
+
+
+def has_replica() -> bool:
+    """
+    Whether a read replica connection is registered with Tortoise.
+    """
+    return REPLICA_CONNECTION in connections.db_config
+
+
+def get_read_connection() -> BaseDBAsyncClient:
+    """
+    Return the connection that read-only queries should use: the read replica if one is
+    registered, otherwise the primary database.
+
+    Returns
+    -------
+    BaseDBAsyncClient
+        The Tortoise connection for read-only queries.
+    """
+    return connections.get(REPLICA_CONNECTION if has_replica() else PRIMARY_CONNECTION)
+
+
+# Configuration for Tortoise ORM and Aerich migrations: docker compose exec <service-name> aerich init -t app.db.TORTOISE_ORM
+TORTOISE_ORM = get_tortoise_config(get_settings())
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
     Registers Tortoise ORM and Redis for rate limiting within a FastAPI application's
-    lifespan context.
+    lifespan context, and runs the retention job and the delivery of the summaries to their
+    callback URLs in the background while the application is up.
 
     This method ensures proper setup and teardown of both the database connection
     and Redis when the application starts and stops. The database schema is not
@@ -49,31 +146,62 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         connection is closed and Redis is disconnected when the application
         stops.
     """
-    # Initialize Redis for rate limiting
-    redis_endpoint = os.getenv("REDIS_ENDPOINT")
-    redis_encoded_password = quote(os.getenv("REDIS_PASSWORD"), safe="")  # type: ignore[arg-type]
-    redis_url = f"redis://:{redis_encoded_password}@{redis_endpoint}"
-    # The usename, password, hostname, etc. are all passed through urllib.parse.unquote internally
-    redis_connection = redis.from_url(redis_url, encoding="utf8")  # type: ignore[no-untyped-call]
-    await FastAPILimiter.init(redis_connection)
+    # Imported here since the retention job itself queries the connections configured here
+    from app.retention import retention_scheduler
+    from app.webhooks import webhook_dispatcher
+
+    settings = get_settings()
+    hybrid_rate_limiter = settings.rate_limiter_mode == "hybrid"
+    # Embedded runs count requests in the process and do not use Redis at all
+    redis_rate_limiter = settings.rate_limiter_mode != "memory"
+
+    if redis_rate_limiter:
+        # Initialize Redis for rate limiting
+        redis_endpoint = os.getenv("REDIS_ENDPOINT")
+        redis_encoded_password = quote(os.getenv("REDIS_PASSWORD"), safe="")  # type: ignore[arg-type]
+        redis_url = f"redis://:{redis_encoded_password}@{redis_endpoint}"
+        # In hybrid mode, bound the time spent on an unreachable Redis so that the limiter can fail open
+        redis_timeouts = (
+            {"socket_connect_timeout": 1, "socket_timeout": 1} if hybrid_rate_limiter else {}
+        )
+        # The usename, password, hostname, etc. are all passed through urllib.parse.unquote internally
+        redis_connection = redis.from_url(redis_url, encoding="utf8", **redis_timeouts)  # type: ignore[no-untyped-call]
+        try:
+            await FastAPILimiter.init(redis_connection)
+        except (redis.RedisError, OSError) as error:
+            # The hybrid limiter can serve requests from local buckets until Redis is reachable
+            if not (hybrid_rate_limiter and settings.rate_limiter_fail_open):
+                raise
+            logger.warning(f"Redis is unreachable, rate limiting from local buckets: {error}")
+    if hybrid_rate_limiter:
+        await hybrid_state.start(settings.rate_limiter_sync_interval)
 
     # Registers Tortoise-ORM with set-up and tear-down inside a FastAPI application’s lifespan
     async with RegisterTortoise(
         app=app,
-        db_url=os.environ.get("DATABASE_URL"),
-        modules={"models": ["app.models.tortoise_model"]},
-        # Do not generate schema immediately for production
-        generate_schemas=False,
+        # The connection pool is sized from the settings, see `get_connection_config`
+        config=get_tortoise_config(settings),
+        # Do not generate schema immediately for production, only for embedded runs that have no migrations
+        generate_schemas=settings.embedded,
         # True to add some automatic exception handlers for DoesNotExist & IntegrityError, not recommended for production
         add_exception_handlers=True,
     ):
         # DB connected
+        if settings.retention_interval_seconds:
+            await retention_scheduler.start(settings)
+        if settings.webhook_poll_interval_seconds:
+            await webhook_dispatcher.start(settings)
         yield
         # App teardown
+        await webhook_dispatcher.stop()
+        await retention_scheduler.stop()
     # Closed connection
 
-    # Teardown: Close Redis connection (warning is issued since fastapi_limiter calls the close method, which is deprecated in favor of aclose)
-    await FastAPILimiter.close()
+    if hybrid_rate_limiter:
+        await hybrid_state.stop()
+    if redis_rate_limiter:
+        # Teardown: Close Redis connection (warning is issued since fastapi_limiter calls the close method, which is deprecated in favor of aclose)
+        await FastAPILimiter.close()
 
 
 async def generate_schema() -> None:
@@ -0,0 +1,89 @@
+import time
+from typing import Any
+
+import asyncpg
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
+
+from app.metrics import (
+    DB_POOL_ACQUIRE_WAIT_SECONDS,
+    DB_POOL_IN_USE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_SIZE,
+)
+
+
+class InstrumentedPool(object):
+    """
+    A proxy around an `asyncpg.Pool` that records pool telemetry.
+
+    Tortoise acquires and releases connections through `pool.acquire()` and `pool.release()`
+    (both for single queries and for transactions), so timing these two calls captures how long
+    requests queue on the pool. Every other attribute is delegated to the wrapped pool.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, connection_name: str) -> None:
+        """
+        Initialize the proxy and publish the static pool gauges.
+
+        Parameters
+        ----------
+        pool : asyncpg.Pool
+            The pool created by the Tortoise asyncpg client.
+        connection_name : str
+            The Tortoise connection alias used to label the metrics.
+        """
+        self._pool = pool
+        self._connection_name = connection_name
+        DB_POOL_MAX_SIZE.labels(connection_name).set(pool.get_max_size())
+        self._update_gauges()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
+
+    def _update_gauges(self) -> None:
+        size = self._pool.get_size()
+        DB_POOL_SIZE.labels(self._connection_name).set(size)
+        DB_POOL_IN_USE.labels(self._connection_name).set(size - self._pool.get_idle_size())
+
+    async def acquire(self, *, timeout: Any = None) -> asyncpg.Connection:
+        """
+        Acquire a connection from the pool, recording the time spent waiting for it.
+        """
+        start = time.perf_counter()
+        try:
+            return await self._pool.acquire(timeout=timeout)
+        finally:
+            DB_POOL_ACQUIRE_WAIT_SECONDS.labels(self._connection_name).observe(
+                time.perf_counter() - start
+            )
+            self._update_gauges()
+
+    async def release(self, connection: asyncpg.Connection, *, timeout: Any = None) -> None:
+        """
+        Release a connection back to the pool.
+        """
+        try:
+            await self._pool.release(connection, timeout=timeout)
+        finally:
+            self._update_gauges()
+
+    async def close(self) -> None:
+        """
+        Gracefully close all connections in the pool.
+        """
+        await self._pool.close()
+        self._update_gauges()
+
+
+class InstrumentedAsyncpgDBClient(AsyncpgDBClient):
+    """
+    The Tortoise asyncpg client with a connection pool that records telemetry.
+    """
+
+    async def create_pool(self, **kwargs: Any) -> InstrumentedPool:  # type: ignore[override]
+        pool = await super().create_pool(**kwargs)
+        return InstrumentedPool(pool, self.connection_name)
+
+
+# Tortoise discovers the client class of an engine through the module level `client_class`
+client_class = InstrumentedAsyncpgDBClient
@@ -0,0 +1,83 @@
+import functools
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised at a checkpoint of a summarization job whose deadline has passed.
+
+    Attributes
+    ----------
+    stage : Optional[str]
+        The pipeline stage that was running when the deadline passed, if any.
+    """
+
+    def __init__(self, stage: Optional[str]) -> None:
+        self.stage = stage
+        super().__init__(f"The deadline passed during the {stage or 'queued'} stage")
+
+
+class Deadline(object):
+    """
+    The time budget of a summarization job, from when it was accepted to when it must complete.
+
+    The stages of the job check the remaining budget cooperatively: at the start of each stage
+    (`enter`), between the chunks of a download, and in the functions called repeatedly by the
+    tokenizer and the summarizers (`checkpoint`). Once the budget runs out, the next check raises
+    `DeadlineExceeded`, so the job stops at the next checkpoint rather than running to completion.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        """
+        Start a deadline.
+
+        Parameters
+        ----------
+        seconds : float
+            The budget in seconds, starting now.
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.stage: Optional[str] = None
+
+    def remaining(self) -> float:
+        """
+        The number of seconds left in the budget, negative once it has run out.
+        """
+        return self.expires_at - time.monotonic()
+
+    def extend(self, other: "Deadline") -> None:
+        """
+        Push the expiry back to that of another deadline if it is later, e.g., for work shared
+        by jobs of different deadlines.
+        """
+        self.expires_at = max(self.expires_at, other.expires_at)
+
+    def check(self) -> None:
+        """
+        Raise `DeadlineExceeded` if the budget has run out.
+        """
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(self.stage)
+
+    def enter(self, stage: str) -> None:
+        """
+        Record the start of a stage, checking that budget is left for it.
+        """
+        self.stage = stage
+        self.check()
+
+    def checkpoint(self, func: F) -> F:
+        """
+        Wrap a function so that the budget is checked before each call.
+        """
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            self.check()
+            return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import zlib
+from typing import List, Optional, Tuple
+
+from tortoise.exceptions import IntegrityError
+
+from app.config import get_settings
+from app.models.tortoise_model import SourceDocument
+
+logger = logging.getLogger("uvicorn")
+
+COMPRESSION = "zlib"
+
+# The annotated text produced by breadability: paragraphs of (text, annotations) fragments
+AnnotatedText = List[List[Tuple[str, Optional[Tuple[str, ...]]]]]
+
+
+def serialize_article(main_text: AnnotatedText) -> bytes:
+    """
+    Serialize the annotated text of an extracted article into canonical JSON bytes.
+
+    Parameters
+    ----------
+    main_text : AnnotatedText
+        The annotated paragraphs of the extracted article.
+
+    Returns
+    -------
+    bytes
+        The UTF-8 encoded JSON representation, stable across runs so it can be hashed.
+    """
+    return json.dumps(main_text, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize_article(data: bytes) -> AnnotatedText:
+    """
+    Deserialize JSON bytes back into the annotated text of an extracted article.
+
+    Parameters
+    ----------
+    data : bytes
+        The UTF-8 encoded JSON produced by `serialize_article`.
+
+    Returns
+    -------
+    AnnotatedText
+        The annotated paragraphs, with annotations restored to tuples as breadability emits them.
+    """
+    return [
+        [(text, tuple(annotations) if annotations else None) for text, annotations in paragraph]
+        for paragraph in json.loads(data)
+    ]
+
+
+def compress(data: bytes, level: int) -> bytes:
+    """
+    Compress bytes with the configured codec.
+    """
+    return zlib.compress(data, level)
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    """
+    Decompress bytes produced by `compress`.
+
+    Raises
+    ------
+    ValueError
+        If the compression codec is not supported.
+    """
+    if compression != COMPRESSION:
+        raise ValueError(f"Unsupported compression codec: {compression}")
+    return zlib.decompress(data)
+
+
+async def save(main_text: AnnotatedText) -> str:
+    """
+    Store the extracted article, deduplicated by content hash.
+
+    Parameters
+    ----------
+    main_text : AnnotatedText
+        The annotated paragraphs of the extracted article.
+
+    Returns
+    -------
+    str
+        The content hash under which the document is stored.
+    """
+    raw = serialize_article(main_text)
+    content_hash = hashlib.sha256(raw).hexdigest()
+    if await SourceDocument.exists(content_hash=content_hash):
+        return content_hash
+    content = compress(raw, get_settings().source_compression_level)
+    try:
+        await SourceDocument.create(
+            content_hash=content_hash,
+            content=content,
+            compression=COMPRESSION,
+            raw_size=len(raw),
+            compressed_size=len(content),
+        )
+    except IntegrityError:
+        # Another job stored the same document concurrently
+        logger.debug(f"Source document {content_hash} already stored")
+    return content_hash
+
+
+async def load(content_hash: str) -> Optional[AnnotatedText]:
+    """
+    Load a stored extracted article by its content hash.
+
+    Parameters
+    ----------
+    content_hash : str
+        The content hash returned by `save`.
+
+    Returns
+    -------
+    Optional[AnnotatedText]
+        The annotated paragraphs if the document is stored, otherwise None.
+    """
+    document = await SourceDocument.get_or_none(content_hash=content_hash)
+    if document is None:
+        return None
+    return deserialize_article(decompress(document.content, document.compression))
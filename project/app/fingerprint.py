@@ -0,0 +1,195 @@
+import hashlib
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+from tortoise.expressions import Q
+
+from app.document_store import AnnotatedText
+from app.models.pydantic_model import SummarizationMethod, SummaryStatus
+from app.models.tortoise_model import ContentFingerprint, TextSummary
+
+FINGERPRINT_BITS = 64
+# The fingerprint is split into bands of 16 bits, each indexed; two fingerprints that differ in
+# at most 3 bits share at least one band, so the lookup by band finds all of them
+BAND_BITS = 16
+BANDS = FINGERPRINT_BITS // BAND_BITS
+MAX_DISTANCE = BANDS - 1
+# The number of consecutive words of each shingle
+SHINGLE_WORDS = 3
+# Articles with fewer shingles are too short for their fingerprint to be meaningful
+MIN_SHINGLES = 16
+# The number of candidates sharing a band with a fingerprint that are compared with it
+MAX_CANDIDATES = 32
+WORD = re.compile(r"\w+")
+
+
+def article_text(main_text: AnnotatedText) -> str:
+    """
+    The plain text of an extracted article, without its annotations.
+    """
+    return "\n".join(text for paragraph in main_text for text, _ in paragraph)
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    The 64-bit SimHash of a text, over its shingles of `SHINGLE_WORDS` lowercase words.
+
+    Each bit of the fingerprint is the majority vote of that bit in the hashes of the shingles,
+    so texts sharing most of their shingles, such as the copies of a syndicated article with a
+    different header or footer, have fingerprints that differ in few bits.
+
+    Parameters
+    ----------
+    text : str
+        The text to fingerprint.
+
+    Returns
+    -------
+    Optional[int]
+        The unsigned fingerprint, or None if the text has fewer than `MIN_SHINGLES` shingles.
+    """
+    words = WORD.findall(text.lower())
+    shingles = [
+        " ".join(words[i : i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)
+    ]
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+            for shingle in shingles
+        ],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(FINGERPRINT_BITS, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return sum(1 << int(bit) for bit in np.flatnonzero(votes))
+
+
+def bands(fingerprint: int) -> List[int]:
+    """
+    Split a fingerprint into its `BANDS` bands of `BAND_BITS` bits, lowest first.
+    """
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """
+    The number of bits that differ between two fingerprints.
+    """
+    return bin(a ^ b).count("1")
+
+
+def to_signed(fingerprint: int) -> int:
+    """
+    The fingerprint as a signed 64-bit integer, as stored in a BIGINT column.
+    """
+    return (
+        fingerprint - (1 << FINGERPRINT_BITS)
+        if fingerprint >> (FINGERPRINT_BITS - 1)
+        else fingerprint
+    )
+
+
+def to_unsigned(value: int) -> int:
+    """
+    The fingerprint stored as a signed 64-bit integer by `to_signed`.
+    """
+    return value & ((1 << FINGERPRINT_BITS) - 1)
+
+
+async def find_near_duplicate(
+    fingerprint: int,
+    summarization_method: SummarizationMethod,
+    sentence_count: int,
+    max_distance: int,
+) -> Optional[Tuple[int, str]]:
+    """
+    Find the completed summary of a near-duplicate article with the same method and sentence
+    count: the candidates sharing a band with the fingerprint are looked up in the band indexes,
+    then the closest one within the maximum distance is chosen.
+
+    Parameters
+    ----------
+    fingerprint : int
+        The fingerprint of the article.
+    summarization_method : SummarizationMethod
+        The summarization method of the summary.
+    sentence_count : int
+        The number of sentences of the summary.
+    max_distance : int
+        The largest Hamming distance between the fingerprints of near-duplicates, at most
+        `MAX_DISTANCE`.
+
+    Returns
+    -------
+    Optional[Tuple[int, str]]
+        The ID and the text of the summary, or None if there is none.
+    """
+    band_filter = Q(
+        *(Q(**{f"band_{band}": value}) for band, value in enumerate(bands(fingerprint))),
+        join_type="OR",
+    )
+    candidates = (
+        await ContentFingerprint.filter(
+            band_filter,
+            summarization_method=summarization_method.value,
+            sentence_count=sentence_count,
+        )
+        .order_by("-summary_id")
+        .limit(MAX_CANDIDATES)
+        .values_list("summary_id", "simhash")
+    )
+    distances = {
+        summary_id: hamming_distance(fingerprint, to_unsigned(value))
+        for summary_id, value in candidates
+    }
+    # The closest summary first, the most recent one on a tie
+    matches = sorted(
+        (summary_id for summary_id, distance in distances.items() if distance <= max_distance),
+        key=lambda summary_id: (distances[summary_id], -summary_id),
+    )
+    if not matches:
+        return None
+    summaries = dict(
+        await TextSummary.filter(id__in=matches, status=SummaryStatus.completed).values_list(
+            "id", "summary"
+        )
+    )
+    # Unless it was deleted in the meantime
+    for summary_id in matches:
+        if summary_id in summaries:
+            return summary_id, summaries[summary_id]
+    return None
+
+
+async def save(
+    summary_id: int,
+    fingerprint: int,
+    summarization_method: SummarizationMethod,
+    sentence_count: int,
+) -> None:
+    """
+    Record the fingerprint of the article of a completed summary.
+
+    Parameters
+    ----------
+    summary_id : int
+        The ID of the summary.
+    fingerprint : int
+        The fingerprint of its article.
+    summarization_method : SummarizationMethod
+        The summarization method of the summary.
+    sentence_count : int
+        The number of sentences of the summary.
+    """
+    band_values = {f"band_{band}": value for band, value in enumerate(bands(fingerprint))}
+    await ContentFingerprint.create(
+        summary_id=summary_id,
+        simhash=to_signed(fingerprint),
+        summarization_method=summarization_method.value,
+        sentence_count=sentence_count,
+        **band_values,
+    )
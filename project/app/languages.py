@@ -0,0 +1,179 @@
+import itertools
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterator, List
+
+from sumy.nlp.stemmers import Stemmer
+from sumy.nlp.tokenizers import Tokenizer
+from sumy.utils import get_stop_words
+
+from app.document_store import AnnotatedText
+from app.metrics import LANGUAGE_RESOURCE_LOADS
+from app.models.pydantic_model import Language
+
+# The number of words at the start of an article from which its language is detected
+DETECTION_MAX_WORDS = 2000
+# The smallest share of the words of an article that must be function words of a language for
+# the article to be detected in that language
+DETECTION_MIN_SHARE = 0.05
+WORD = re.compile(r"\w+")
+
+# The most frequent function words of each language, mostly distinct across the languages. They
+# identify the language of a text cheaply, without loading the stop words of every language,
+# which are only loaded for the languages summarized
+FUNCTION_WORDS: Dict[str, FrozenSet[str]] = {
+    language.value: frozenset(words.split())
+    for language, words in {
+        Language.czech: "je se na že to jsou ale jako pro by které není také jsem byl",
+        Language.english: "the and of to is in that it was for with are this be have not",
+        Language.french: "le la les des et est une du que dans pour pas qui sur au avec",
+        Language.german: "der die das und ist nicht ein eine zu den mit sich auf dem des von",
+        Language.greek: "και το να η της του την με που για τα οι δεν είναι από",
+        Language.italian: "il di che della per non una sono gli del con è alla le si più",
+        Language.portuguese: "os do da em que não uma para com é são no na ao dos",
+        Language.slovak: "je sa na že to sú ale ako pre by ktoré nie aj som bol",
+        Language.spanish: "el los las del y en que por una con para es se no su al lo como",
+        Language.ukrainian: "і та в на що не з до це як він його від є але",
+    }.items()
+}
+
+
+@dataclass(frozen=True)
+class LanguageResources:
+    """
+    The NLP resources of a language shared by the summarization jobs of a process.
+
+    Attributes
+    ----------
+    language : str
+        The language, a value of `Language`.
+    tokenizer : Tokenizer
+        The sentence (Punkt, for most languages) and word tokenizer. Jobs that wrap its methods
+        work on a copy, see `rank_sentences`.
+    stemmer : Stemmer
+        The stemmer.
+    stop_words : FrozenSet[str]
+        The stop words.
+    """
+
+    language: str
+    tokenizer: Tokenizer
+    stemmer: Stemmer
+    stop_words: FrozenSet[str]
+
+
+def load_resources(language: str) -> LanguageResources:
+    """
+    Load the NLP resources of a language.
+
+    Raises
+    ------
+    LookupError
+        If the NLTK tokenizer data of the language is not installed.
+    """
+    return LanguageResources(
+        language, Tokenizer(language), Stemmer(language), get_stop_words(language)
+    )
+
+
+class LanguageCache(object):
+    """
+    The NLP resources of the languages recently summarized in a process, loaded on their first
+    use and evicted least recently used first.
+
+    Only the default language is loaded at startup (see `app.summarizer.preload`), so supporting
+    many languages costs neither startup time nor memory for the languages that are not
+    summarized, and the memory of a process is bounded by the size of the cache. The Punkt
+    model of a language is only referenced by its tokenizer here (NLTK does not cache the models
+    it loads for sumy), so evicting a language frees it; the Greek sentence tokenizer is the
+    exception, as NLTK caches the models used by `nltk.sent_tokenize`.
+    """
+
+    def __init__(self, loader: Callable[[str], LanguageResources] = load_resources) -> None:
+        self._loader = loader
+        self._resources: "OrderedDict[str, LanguageResources]" = OrderedDict()
+
+    @property
+    def languages(self) -> List[str]:
+        """
+        The languages loaded, the least recently used first.
+        """
+        return list(self._resources)
+
+    def get(self, language: str, max_size: int) -> LanguageResources:
+        """
+        The resources of a language, loaded if they are not cached, evicting the least recently
+        used languages beyond the size of the cache.
+
+        Parameters
+        ----------
+        language : str
+            The language, a value of `Language`.
+        max_size : int
+            The largest number of languages cached.
+
+        Returns
+        -------
+        LanguageResources
+            The resources of the language.
+
+        Raises
+        ------
+        LookupError
+            If the NLTK tokenizer data of the language is not installed.
+        """
+        resources = self._resources.get(language)
+        if resources is None:
+            resources = self._loader(language)
+            LANGUAGE_RESOURCE_LOADS.labels(language=language).inc()
+            self._resources[language] = resources
+        self._resources.move_to_end(language)
+        while len(self._resources) > max_size:
+            self._resources.popitem(last=False)
+        return resources
+
+
+def article_words(main_text: AnnotatedText) -> Iterator[str]:
+    """
+    The lowercase words of an extracted article, in order, read lazily.
+    """
+    for paragraph in main_text:
+        for text, _ in paragraph:
+            for match in WORD.finditer(text):
+                yield match.group().lower()
+
+
+def detect_language(main_text: AnnotatedText, default: str) -> str:
+    """
+    Detect the language of an extracted article from the share of its first
+    `DETECTION_MAX_WORDS` words that are function words of each language.
+
+    Parameters
+    ----------
+    main_text : AnnotatedText
+        The extracted article.
+    default : str
+        The language of the articles too short or too ambiguous to detect, e.g., those in a
+        language that is not supported.
+
+    Returns
+    -------
+    str
+        The language of the article, a value of `Language`.
+    """
+    counts = dict.fromkeys(FUNCTION_WORDS, 0)
+    total = 0
+    for word in itertools.islice(article_words(main_text), DETECTION_MAX_WORDS):
+        total += 1
+        for language, words in FUNCTION_WORDS.items():
+            if word in words:
+                counts[language] += 1
+    best = max(counts.values())
+    if not total or best < DETECTION_MIN_SHARE * total or counts.get(default) == best:
+        return default
+    return next(language for language, count in counts.items() if count == best)
+
+
+# The NLP resources of the languages summarized by this process
+language_cache = LanguageCache()
@@ -2,9 +2,12 @@ import logging
 import os
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
-from app.api import ping, summaries
+from app.api import admin, metrics, ping, summaries
+from app.custom_rate_limiter import RateLimitHeadersMiddleware
 from app.db import lifespan
+from app.metrics import RequestMetricsMiddleware
 
 logger = logging.getLogger("uvicorn")
 
@@ -15,9 +18,14 @@ def create_app() -> FastAPI:
         lifespan=lifespan,
         docs_url=os.getenv("DOCS_URL", None),
         redoc_url=None,
+        default_response_class=ORJSONResponse,
     )
+    application.add_middleware(RateLimitHeadersMiddleware)
+    application.add_middleware(RequestMetricsMiddleware)
     application.include_router(ping.router)
+    application.include_router(metrics.router)
     application.include_router(summaries.router, prefix="/summaries", tags=["summaries"])
+    application.include_router(admin.router, prefix="/admin", tags=["admin"])
     return application
 
 
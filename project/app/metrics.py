@@ -0,0 +1,201 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Connection pool telemetry, labelled by the Tortoise connection alias (e.g., 'default')
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Number of connections currently open in the database connection pool.",
+    ["connection"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_MAX_SIZE = Gauge(
+    "db_pool_max_size",
+    "Maximum number of connections allowed in the database connection pool.",
+    ["connection"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_in_use",
+    "Number of connections currently acquired from the database connection pool.",
+    ["connection"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_ACQUIRE_WAIT_SECONDS = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Time spent waiting to acquire a connection from the database connection pool.",
+    ["connection"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+# Summarization pipeline telemetry, labelled by stage and by summarization method
+SUMMARY_STAGES = (
+    "load",
+    "fetch",
+    "extract",
+    "store",
+    "fingerprint",
+    "tokenize",
+    "rank",
+    "db_update",
+)
+SUMMARY_STAGE_SECONDS = Histogram(
+    "summary_stage_seconds",
+    "Time spent in each stage of the summarization pipeline.",
+    ["stage", "method"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+# Summarization job scheduling, labelled by the lane of the job (see app/scheduler.py)
+SUMMARY_JOBS_QUEUED = Gauge(
+    "summary_jobs_queued",
+    "Number of summarization jobs scheduled but not started yet.",
+    ["lane"],
+    multiprocess_mode="livesum",
+)
+SUMMARY_JOB_WAIT_SECONDS = Histogram(
+    "summary_job_wait_seconds",
+    "Time summarization jobs wait from their request until they start.",
+    ["lane"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+SUMMARY_JOBS_IN_PROGRESS = Gauge(
+    "summary_jobs_in_progress",
+    "Number of summarization jobs currently running.",
+    multiprocess_mode="livesum",
+)
+# What new summaries reused from the recent summaries of the same canonical URL: 'summary' (the
+# summary itself, without running a job), 'source' (the stored article, without fetching it), or
+# 'none'
+SUMMARY_REUSE = Counter(
+    "summary_reuse",
+    "New summaries by what they reused from recent summaries of the same canonical URL.",
+    ["reused"],
+)
+
+# Summarization jobs that reused the summary of a near-duplicate article (see app/fingerprint.py)
+SUMMARY_NEAR_DUPLICATES = Counter(
+    "summary_near_duplicates",
+    "Summarization jobs that reused the summary of a near-duplicate article.",
+)
+
+WEBHOOK_DELIVERY_ATTEMPTS = Counter(
+    "webhook_delivery_attempts",
+    "Attempts to deliver summaries to their callback URLs, by outcome.",
+    ["outcome"],
+)
+
+SUMMARY_JOBS_REJECTED = Counter(
+    "summary_jobs_rejected",
+    "Summarization jobs rejected by admission control, by reason.",
+    ["reason"],
+)
+
+# Loads of the tokenizer, stemmer, and stop words of a language into the bounded cache of a
+# process (see app/languages.py); a steady rate means the cache is too small for the traffic
+LANGUAGE_RESOURCE_LOADS = Counter(
+    "language_resource_loads",
+    "Loads of the NLP resources of a language into the cache of a process, by language.",
+    ["language"],
+)
+
+# The methods chosen for the jobs of the 'auto' summarization method (see app/cost_model.py); a
+# shift towards the faster methods means that the documents grew or the budget is too tight
+SUMMARY_AUTO_METHODS = Counter(
+    "summary_auto_methods",
+    "Summarization jobs of the 'auto' method by the method chosen.",
+    ["method"],
+)
+
+# Request telemetry, labelled by the route template (e.g., '/summaries/{id}/') rather than the path
+HTTP_REQUEST_DURATION_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling each HTTP request, until the response is sent.",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+@contextmanager
+def time_stage(
+    stage: str, method: str, timings: Optional[Dict[str, float]] = None
+) -> Iterator[None]:
+    """
+    Time a stage of the summarization pipeline as a context manager, in `summary_stage_seconds`.
+
+    Parameters
+    ----------
+    stage : str
+        The pipeline stage, one of `SUMMARY_STAGES`.
+    method : str
+        The value of the summarization method.
+    timings : Optional[Dict[str, float]]
+        If given, the elapsed time in seconds is also recorded under the stage name, e.g., to
+        persist the timings of a single job.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        SUMMARY_STAGE_SECONDS.labels(stage=stage, method=method).observe(elapsed)
+        if timings is not None:
+            timings[stage] = elapsed
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Return the registry to expose. Under gunicorn, `PROMETHEUS_MULTIPROC_DIR` is set and the
+    metrics of all workers are aggregated from the files they write to that directory; otherwise
+    the metrics of the current process are exposed.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+class RequestMetricsMiddleware(object):
+    """
+    An ASGI middleware that records the latency of each HTTP request in
+    `http_request_duration_seconds`. Requests that match no route share the 'unmatched' route
+    label so that arbitrary paths cannot inflate the number of series.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router adds the matched route to the scope
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            ).observe(time.perf_counter() - start)
@@ -1,6 +1,12 @@
 from enum import Enum
+from typing import List, Optional
 
-from pydantic import AnyHttpUrl, BaseModel, Field
+from pydantic import AnyHttpUrl, BaseModel, Field, PositiveInt
+
+# The maximum number of ids accepted by the bulk fetch and bulk delete endpoints
+MAX_BULK_IDS = 100
+# The longest deadline a request may set for its summarization job, in seconds
+MAX_DEADLINE_SECONDS = 600
 
 
 class SummarizationMethod(str, Enum):
@@ -8,13 +14,89 @@ class SummarizationMethod(str, Enum):
     Enum representing available summarizer options.
 
     This enum maps to the available summarizer implementations, ensuring that
-    only valid summarizer names are used in the request.
+    only valid summarizer names are used in the request. The 'centroid', 'sum_basic', and 'luhn'
+    methods run in linear time in the size of the document, for a fast tier on long pages. The
+    'auto' method chooses one of the others for each document, from the statistics of the
+    document and the latency budget of its job (see `app.cost_model`).
     """
 
     lsa = "lsa"
     lex_rank = "lex_rank"
     text_rank = "text_rank"
     edmundson = "edmundson"
+    centroid = "centroid"
+    sum_basic = "sum_basic"
+    luhn = "luhn"
+    auto = "auto"
+
+
+# The methods that run in linear time in the size of the document (see `app.vector_summarizers`)
+LINEAR_TIME_METHODS = frozenset(
+    {SummarizationMethod.centroid, SummarizationMethod.sum_basic, SummarizationMethod.luhn}
+)
+
+
+class SummaryStatus(str, Enum):
+    """
+    Enum representing the state of a text summary's generation.
+
+    A summary is 'pending' until its background job ends, which then marks it 'completed',
+    'failed' (an error or an empty summary), or 'timed_out' (the job's deadline passed).
+    """
+
+    pending = "pending"
+    completed = "completed"
+    failed = "failed"
+    timed_out = "timed_out"
+
+
+class DeliveryStatus(str, Enum):
+    """
+    Enum representing the state of the delivery of a summary to its callback URL.
+
+    A delivery is 'waiting' until the job of its summary ends, then 'pending' until it is
+    'delivered' or, once its attempts are exhausted or the endpoint rejects it, 'failed'.
+    """
+
+    waiting = "waiting"
+    pending = "pending"
+    delivered = "delivered"
+    failed = "failed"
+
+
+class JobPriority(str, Enum):
+    """
+    Enum representing the priority of a summarization job, which selects its lane.
+
+    'interactive' jobs run in the fast lane, 'normal' jobs in the normal lane (or the fast lane
+    when their stored source document is short), and 'bulk' jobs, e.g., of a backfill, in the
+    bulk lane.
+    """
+
+    interactive = "interactive"
+    normal = "normal"
+    bulk = "bulk"
+
+
+class Language(str, Enum):
+    """
+    Enum representing the languages of the articles that can be summarized.
+
+    These are the languages for which `sumy` has a sentence tokenizer, a stemmer, and stop words
+    without optional dependencies. The language of an article is detected from its text unless
+    the request sets it (see `app.languages`).
+    """
+
+    czech = "czech"
+    english = "english"
+    french = "french"
+    german = "german"
+    greek = "greek"
+    italian = "italian"
+    portuguese = "portuguese"
+    slovak = "slovak"
+    spanish = "spanish"
+    ukrainian = "ukrainian"
 
 
 class SummaryPayloadSchema(BaseModel):
@@ -34,11 +116,26 @@ class SummaryPayloadSchema(BaseModel):
         The name of the summarizer to be used for generating the summary.
     sentence_count : Optional[int]
         The number of sentences to include in the summary. This field is optional.
+    deadline_seconds : Optional[float]
+        The time budget of the summarization job in seconds, from when the request is accepted;
+        if omitted, the configured `summary_deadline_seconds` applies. This field is optional.
+    priority : JobPriority
+        The priority of the summarization job. Default is 'normal'.
+    callback_url : Optional[AnyHttpUrl]
+        The URL to which the summary is POSTed once its job ends, instead of polling for it
+        (see `app.webhooks`). This field is optional.
+    language : Optional[Language]
+        The language of the article; if omitted, it is detected from the extracted text, or is
+        the configured `default_language` if detection is disabled. This field is optional.
     """
 
     url: AnyHttpUrl
     summarization_method: SummarizationMethod = SummarizationMethod.lsa
     sentence_count: int = Field(default=10, ge=5, le=30)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=MAX_DEADLINE_SECONDS)
+    priority: JobPriority = JobPriority.normal
+    callback_url: Optional[AnyHttpUrl] = None
+    language: Optional[Language] = None
 
 
 class SummaryResponseSchema(SummaryPayloadSchema):
@@ -62,11 +159,49 @@ class SummaryResponseSchema(SummaryPayloadSchema):
         The name of the summarizer to be used for generating the summary.
     sentence_count : Optional[int]
         The number of sentences to include in the summary. This field is optional.
+    deadline_seconds : Optional[float]
+        The time budget of the summarization job in seconds.
+    priority : JobPriority
+        The priority of the summarization job.
+    callback_url : Optional[AnyHttpUrl]
+        The URL to which the summary is POSTed once its job ends, if any.
+    language : Optional[Language]
+        The language of the article, if set by the request.
     """
 
     id: int
 
 
+class SummaryResummarizePayloadSchema(BaseModel):
+    """
+    Schema representing the request body to regenerate an existing text summary.
+
+    The URL is taken from the existing summary, whose stored source document (if any) is
+    reused so that no network I/O is required to run a different summarizer over it.
+
+    Attributes
+    ----------
+    summarization_method : str
+        The name of the summarizer to be used for generating the new summary.
+    sentence_count : Optional[int]
+        The number of sentences to include in the new summary. This field is optional.
+    deadline_seconds : Optional[float]
+        The time budget of the summarization job in seconds, from when the request is accepted;
+        if omitted, the configured `summary_deadline_seconds` applies. This field is optional.
+    priority : JobPriority
+        The priority of the summarization job. Default is 'normal'.
+    language : Optional[Language]
+        The language of the article; if omitted, it is detected from the extracted text. This
+        field is optional.
+    """
+
+    summarization_method: SummarizationMethod = SummarizationMethod.lsa
+    sentence_count: int = Field(default=10, ge=5, le=30)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0, le=MAX_DEADLINE_SECONDS)
+    priority: JobPriority = JobPriority.normal
+    language: Optional[Language] = None
+
+
 class SummaryUpdatePayloadSchema(BaseModel):
     """
     Schema representing the request body for updating an existing text summary in the database.
@@ -87,3 +222,16 @@ class SummaryUpdatePayloadSchema(BaseModel):
 
     url: AnyHttpUrl
     update_summary: str
+
+
+class SummaryIdsPayloadSchema(BaseModel):
+    """
+    Schema representing the request body of bulk operations on a list of summary IDs.
+
+    Attributes
+    ----------
+    ids : List[PositiveInt]
+        The IDs of the text summaries to operate on; between 1 and `MAX_BULK_IDS` IDs are allowed.
+    """
+
+    ids: List[PositiveInt] = Field(min_length=1, max_length=MAX_BULK_IDS)
@@ -1,7 +1,12 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
 from tortoise import fields
 from tortoise.contrib.pydantic import pydantic_model_creator
 from tortoise.models import Model
 
+from app.models.pydantic_model import DeliveryStatus, SummaryStatus
+
 
 class TextSummary(Model):
     """
@@ -22,6 +27,28 @@ class TextSummary(Model):
     created_at : datetime
         A timestamp that records when the summary was created. It is automatically
         set to the current date and time upon object creation.
+    source_hash : str
+        The content hash of the stored source document, if the extracted article was
+        persisted in the `SourceDocument` table. Internal and excluded from the API schema.
+    status : SummaryStatus
+        The state of the summary's generation: 'pending' until its background job ends, then
+        'completed', 'failed', or 'timed_out'.
+    canonical_url : str
+        The canonical form of the URL (see `app.canonical`), shared by the variants of the same
+        article. Indexed to find the summaries and the source documents that can be reused for a
+        new summary.
+    canonical_link : str
+        The canonical form of the `<link rel="canonical">` of the fetched page, if any. It is
+        only informative: it is declared by the page, which may not be the only one of its
+        host, so it is never used to reuse the summary.
+    language : str
+        The language of the article set by the request, or null if it is detected by the job
+        (see `SummaryDiagnostics.language`). Summaries are only reused for requests of the same
+        language.
+    selected_method : str
+        The method that ranked the sentences of the summary: the summarization method, or the
+        method chosen by the job for the 'auto' method. Null until the job ranks them, and for
+        summaries of near-duplicate articles, which are not ranked.
     """
 
     id = fields.IntField(primary_key=True)
@@ -32,6 +59,19 @@ class TextSummary(Model):
     sentence_count = fields.IntField(null=True)
     # Automatically set the field to now when the object is first created
     created_at = fields.DatetimeField(auto_now_add=True)
+    # Not a foreign key since many summaries can share a single deduplicated source document
+    source_hash = fields.CharField(max_length=64, null=True, db_index=True)
+    status = fields.CharEnumField(SummaryStatus, max_length=16, default=SummaryStatus.pending)
+    # Allow null for the records created before canonicalization; 2083 is the URL length limit
+    canonical_url = fields.CharField(max_length=2083, null=True, db_index=True)
+    canonical_link = fields.CharField(max_length=2083, null=True)
+    # Null when the language is detected from the article
+    language = fields.CharField(max_length=16, null=True)
+    selected_method = fields.CharField(max_length=16, null=True)
+
+    class PydanticMeta:
+        # Internal bookkeeping fields that are not part of the public API schema
+        exclude = ("source_hash",)
 
     def __str__(self) -> str:
         """
@@ -45,6 +85,244 @@ class TextSummary(Model):
         return self.url
 
 
+class SourceDocument(Model):
+    """
+    A data model storing the compressed extracted article of a fetched source document.
+
+    Documents are keyed by the SHA-256 hash of their serialized content, so identical articles
+    fetched for different summaries are stored only once. Summaries can then be regenerated
+    from the stored bytes without any network I/O.
+
+    Attributes
+    ----------
+    content_hash : str
+        The primary key, the hex digest of the SHA-256 hash of the uncompressed content.
+    content : bytes
+        The compressed, serialized extracted article.
+    compression : str
+        The name of the codec used to compress the content (e.g., 'zlib').
+    raw_size : int
+        The size of the uncompressed content in bytes.
+    compressed_size : int
+        The size of the compressed content in bytes.
+    created_at : datetime
+        A timestamp that records when the document was first stored.
+    """
+
+    content_hash = fields.CharField(max_length=64, primary_key=True)
+    content = fields.BinaryField()
+    compression = fields.CharField(max_length=16)
+    raw_size = fields.IntField()
+    compressed_size = fields.IntField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """
+        Returns the content hash as a string representation of the object.
+
+        Returns
+        -------
+        str
+            The content hash of the source document.
+        """
+        return self.content_hash
+
+
+class SummaryDiagnostics(Model):
+    """
+    A data model recording how the summary of a `TextSummary` was generated, so that slow
+    summaries can be queried and reproduced.
+
+    Attributes
+    ----------
+    summary_id : int
+        The primary key, the ID of the summary these diagnostics belong to.
+    engine : str
+        The summarizer implementation used (e.g., 'sumy.LsaSummarizer').
+    document_bytes : int
+        The size of the extracted article text in bytes (UTF-8).
+    document_sentences : int
+        The number of sentences in the extracted article.
+    document_terms : int
+        The number of unique (case-insensitive) terms in the extracted article.
+    language : str
+        The language whose tokenizer, stemmer, and stop words were used, set by the request or
+        detected from the extracted article.
+    stage_seconds : Dict[str, float]
+        The duration in seconds of each pipeline stage that ran, keyed by stage name (e.g.,
+        'fetch', 'tokenize', 'rank', 'db_update'). The 'fetch' stage is the wait of the job for
+        the article fetched, extracted, and stored once for the concurrent jobs of its URL.
+    total_seconds : float
+        The total duration of the summarization job in seconds.
+    created_at : datetime
+        A timestamp that records when the diagnostics were recorded.
+    """
+
+    # Not a foreign key so that the summary table can be partitioned or pruned independently
+    summary_id = fields.IntField(primary_key=True, generated=False)
+    # Null if the job failed before the corresponding step
+    engine = fields.CharField(max_length=64, null=True)
+    document_bytes = fields.IntField(null=True)
+    document_sentences = fields.IntField(null=True)
+    document_terms = fields.IntField(null=True)
+    language = fields.CharField(max_length=16, null=True)
+    stage_seconds = fields.JSONField(default=dict)
+    # Indexed to find the slowest summaries
+    total_seconds = fields.FloatField(db_index=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """
+        Returns the summary ID as a string representation of the object.
+
+        Returns
+        -------
+        str
+            The ID of the summary these diagnostics belong to.
+        """
+        return str(self.summary_id)
+
+
+class SummaryProfile(Model):
+    """
+    A data model storing the profile of a summarization job that was run under the profiler on
+    request, so that it can be downloaded from the admin endpoint.
+
+    Attributes
+    ----------
+    summary_id : int
+        The primary key, the ID of the profiled summary.
+    profiler : str
+        The name of the profiler that produced the profile (e.g., 'cProfile').
+    content : bytes
+        The profile in the `pstats` file format, as written by `cProfile.Profile.dump_stats`.
+    created_at : datetime
+        A timestamp that records when the profile was stored.
+    """
+
+    # Not a foreign key, as for the diagnostics of a summary
+    summary_id = fields.IntField(primary_key=True, generated=False)
+    profiler = fields.CharField(max_length=32)
+    content = fields.BinaryField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """
+        Returns the summary ID as a string representation of the object.
+
+        Returns
+        -------
+        str
+            The ID of the profiled summary.
+        """
+        return str(self.summary_id)
+
+
+class ContentFingerprint(Model):
+    """
+    A data model recording the SimHash fingerprint of the article of a completed summary, so
+    that the summaries of near-duplicate articles, e.g., syndicated on other sites, can be
+    reused (see `app.fingerprint`).
+
+    Attributes
+    ----------
+    summary_id : int
+        The primary key, the ID of the summary.
+    simhash : int
+        The 64-bit fingerprint of the article, stored as a signed integer.
+    band_0, band_1, band_2, band_3 : int
+        The four 16-bit bands of the fingerprint, each indexed to look up the candidate
+        near-duplicates of a fingerprint.
+    summarization_method : str
+        The summarization method of the summary.
+    sentence_count : int
+        The number of sentences of the summary.
+    created_at : datetime
+        A timestamp that records when the fingerprint was recorded.
+    """
+
+    # Not a foreign key, as for the diagnostics of a summary
+    summary_id = fields.IntField(primary_key=True, generated=False)
+    simhash = fields.BigIntField()
+    band_0 = fields.IntField(db_index=True)
+    band_1 = fields.IntField(db_index=True)
+    band_2 = fields.IntField(db_index=True)
+    band_3 = fields.IntField(db_index=True)
+    summarization_method = fields.CharField(max_length=32)
+    sentence_count = fields.IntField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """
+        Returns the summary ID as a string representation of the object.
+
+        Returns
+        -------
+        str
+            The ID of the summary of the fingerprinted article.
+        """
+        return str(self.summary_id)
+
+
+class WebhookDelivery(Model):
+    """
+    A data model recording the delivery of a summary to the callback URL of its request, so
+    that pending deliveries and their retries survive restarts (see `app.webhooks`).
+
+    Attributes
+    ----------
+    id : int
+        The primary key, sent in the `X-Webhook-Id` header so that receivers can deduplicate
+        the retries of a delivery.
+    summary_id : int
+        The ID of the summary to deliver.
+    callback_url : str
+        The URL to POST the summary to.
+    status : DeliveryStatus
+        The state of the delivery.
+    attempts : int
+        The number of attempts made so far.
+    next_attempt_at : Optional[datetime]
+        When the next attempt is due, for pending deliveries; an attempt in progress pushes it
+        back by a lease, so that it is retried if the process stops during the attempt.
+    response_status : Optional[int]
+        The HTTP status of the last response, if any.
+    last_error : Optional[str]
+        The error of the last failed attempt, if any.
+    created_at : datetime
+        A timestamp that records when the delivery was requested.
+    delivered_at : Optional[datetime]
+        A timestamp that records when the summary was delivered.
+    """
+
+    id = fields.IntField(primary_key=True)
+    # Not a foreign key, as for the diagnostics of a summary
+    summary_id = fields.IntField(db_index=True)
+    callback_url = fields.CharField(max_length=2083)
+    status = fields.CharEnumField(DeliveryStatus, max_length=16, default=DeliveryStatus.waiting)
+    attempts = fields.IntField(default=0)
+    next_attempt_at = fields.DatetimeField(null=True)
+    response_status = fields.IntField(null=True)
+    last_error = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    delivered_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        # The lookup of the due deliveries
+        indexes = (("status", "next_attempt_at"),)
+
+    def __str__(self) -> str:
+        """
+        Returns the callback URL as a string representation of the object.
+
+        Returns
+        -------
+        str
+            The callback URL of the delivery.
+        """
+        return self.callback_url
+
+
 """
 This is a Pydantic model created from the `TextSummary` Tortoise model.
 
@@ -53,3 +331,21 @@ in a FastAPI application. It ensures that the fields from the Tortoise ORM model
 validated when used within API endpoints.
 """
 TextSummarySchema = pydantic_model_creator(TextSummary)
+SummaryDiagnosticsSchema = pydantic_model_creator(SummaryDiagnostics)
+
+
+class SummarySearchResultsSchema(BaseModel):
+    """
+    Schema representing a page of the results of a summary search.
+
+    Attributes
+    ----------
+    results : List[TextSummarySchema]
+        The summaries matching the query, the best match first.
+    next_cursor : Optional[str]
+        The cursor of the next page, to pass as the `cursor` query parameter, or None if this is
+        the last page.
+    """
+
+    results: List[TextSummarySchema]  # type: ignore[valid-type]
+    next_cursor: Optional[str]
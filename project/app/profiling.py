@@ -0,0 +1,89 @@
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+from app.models.tortoise_model import SummaryProfile
+
+logger = logging.getLogger("uvicorn")
+
+PROFILER = "cProfile"
+
+# Only one profiler can be active per thread, so concurrent profiling requests are not profiled
+_profiling = False
+
+
+@asynccontextmanager
+async def profile_summary(summary_id: int) -> AsyncGenerator[None, None]:
+    """
+    Profile the summarization job of a summary with `cProfile` and store the profile in the
+    `SummaryProfile` table.
+
+    The profiler records every function run on the event loop thread while the job runs, so
+    requests served concurrently appear in the profile as well. If another job is already being
+    profiled, the job runs without the profiler.
+
+    Parameters
+    ----------
+    summary_id : int
+        The ID of the summary whose job is profiled.
+
+    Yields
+    ------
+    None
+        Control to the job, which runs under the profiler.
+    """
+    global _profiling
+    if _profiling:
+        logger.warning(f"Another job is being profiled, not profiling summary {summary_id}")
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    _profiling = True
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profiling = False
+        # The same format as `dump_stats`, so the profile loads in pstats, snakeviz, etc.
+        profiler.create_stats()
+        content = marshal.dumps(profiler.stats)  # type: ignore[attr-defined]
+        try:
+            await SummaryProfile.update_or_create(
+                defaults={"profiler": PROFILER, "content": content}, summary_id=summary_id
+            )
+        except Exception as error:
+            # Profiling is best effort and must not affect the summary itself
+            logger.warning(f"Failed to store the profile of summary {summary_id}: {error}")
+
+
+def render_profile(content: bytes, sort: str = "cumulative", limit: int = 50) -> str:
+    """
+    Render a stored profile as the `pstats` text report.
+
+    Parameters
+    ----------
+    content : bytes
+        The profile in the `pstats` file format.
+    sort : str
+        The `pstats` sort key of the functions, e.g., 'cumulative' or 'tottime'.
+    limit : int
+        The number of functions listed.
+
+    Returns
+    -------
+    str
+        The report, listing the top functions by the sort key.
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    # Loaded as `pstats.Stats.load_stats` does for a file
+    stats.stats = marshal.loads(content)  # type: ignore[attr-defined]
+    stats.get_top_level_stats()
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
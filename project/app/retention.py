@@ -0,0 +1,340 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from tortoise import BaseDBAsyncClient, Tortoise, connections, run_async
+from tortoise.expressions import Subquery
+from tortoise.transactions import in_transaction
+
+from app.config import Settings, get_settings
+from app.db import PRIMARY_CONNECTION, get_tortoise_config
+from app.models.tortoise_model import (
+    ContentFingerprint,
+    SourceDocument,
+    SummaryDiagnostics,
+    SummaryProfile,
+    TextSummary,
+    WebhookDelivery,
+)
+
+logger = logging.getLogger("uvicorn")
+
+# On PostgreSQL, the summaries table is partitioned by month of `created_at` (see migration 6),
+# into partitions named after their month, e.g., 'textsummary_p202610', and a default partition
+PARTITIONED_TABLE = "textsummary"
+DEFAULT_PARTITION = "textsummary_default"
+PARTITION_PREFIX = "textsummary_p"
+ARCHIVE_PREFIX = "textsummary_archive_p"
+PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+
+# The key of the PostgreSQL advisory lock held by each step of the retention job, so that the
+# processes running the job concurrently do not maintain the partitions at the same time
+RETENTION_LOCK_KEY = 4_106_205_041
+
+
+@dataclass
+class RetentionReport:
+    """
+    What a run of the retention job changed.
+
+    Attributes
+    ----------
+    created : List[str]
+        The partitions created ahead of time.
+    expired : List[str]
+        The partitions detached (archived) or dropped.
+    deleted_summaries : int
+        The number of summaries deleted from an unpartitioned table.
+    deleted_documents : int
+        The number of expired source documents no longer referenced by any summary.
+    """
+
+    created: List[str] = field(default_factory=list)
+    expired: List[str] = field(default_factory=list)
+    deleted_summaries: int = 0
+    deleted_documents: int = 0
+
+
+def month_start(moment: datetime) -> datetime:
+    """
+    The start of the month (UTC) of a timezone-aware datetime.
+    """
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """
+    The start of the month a number of months after the start of a month.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """
+    The name of the partition of the summaries created in a month.
+    """
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+async def is_partitioned(connection: BaseDBAsyncClient) -> bool:
+    """
+    Whether the summaries table is partitioned, i.e., on PostgreSQL once migration 6 is applied.
+    """
+    if connection.capabilities.dialect != "postgres":
+        return False
+    rows = await connection.execute_query_dict(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass($1)",
+        [PARTITIONED_TABLE],
+    )
+    return bool(rows)
+
+
+async def list_partitions(connection: BaseDBAsyncClient) -> Dict[str, datetime]:
+    """
+    The monthly partitions attached to the summaries table, keyed by name, with the start of
+    their month. The default partition is not included.
+    """
+    rows = await connection.execute_query_dict(
+        """
+        SELECT child.relname AS name FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass($1)
+        """,
+        [PARTITIONED_TABLE],
+    )
+    partitions = {}
+    for row in rows:
+        match = PARTITION_NAME.match(row["name"])
+        if match:
+            year, month = map(int, match.groups())
+            partitions[row["name"]] = datetime(year, month, 1, tzinfo=timezone.utc)
+    return partitions
+
+
+async def try_lock(transaction: BaseDBAsyncClient) -> bool:
+    """
+    Take the retention lock until the end of the transaction, unless another process holds it.
+    """
+    rows = await transaction.execute_query_dict(
+        "SELECT pg_try_advisory_xact_lock($1) AS locked", [RETENTION_LOCK_KEY]
+    )
+    return rows[0]["locked"]
+
+
+async def create_partition(transaction: BaseDBAsyncClient, month: datetime) -> None:
+    """
+    Create the partition of a month, moving the summaries of that month out of the default
+    partition (normally empty, unless the job did not run for longer than the premade months).
+    """
+    name = partition_name(month)
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    # The generated columns (see migration 10) must be generated in the partitions as well, and
+    # are computed again rather than copied
+    await transaction.execute_script(
+        f'CREATE TABLE "{name}" (LIKE "{PARTITIONED_TABLE}" '
+        "INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+    )
+    rows = await transaction.execute_query_dict(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = to_regclass($1) AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+        """,
+        [PARTITIONED_TABLE],
+    )
+    columns = ", ".join(f'"{row["attname"]}"' for row in rows)
+    await transaction.execute_query(
+        f"""
+        WITH moved AS (
+            DELETE FROM "{DEFAULT_PARTITION}" WHERE "created_at" >= $1 AND "created_at" < $2
+            RETURNING *
+        )
+        INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved
+        """,
+        [month, add_months(month, 1)],
+    )
+    await transaction.execute_script(
+        f'ALTER TABLE "{PARTITIONED_TABLE}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+
+
+async def expire_partition(transaction: BaseDBAsyncClient, name: str, mode: str) -> None:
+    """
+    Delete the diagnostics, profiles, fingerprints, and webhook deliveries of the summaries of a
+    partition, then detach the partition and archive (rename) or drop it. The summaries table is
+    only locked exclusively by the detach, at the end of the transaction.
+    """
+    for table in (
+        SummaryDiagnostics._meta.db_table,
+        SummaryProfile._meta.db_table,
+        ContentFingerprint._meta.db_table,
+        WebhookDelivery._meta.db_table,
+    ):
+        await transaction.execute_script(
+            f'DELETE FROM "{table}" WHERE "summary_id" IN (SELECT "id" FROM "{name}")'
+        )
+    await transaction.execute_script(f'ALTER TABLE "{PARTITIONED_TABLE}" DETACH PARTITION "{name}"')
+    if mode == "drop":
+        await transaction.execute_script(f'DROP TABLE "{name}"')
+    else:
+        archive = name.replace(PARTITION_PREFIX, ARCHIVE_PREFIX, 1)
+        await transaction.execute_script(f'ALTER TABLE "{name}" RENAME TO "{archive}"')
+
+
+async def maintain_partitions(
+    settings: Settings, now: datetime, cutoff: Optional[datetime], report: RetentionReport
+) -> None:
+    """
+    Create the partitions of the current and the premade months, and expire the partitions whose
+    month ended before the cutoff. Each partition is changed in its own transaction, so that the
+    summaries table is not locked for the whole run.
+    """
+    current = month_start(now)
+    months = [add_months(current, i) for i in range(settings.summary_partition_premake_months + 1)]
+    for month in months:
+        async with in_transaction(PRIMARY_CONNECTION) as transaction:
+            if not await try_lock(transaction):
+                return
+            if partition_name(month) in await list_partitions(transaction):
+                continue
+            await create_partition(transaction, month)
+            report.created.append(partition_name(month))
+    if cutoff is None:
+        return
+    expired = {
+        name
+        for name, month in (await list_partitions(connections.get(PRIMARY_CONNECTION))).items()
+        if add_months(month, 1) <= cutoff
+    }
+    for name in sorted(expired):
+        async with in_transaction(PRIMARY_CONNECTION) as transaction:
+            if not await try_lock(transaction):
+                return
+            if name not in await list_partitions(transaction):
+                continue
+            await expire_partition(transaction, name, settings.summary_retention_mode)
+            report.expired.append(name)
+
+
+async def delete_expired_summaries(cutoff: datetime) -> int:
+    """
+    Delete the summaries created before the cutoff, with their diagnostics, profiles,
+    fingerprints, and webhook deliveries, from an unpartitioned table (SQLite, or PostgreSQL
+    before migration 6) in bulk.
+    """
+    expired = TextSummary.filter(created_at__lt=cutoff)
+    async with in_transaction(PRIMARY_CONNECTION):
+        for model in (SummaryDiagnostics, SummaryProfile, ContentFingerprint, WebhookDelivery):
+            await model.filter(summary_id__in=Subquery(expired.values("id"))).delete()
+        return await expired.delete()
+
+
+async def delete_expired_documents(cutoff: datetime) -> int:
+    """
+    Delete the source documents stored before the cutoff that no summary references anymore.
+    """
+    referenced = TextSummary.filter(source_hash__not_isnull=True).values("source_hash")
+    return (
+        await SourceDocument.filter(created_at__lt=cutoff)
+        .exclude(content_hash__in=Subquery(referenced))
+        .delete()
+    )
+
+
+async def run_retention(settings: Settings, now: Optional[datetime] = None) -> RetentionReport:
+    """
+    Run the retention job once: maintain the monthly partitions of the summaries table (or, if
+    it is not partitioned, delete the expired summaries in bulk), then delete the expired
+    source documents that are no longer referenced.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings, which configure the retention.
+    now : Optional[datetime]
+        The current time, defaulting to now.
+
+    Returns
+    -------
+    RetentionReport
+        What the run changed.
+    """
+    now = now or datetime.now(timezone.utc)
+    retention_days = settings.summary_retention_days
+    cutoff = now - timedelta(days=retention_days) if retention_days else None
+    report = RetentionReport()
+    if await is_partitioned(connections.get(PRIMARY_CONNECTION)):
+        await maintain_partitions(settings, now, cutoff, report)
+    elif cutoff is not None:
+        report.deleted_summaries = await delete_expired_summaries(cutoff)
+    if cutoff is not None:
+        report.deleted_documents = await delete_expired_documents(cutoff)
+    return report
+
+
+class RetentionScheduler(object):
+    """
+    Runs the retention job periodically in the background of an application process.
+
+    Every process runs the job, so that it keeps running as long as any process is up; on
+    PostgreSQL, an advisory lock ensures that only one of them changes the partitions at a time.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, settings: Settings) -> None:
+        """
+        Start running the retention job every `retention_interval_seconds`.
+
+        Parameters
+        ----------
+        settings : Settings
+            The application settings, which configure the retention.
+        """
+        self._task = asyncio.create_task(self._run_forever(settings))
+
+    async def stop(self) -> None:
+        """
+        Stop running the retention job, cancelling a run in progress.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self, settings: Settings) -> None:
+        while True:
+            await asyncio.sleep(settings.retention_interval_seconds)
+            try:
+                report = await run_retention(settings)
+                if report.created or report.expired or report.deleted_summaries:
+                    logger.info(f"Retention job: {report}")
+            except Exception as error:
+                # The next run retries, and the default partition catches any missing month
+                logger.warning(f"The retention job failed: {error}")
+
+
+retention_scheduler = RetentionScheduler()
+
+
+async def main() -> None:
+    """
+    Run the retention job once, e.g., from a scheduler: `python -m app.retention`.
+    """
+    settings = get_settings()
+    await Tortoise.init(config=get_tortoise_config(settings))
+    logger.info(f"Retention job: {await run_retention(settings)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_async(main())
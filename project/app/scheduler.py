@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.metrics import SUMMARY_JOB_WAIT_SECONDS, SUMMARY_JOBS_QUEUED
+
+# The lanes of the summarization jobs: 'fast' for interactive requests and short stored
+# documents, 'normal' for the other requests, and 'bulk' for backfills
+LANES = ("fast", "normal", "bulk")
+# The finish tags of the flows are pruned once there are more flows than this
+MAX_FLOWS = 1024
+# The duration of a job assumed until one has been measured, and the weight of the latest job in
+# the moving average of the durations
+DEFAULT_SERVICE_SECONDS = 1.0
+SERVICE_SMOOTHING = 0.2
+# The longest Retry-After of a rejected job
+MAX_RETRY_AFTER_SECONDS = 300
+
+
+@dataclass(order=True)
+class QueuedJob:
+    """
+    A summarization job submitted to the `JobScheduler`, ordered by its start tag.
+
+    Attributes
+    ----------
+    start : float
+        The virtual time at which the job starts in the fair schedule.
+    sequence : int
+        The order of submission, which breaks the ties between equal start tags.
+    lane : str
+        The lane of the job, one of `LANES`.
+    submitted_at : float
+        The monotonic time at which the job was submitted.
+    granted : Optional[asyncio.Future]
+        Resolved once the job may run, while the job waits for a slot.
+    """
+
+    start: float
+    sequence: int
+    lane: str = field(compare=False)
+    submitted_at: float = field(compare=False)
+    granted: Optional[asyncio.Future] = field(default=None, compare=False)
+
+
+class JobScheduler(object):
+    """
+    Orders the summarization jobs of a process with start-time fair queueing, and runs a limited
+    number of them at a time.
+
+    Each job belongs to a flow, its lane and its tenant (the client identity used for rate
+    limiting), which gets a share of the slots proportional to the weight of its lane. A job's
+    start tag is the later of the current virtual time and the finish tag of the previous job of
+    its flow, and its finish tag is its start tag plus the inverse of the weight. Jobs run in
+    order of their start tags, and the virtual time advances to the start tag of the job that
+    gets a slot. A tenant's backlog of thousands of jobs therefore only delays the jobs of the
+    other tenants by the number of slots, rather than by the whole backlog, and the jobs of the
+    heavier lanes get ahead of those of the lighter lanes.
+    """
+
+    def __init__(self) -> None:
+        self._virtual_time = 0.0
+        self._finish_tags: Dict[Tuple[str, str], float] = {}
+        # The jobs waiting for a slot, a heap ordered by start tag
+        self._waiting: List[QueuedJob] = []
+        self._running = 0
+        self._queued = 0
+        # The jobs admitted and not submitted yet
+        self._reserved = 0
+        self._concurrency = 1
+        self._sequence = itertools.count()
+        self._service_seconds: Optional[float] = None
+
+    @property
+    def running(self) -> int:
+        """
+        The number of jobs holding a slot.
+        """
+        return self._running
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of jobs admitted and not finished yet: reserved, waiting, or running.
+        """
+        return self._reserved + self._queued + self._running
+
+    @property
+    def service_seconds(self) -> float:
+        """
+        The moving average of the duration of the jobs, from getting a slot to releasing it.
+        """
+        return DEFAULT_SERVICE_SECONDS if self._service_seconds is None else self._service_seconds
+
+    def estimated_wait(self, concurrency: int) -> float:
+        """
+        The time a job submitted now would wait for a slot, from the jobs in flight and the
+        measured duration of the jobs.
+        """
+        return max(self.in_flight - concurrency + 1, 0) * self.service_seconds / concurrency
+
+    def admit(
+        self, max_in_flight: int, max_wait: float, concurrency: int
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Decide whether a new job is admitted, so that the queue of a saturated process stays
+        bounded instead of growing with every request.
+
+        An admitted job is counted in flight at once, holding a reservation until it is submitted
+        with `submit(..., reserved=True)` or the reservation is released with
+        `cancel_reservation`. The requests of a burst therefore cannot all be admitted while
+        they await the database before submitting their jobs.
+
+        Parameters
+        ----------
+        max_in_flight : int
+            The largest number of jobs in flight.
+        max_wait : float
+            The longest estimated wait of a new job, or 0 for no limit.
+        concurrency : int
+            The number of jobs that run at a time.
+
+        Returns
+        -------
+        Optional[Tuple[str, int]]
+            None if the job is admitted, otherwise the reason of the rejection, 'in_flight' or
+            'queue_wait', and the number of seconds after which the job would likely be admitted,
+            for a `Retry-After` header.
+        """
+        excess_jobs = self.in_flight + 1 - max_in_flight
+        if excess_jobs > 0:
+            reason, retry_after = "in_flight", excess_jobs * self.service_seconds / concurrency
+        elif max_wait and self.estimated_wait(concurrency) > max_wait:
+            reason, retry_after = "queue_wait", self.estimated_wait(concurrency) - max_wait
+        else:
+            self._reserved += 1
+            return None
+        return reason, min(max(math.ceil(retry_after), 1), MAX_RETRY_AFTER_SECONDS)
+
+    def cancel_reservation(self) -> None:
+        """
+        Release the reservation of a job admitted by `admit` that will not be submitted.
+        """
+        self._reserved -= 1
+
+    def submit(self, lane: str, tenant: str, weight: float, reserved: bool = False) -> QueuedJob:
+        """
+        Submit a job, giving it its place in the fair schedule.
+
+        Parameters
+        ----------
+        lane : str
+            The lane of the job, one of `LANES`.
+        tenant : str
+            The tenant of the job.
+        weight : float
+            The weight of the lane.
+        reserved : bool
+            Whether the job was admitted by `admit`, whose reservation it takes over.
+
+        Returns
+        -------
+        QueuedJob
+            The job, to run with `run` once its task starts.
+        """
+        flow = (lane, tenant)
+        start = max(self._virtual_time, self._finish_tags.get(flow, 0.0))
+        self._finish_tags[flow] = start + 1 / weight
+        if reserved:
+            self._reserved -= 1
+        self._queued += 1
+        SUMMARY_JOBS_QUEUED.labels(lane=lane).inc()
+        return QueuedJob(start, next(self._sequence), lane, time.monotonic())
+
+    @asynccontextmanager
+    async def run(self, job: QueuedJob, concurrency: int) -> AsyncIterator[None]:
+        """
+        Wait for a slot for a submitted job, in the order of the fair schedule, and hold it
+        while the job runs.
+
+        Parameters
+        ----------
+        job : QueuedJob
+            The job returned by `submit`.
+        concurrency : int
+            The number of jobs that may run at a time.
+        """
+        self._concurrency = concurrency
+        job.granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, job)
+        self._dispatch()
+        try:
+            await job.granted
+        except asyncio.CancelledError:
+            if job.granted.done() and not job.granted.cancelled():
+                # The slot was granted as the task was cancelled
+                self._release()
+            else:
+                self._waiting.remove(job)
+                heapq.heapify(self._waiting)
+                self._queued -= 1
+                SUMMARY_JOBS_QUEUED.labels(lane=job.lane).dec()
+            raise
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - started_at
+            self._service_seconds = (
+                duration
+                if self._service_seconds is None
+                else self._service_seconds + SERVICE_SMOOTHING * (duration - self._service_seconds)
+            )
+            self._release()
+
+    def _dispatch(self) -> None:
+        """
+        Grant the free slots to the waiting jobs with the earliest start tags.
+        """
+        while self._waiting and self._running < self._concurrency:
+            job = heapq.heappop(self._waiting)
+            self._running += 1
+            self._queued -= 1
+            self._virtual_time = max(self._virtual_time, job.start)
+            SUMMARY_JOBS_QUEUED.labels(lane=job.lane).dec()
+            SUMMARY_JOB_WAIT_SECONDS.labels(lane=job.lane).observe(
+                time.monotonic() - job.submitted_at
+            )
+            job.granted.set_result(None)  # type: ignore[union-attr]
+        if len(self._finish_tags) > MAX_FLOWS:
+            # The flows that finished before the virtual time start at the virtual time anyway
+            self._finish_tags = {
+                flow: finish
+                for flow, finish in self._finish_tags.items()
+                if finish > self._virtual_time
+            }
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+
+
+# The scheduler of the summarization jobs of this process
+job_scheduler = JobScheduler()
+
+# Export every lane, including those without jobs yet
+for lane in LANES:
+    SUMMARY_JOBS_QUEUED.labels(lane=lane)
+    SUMMARY_JOB_WAIT_SECONDS.labels(lane=lane)
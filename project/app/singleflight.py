@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SingleFlight(object):
+    """
+    Deduplicates concurrent calls with the same key within a process: while a call is in flight,
+    the calls with the same key wait for its result instead of running again.
+
+    Used by the summarization jobs so that concurrent jobs for the same canonical URL fetch and
+    extract the article once.
+    """
+
+    def __init__(self) -> None:
+        # The task of each call in flight, and its arguments
+        self._calls: Dict[str, Tuple[asyncio.Task, Tuple[Any, ...]]] = {}
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        timeout: Optional[float] = None,
+        join: Optional[Callable[..., None]] = None,
+    ) -> Any:
+        """
+        Run `func(*args)`, or wait for the result of the call with the same key in flight.
+
+        The call runs in a task of its own, so that it does not depend on the caller that
+        started it: each caller, the first one included, waits for its result within its own
+        timeout, and the call goes on while any other caller may wait for it.
+
+        Parameters
+        ----------
+        key : str
+            The key of the call.
+        func : Callable[..., Awaitable[Any]]
+            The coroutine function to run.
+        *args : Any
+            The arguments of the coroutine function.
+        timeout : Optional[float]
+            The number of seconds to wait for the call; its result is still shared with the
+            other waiters if this one stops waiting.
+        join : Optional[Callable[..., None]]
+            Called with the arguments of the call in flight if this caller waits for it instead
+            of running its own, e.g., to extend the deadline of the call to this caller's.
+
+        Returns
+        -------
+        Any
+            The result of the call, which is shared by all waiters. If the call raises, all waiters
+            raise the same exception.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If the call did not complete within the timeout.
+        """
+        if key in self._calls:
+            task, call_args = self._calls[key]
+            if join is not None:
+                join(*call_args)
+        else:
+            task = asyncio.create_task(func(*args))
+            self._calls[key] = task, args
+            task.add_done_callback(lambda task: self._done(key, task))
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        del self._calls[key]
+        if not task.cancelled():
+            # Retrieved here so that a failed call without waiters is not reported by asyncio
+            task.exception()
@@ -1,29 +1,445 @@
+import asyncio
+import copy
+import importlib
+import logging
+import re
+import time
+from contextlib import closing
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple, Type
+from urllib.parse import urljoin, urlsplit
+
+import lxml.etree
+import lxml.html
 import nltk
-from sumy.nlp.stemmers import Stemmer
+import requests
+from breadability.readable import Article
 from sumy.nlp.tokenizers import Tokenizer
 from sumy.parsers.html import HtmlParser
-from sumy.summarizers.edmundson import EdmundsonSummarizer
-from sumy.summarizers.lex_rank import LexRankSummarizer
-from sumy.summarizers.lsa import LsaSummarizer
-from sumy.summarizers.text_rank import TextRankSummarizer
-from sumy.utils import get_stop_words
+from sumy.summarizers._summarizer import AbstractSummarizer
 
-from app.models.pydantic_model import SummarizationMethod
-from app.models.tortoise_model import TextSummary
+from app import document_store, fingerprint, webhooks
+from app.canonical import canonicalize_url, site
+from app.config import get_settings
+from app.cost_model import DEADLINE_SHARE, choose_method
+from app.deadline import Deadline, DeadlineExceeded
+from app.document_store import AnnotatedText
+from app.fingerprint import article_text, simhash
+from app.languages import LanguageResources, detect_language, language_cache
+from app.metrics import SUMMARY_AUTO_METHODS, SUMMARY_NEAR_DUPLICATES, time_stage
+from app.models.pydantic_model import Language, SummarizationMethod, SummaryStatus
+from app.models.tortoise_model import SummaryDiagnostics, TextSummary
+from app.singleflight import SingleFlight
 
-LANGUAGE = "english"
-stop_words = get_stop_words(LANGUAGE)
+logger = logging.getLogger("uvicorn")
 
+# The summarizer classes by method, imported on first use (LSA alone pulls in numpy's linalg)
 summarizers = {
-    "lsa": LsaSummarizer,
-    "lex_rank": LexRankSummarizer,
-    "text_rank": TextRankSummarizer,
-    "edmundson": EdmundsonSummarizer,
+    "lsa": "sumy.summarizers.lsa.LsaSummarizer",
+    "lex_rank": "sumy.summarizers.lex_rank.LexRankSummarizer",
+    "text_rank": "sumy.summarizers.text_rank.TextRankSummarizer",
+    "edmundson": "sumy.summarizers.edmundson.EdmundsonSummarizer",
+    "centroid": "app.vector_summarizers.CentroidSummarizer",
+    "sum_basic": "app.vector_summarizers.SumBasicSummarizer",
+    "luhn": "app.vector_summarizers.LuhnSummarizer",
+}
+
+# The methods called for every pair of sentences by the graph-based summarizers, which are
+# checkpoints of the job's deadline in addition to the stemmer called for every word
+DEADLINE_CHECKPOINTS = {
+    "lex_rank": ("cosine_similarity",),
+    "text_rank": ("_rate_sentences_edge",),
+}
+
+# The headers of the requests fetching the articles, those of `sumy.utils.fetch_url`
+HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 6.3; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/44.0.2403.155 Safari/537.36 OPR/31.0.1889.174"
+    ),
 }
+# The size of the chunks in which an article is downloaded, between checks of the deadline
+FETCH_CHUNK_SIZE = 64 * 1024
+# The longest URL accepted as a canonical link, the length limit of the canonical URL column
+MAX_URL_LENGTH = 2083
+HEAD_END = re.compile(rb"</head\s*>", re.IGNORECASE)
+CANONICAL_LINK = (
+    "//link[contains(concat(' ', normalize-space("
+    "translate(@rel, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')), ' '), "
+    "' canonical ')]/@href"
+)
+
+# The articles being fetched by the jobs of this process, keyed by canonical URL
+article_flights = SingleFlight()
+
+
+class ExtractedArticleParser(HtmlParser):
+    """
+    An `HtmlParser` built from an already extracted article instead of raw HTML.
+
+    The `HtmlParser` only consumes the annotated `main_text` of the breadability article, so
+    parsing from the stored annotated text yields the same document, significant words, and
+    stigma words as parsing the original page, without fetching or re-extracting it.
+    """
+
+    def __init__(self, main_text: AnnotatedText, tokenizer: Tokenizer) -> None:
+        """
+        Initialize the parser from the annotated text of an extracted article.
+
+        Parameters
+        ----------
+        main_text : AnnotatedText
+            The annotated paragraphs of the extracted article.
+        tokenizer : Tokenizer
+            The tokenizer used to split the text into sentences and words.
+        """
+        super(HtmlParser, self).__init__(tokenizer)
+        self._article = SimpleNamespace(main_text=main_text)
+
+
+def fetch_url(url: str, deadline: Deadline) -> bytes:
+    """
+    Download a page within the remaining budget of a job.
+
+    The budget bounds both the connection and each read from the socket, and is checked between
+    the chunks of the body, so a slow origin trickling its response cannot hold the job past its
+    deadline.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the page.
+    deadline : Deadline
+        The deadline of the summarization job.
+
+    Returns
+    -------
+    bytes
+        The body of the response.
+
+    Raises
+    ------
+    DeadlineExceeded
+        If the deadline passes before the page is downloaded.
+    requests.RequestException
+        If the request fails or the response has an error status.
+    """
+    try:
+        response = requests.get(
+            url, headers=HTTP_HEADERS, stream=True, timeout=max(deadline.remaining(), 0.001)
+        )
+    except requests.Timeout:
+        raise DeadlineExceeded(deadline.stage)
+    with closing(response):
+        response.raise_for_status()
+        chunks = []
+        try:
+            for chunk in response.iter_content(FETCH_CHUNK_SIZE):
+                deadline.check()
+                chunks.append(chunk)
+        except requests.ConnectionError:
+            # A read timeout of the body is raised as a connection error by requests
+            deadline.check()
+            raise
+        return b"".join(chunks)
+
+
+def find_canonical_link(html: bytes, url: str) -> Optional[str]:
+    """
+    Find the `<link rel="canonical">` of a page, if it points to an HTTP(S) URL of the same site
+    (see `app.canonical.site`). Links to other sites are ignored, so that a page cannot claim to
+    be the canonical version of another site's article.
+
+    Parameters
+    ----------
+    html : bytes
+        The raw HTML content of the page.
+    url : str
+        The URL of the page, used to resolve a relative link.
+
+    Returns
+    -------
+    Optional[str]
+        The absolute URL of the canonical link, or None.
+    """
+    # The link belongs in the head, so the body is not parsed
+    head_end = HEAD_END.search(html)
+    try:
+        document = lxml.html.fromstring(html[: head_end.start()] if head_end else html)
+    except (lxml.etree.ParserError, ValueError):
+        return None
+    for href in document.xpath(CANONICAL_LINK):
+        link = urljoin(url, href.strip())
+        if (
+            urlsplit(link).scheme in ("http", "https")
+            and len(link) <= MAX_URL_LENGTH
+            and site(link) == site(url)
+        ):
+            return link
+    return None
+
+
+def extract_article(html: bytes, url: str) -> AnnotatedText:
+    """
+    Extract the main article from an HTML page as annotated text.
+
+    Parameters
+    ----------
+    html : bytes
+        The raw HTML content of the page.
+    url : str
+        The URL of the page, used to resolve relative links.
+
+    Returns
+    -------
+    AnnotatedText
+        The annotated paragraphs of the main article.
+    """
+    return Article(html, url).main_text
+
+
+def load_summarizer_class(summarizer_name: str) -> Type[AbstractSummarizer]:
+    """
+    Import the summarizer class of a summarization method.
+
+    Parameters
+    ----------
+    summarizer_name : str
+        The value of the summarization method, a key of `summarizers`.
+
+    Returns
+    -------
+    Type[AbstractSummarizer]
+        The summarizer class.
+    """
+    module, _, name = summarizers[summarizer_name].rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+def ensure_nltk_data() -> None:
+    """
+    Download the NLTK tokenizer data if it is not installed.
+    """
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        nltk.download("punkt")
+        nltk.download("punkt_tab")
+
+
+def preload() -> None:
+    """
+    Import every summarizer and load the NLP resources they share for the default language: the
+    sentence tokenizer, the stemmer, and the stop words. The other languages are loaded by the
+    first job summarizing an article in them (see `LanguageCache`).
+
+    Called in the gunicorn master process before it forks the workers (see `gunicorn.conf.py`),
+    so that the workers share these resources copy-on-write instead of each loading them on
+    their first summarization job.
+    """
+    ensure_nltk_data()
+    for summarizer_name in summarizers:
+        load_summarizer_class(summarizer_name)
+    resources = default_resources()
+    # Tokenizing a sentence also loads and caches the Punkt model of NLTK's word tokenizer
+    tokenizer = resources.tokenizer
+    for sentence in tokenizer.to_sentences("Preload the tokenizers. Then fork the workers."):
+        tokenizer.to_words(sentence)
+    resources.stemmer("preloading")
+
+
+def default_resources() -> LanguageResources:
+    """
+    The NLP resources of the configured `default_language`.
+    """
+    settings = get_settings()
+    return language_cache.get(settings.default_language.value, settings.language_cache_size)
+
+
+def create_summarizer(
+    summarizer_name: str,
+    parser: HtmlParser,
+    deadline: Optional[Deadline] = None,
+    resources: Optional[LanguageResources] = None,
+) -> AbstractSummarizer:
+    """
+    Create a summarizer with the stemmer and the stop words (or, for Edmundson, the bonus,
+    stigma, and null words) of the document's language.
+
+    Parameters
+    ----------
+    summarizer_name : str
+        The value of the summarization method, a key of `summarizers`.
+    parser : HtmlParser
+        The parser of the document to summarize, which provides the Edmundson bonus and stigma
+        words.
+    deadline : Optional[Deadline]
+        The deadline of the summarization job, if any, checked for every stemmed word and, by
+        the graph-based summarizers, for every pair of sentences.
+    resources : Optional[LanguageResources]
+        The NLP resources of the document's language; defaults to those of the configured
+        `default_language`.
+
+    Returns
+    -------
+    AbstractSummarizer
+        The configured summarizer, called with the document and the number of sentences.
+    """
+    if resources is None:
+        resources = default_resources()
+    # Apply stemmer and stop words processing
+    stemmer = resources.stemmer
+    if deadline is not None:
+        stemmer = deadline.checkpoint(stemmer)
+    summarizer = load_summarizer_class(summarizer_name)(stemmer)
+    if deadline is not None:
+        for method in DEADLINE_CHECKPOINTS.get(summarizer_name, ()):
+            setattr(summarizer, method, deadline.checkpoint(getattr(summarizer, method)))
+    if summarizer_name == "edmundson":
+        summarizer.bonus_words = parser.significant_words
+        summarizer.stigma_words = parser.stigma_words
+        summarizer.null_words = resources.stop_words
+    else:
+        summarizer.stop_words = resources.stop_words
+    return summarizer
+
+
+async def fetch_article(
+    url: str, deadline: Deadline, summarizer_name: str, timings: Dict[str, float]
+) -> Tuple[AnnotatedText, Optional[str], Optional[str]]:
+    """
+    Fetch and extract the article of a URL, find its canonical link, and store it if source
+    documents are stored. The download runs in a thread, so it does not block the event loop.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the article.
+    deadline : Deadline
+        The deadline of the fetch, the latest of the jobs waiting for it.
+    summarizer_name : str
+        The value of the summarization method, to label the stage metrics.
+    timings : Dict[str, float]
+        The duration of each stage, updated with the stages run.
+
+    Returns
+    -------
+    Tuple[AnnotatedText, Optional[str], Optional[str]]
+        The extracted article, the hash of its stored source document, and its canonical link.
+    """
+    settings = get_settings()
+    deadline.enter("fetch")
+    with time_stage("fetch", summarizer_name, timings):
+        html = await asyncio.to_thread(fetch_url, url, deadline)
+    canonical_link = find_canonical_link(html, url) if settings.canonical_link_resolution else None
+    deadline.enter("extract")
+    with time_stage("extract", summarizer_name, timings):
+        main_text = extract_article(html, url)
+    source_hash = None
+    if settings.store_source_documents:
+        deadline.enter("store")
+        with time_stage("store", summarizer_name, timings):
+            source_hash = await document_store.save(main_text)
+    return main_text, source_hash, canonical_link
+
+
+def rank_sentences(
+    main_text: AnnotatedText,
+    summarizer_name: str,
+    sentence_count: int,
+    deadline: Deadline,
+    timings: Dict[str, float],
+    diagnostics: Dict[str, Any],
+    language: Optional[Language] = None,
+) -> Tuple[str, str]:
+    """
+    Tokenize an extracted article in its language and rank its sentences with a summarizer.
+
+    For the 'auto' method, the summarizer is the first of the configured `auto_methods` whose
+    cost model predicts that it ranks the sentences of the document within the budget of the
+    job: `auto_rank_budget_seconds`, or `DEADLINE_SHARE` of the remaining time of the job if it
+    is shorter (see `app.cost_model`).
+
+    Parameters
+    ----------
+    main_text : AnnotatedText
+        The extracted article.
+    summarizer_name : str
+        The value of the summarization method, possibly 'auto'.
+    sentence_count : int
+        The number of sentences in the summary.
+    deadline : Deadline
+        The deadline of the summarization job, checked while tokenizing and ranking.
+    timings : Dict[str, float]
+        The duration of each stage of the job, updated with the stages run.
+    diagnostics : Dict[str, Any]
+        The statistics of the document, its language, and the engine used, updated for
+        `SummaryDiagnostics`.
+    language : Optional[Language]
+        The language of the article set by the request; if None, it is detected from the
+        article, unless `language_detection` is disabled.
+
+    Returns
+    -------
+    Tuple[str, str]
+        The sentences of the summary, one per line, and the value of the method that ranked
+        them.
+    """
+    settings = get_settings()
+    deadline.enter("tokenize")
+    with time_stage("tokenize", summarizer_name, timings):
+        if language is not None:
+            language_name = language.value
+        elif settings.language_detection:
+            language_name = detect_language(main_text, settings.default_language.value)
+        else:
+            language_name = settings.default_language.value
+        diagnostics["language"] = language_name
+        resources = language_cache.get(language_name, settings.language_cache_size)
+        # The tokenizer is shared by the jobs, so the checkpoints of this job wrap a copy of it
+        tokenizer = copy.copy(resources.tokenizer)
+        tokenizer.to_sentences = deadline.checkpoint(tokenizer.to_sentences)  # type: ignore
+        tokenizer.to_words = deadline.checkpoint(tokenizer.to_words)  # type: ignore
+        parser = ExtractedArticleParser(main_text, tokenizer)
+        # The document and the words of each sentence are cached, so ranking does not
+        # tokenize them again
+        document = parser.document
+        words = document.words
+    diagnostics.update(
+        document_sentences=len(document.sentences),
+        document_terms=len({word.lower() for word in words}),
+    )
+    if summarizer_name == SummarizationMethod.auto.value:
+        budget = min(settings.auto_rank_budget_seconds, DEADLINE_SHARE * deadline.remaining())
+        summarizer_name = choose_method(
+            settings.auto_methods,
+            settings.summary_cost_models,
+            budget,
+            diagnostics["document_sentences"],
+            len(words),
+            diagnostics["document_terms"],
+        ).value
+        SUMMARY_AUTO_METHODS.labels(method=summarizer_name).inc()
+
+    summarizer = create_summarizer(summarizer_name, parser, deadline, resources)
+    diagnostics["engine"] = f"sumy.{type(summarizer).__name__}"
+
+    # Generate the summary
+    deadline.enter("rank")
+    with time_stage("rank", summarizer_name, timings):
+        sentences = summarizer(document, sentence_count)
+    return "\n".join(sentence._text for sentence in sentences), summarizer_name
 
 
 async def generate_summary(
-    id: int, url: str, summarization_method: SummarizationMethod, sentence_count: int
+    id: int,
+    url: str,
+    summarization_method: SummarizationMethod,
+    sentence_count: int,
+    source_hash: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+    canonical_url: Optional[str] = None,
+    language: Optional[Language] = None,
 ) -> None:
     """
     Create a summary of an article from a given URL using the `sumy` package. The summarization methods available include:
@@ -31,6 +447,22 @@ async def generate_summary(
     - **Edmundson**: Enhanced Luhn method with pragmatic words and positional heuristics.
     - **LSA (Latent Semantic Analysis)**: Algebraic, language-independent, identifies synonyms.
     - **LexRank/TextRank**: Graph-based, finds connections between sentences.
+    - **Centroid/SumBasic/Luhn**: Term frequency based, in linear time with NumPy (see
+      `app.vector_summarizers`), for long documents.
+    - **Auto**: One of the above, chosen to rank the sentences within the latency budget of the
+      job (see `app.cost_model`).
+
+    The job runs within a deadline, checked at the start of each pipeline stage and within the
+    fetch, tokenize, and rank stages (see `Deadline`). Once it passes, the job stops at the next
+    checkpoint and the summary is marked 'timed_out' with the stage that ran out of budget.
+    If the SimHash fingerprint of the article is close to that of an article already summarized
+    with the same method and sentence count, e.g., a syndicated copy, that summary is reused
+    instead of ranking the sentences (see `app.fingerprint`), unless the request set the language
+    of the article. The article is tokenized, stemmed, and filtered with the NLP resources of its
+    language, detected from its text if the request did not set it. For the 'auto' method, the
+    method is chosen from the statistics of the document and the budget of the job, and recorded
+    in the `selected_method` of the summary. The duration of each pipeline stage and the size of
+    the extracted article are recorded in `SummaryDiagnostics`.
 
     Parameters
     ----------
@@ -42,47 +474,154 @@ async def generate_summary(
         The summarization algorithm to use.
     sentence_count : int
         The number of sentences in the summary.
+    source_hash : Optional[str]
+        The content hash of a stored source document; if it is available, the article is
+        read from storage instead of being fetched from the URL.
+    deadline : Optional[Deadline]
+        The deadline of the job, started when its request was accepted; defaults to the
+        configured `summary_deadline_seconds` from now.
+    canonical_url : Optional[str]
+        The canonical form of the URL. Concurrent jobs of this process for the same canonical URL
+        fetch the article once. The canonical link of the fetched page, if any, is recorded
+        apart in the `canonical_link` of the summary, and does not replace it.
+    language : Optional[Language]
+        The language of the article set by the request, if any.
 
     Returns
     -------
     None
     """
-    try:
-        nltk.data.find("tokenizers/punkt")
-    except LookupError:
-        nltk.download("punkt")
-        nltk.download("punkt_tab")
+    ensure_nltk_data()
 
+    if deadline is None:
+        deadline = Deadline(get_settings().summary_deadline_seconds)
+    start = time.perf_counter()
+    # The duration of each stage and the statistics of the document, persisted for diagnostics
+    timings: Dict[str, float] = {}
+    diagnostics: Dict[str, Any] = {}
+    status = SummaryStatus.completed
+    article_fingerprint = None
+    # The method that ranked the sentences, chosen by the job for the 'auto' method
+    selected_method = None
+    # The canonical link declared by the fetched page
+    canonical_link = None
     try:
+        # The job may have waited in the queue past its deadline
+        deadline.check()
         # Note that this is an enum instance
         summarizer_name = summarization_method.value
-        # Parse content from the provided URL
-        parser = HtmlParser.from_url(url, Tokenizer(LANGUAGE))
-
-        # Apply stemmer and stop words processing
-        stemmer = Stemmer(LANGUAGE)
-        summarizer = summarizers[summarizer_name](stemmer)
-        if summarizer_name == "edmundson":
-            summarizer.bonus_words = parser.significant_words
-            summarizer.stigma_words = parser.stigma_words
-            summarizer.null_words = stop_words
-        elif summarizer_name in ["lsa", "lex_rank", "text_rank"]:
-            summarizer.stop_words = stop_words
-
-        # Generate the summary
-        summary = "\n".join(
-            sentence._text for sentence in summarizer(parser.document, sentence_count)
+        # Prefer the stored extracted article over fetching the URL again
+        main_text = None
+        if source_hash:
+            deadline.enter("load")
+            with time_stage("load", summarizer_name, timings):
+                main_text = await document_store.load(source_hash)
+        if main_text is None:
+            deadline.enter("fetch")
+            # The article is fetched once for the concurrent jobs of the same URL, within the
+            # latest of their deadlines and its own stage timings, while each job waits for it
+            # within its own deadline and records its wait as its fetch stage
+            waited = time.perf_counter()
+            try:
+                main_text, source_hash, canonical_link = await article_flights.do(
+                    canonical_url or url,
+                    fetch_article,
+                    url,
+                    Deadline(deadline.remaining()),
+                    summarizer_name,
+                    {},
+                    timeout=max(deadline.remaining(), 0),
+                    join=lambda _, fetch_deadline, *rest: fetch_deadline.extend(deadline),
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(deadline.stage)
+            finally:
+                timings["fetch"] = time.perf_counter() - waited
+            if canonical_link:
+                canonical_link = canonicalize_url(
+                    canonical_link, get_settings().canonical_strip_params
+                )
+        diagnostics["document_bytes"] = sum(
+            len(text.encode("utf-8")) for paragraph in main_text for text, _ in paragraph
         )
+        settings = get_settings()
+        near_duplicate = None
+        if settings.near_duplicate_detection and language is None:
+            deadline.enter("fingerprint")
+            with time_stage("fingerprint", summarizer_name, timings):
+                article_fingerprint = simhash(article_text(main_text))
+                if article_fingerprint is not None:
+                    near_duplicate = await fingerprint.find_near_duplicate(
+                        article_fingerprint,
+                        summarization_method,
+                        sentence_count,
+                        settings.near_duplicate_max_distance,
+                    )
+        if near_duplicate is not None:
+            # The article was summarized with the same options under another URL
+            duplicate_id, summary = near_duplicate
+            diagnostics["engine"] = f"near_duplicate:{duplicate_id}"
+            SUMMARY_NEAR_DUPLICATES.inc()
+        else:
+            summary, selected_method = rank_sentences(
+                main_text,
+                summarizer_name,
+                sentence_count,
+                deadline,
+                timings,
+                diagnostics,
+                language,
+            )
 
         # Check if the summary is empty and update with a message if necessary
         if not summary.strip():
+            status = SummaryStatus.failed
             summary = (
                 "Summary generation failed resulting in an empty summary; please try another URL"
             )
 
+    except DeadlineExceeded as error:
+        status = SummaryStatus.timed_out
+        summary = (
+            f"Summary generation timed out during the {error.stage or 'queued'} stage after "
+            f"{deadline.seconds:g}s; please try another URL"
+        )
     except Exception as error:
         # In case of any error, update with a failure message
+        status = SummaryStatus.failed
         summary = f"Summary generation failed due to an error: {str(error)}; please try another URL"
 
     # Update the summary record in the database
-    await TextSummary.filter(id=id).update(summary=summary)
+    with time_stage("db_update", summarization_method.value, timings):
+        updates = {"canonical_link": canonical_link} if canonical_link else {}
+        await TextSummary.filter(id=id).update(
+            summary=summary,
+            source_hash=source_hash,
+            status=status,
+            selected_method=selected_method,
+            **updates,
+        )
+
+    try:
+        await webhooks.schedule(id)
+    except Exception as error:
+        # The delivery stays waiting, as if the job had not ended
+        logger.warning(f"Failed to schedule the deliveries of summary {id}: {error}")
+
+    if status == SummaryStatus.completed and article_fingerprint is not None:
+        try:
+            await fingerprint.save(id, article_fingerprint, summarization_method, sentence_count)
+        except Exception as error:
+            # Fingerprints are best effort, as diagnostics
+            logger.warning(f"Failed to record the fingerprint of summary {id}: {error}")
+
+    try:
+        await SummaryDiagnostics.create(
+            summary_id=id,
+            stage_seconds=timings,
+            total_seconds=time.perf_counter() - start,
+            **diagnostics,
+        )
+    except Exception as error:
+        # Diagnostics are best effort and must not affect the summary itself
+        logger.warning(f"Failed to record the diagnostics of summary {id}: {error}")
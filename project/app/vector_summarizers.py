@@ -0,0 +1,229 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+import numpy as np
+from sumy.models.dom import ObjectDocumentModel, Sentence
+from sumy.summarizers._summarizer import AbstractSummarizer
+
+
+@dataclass
+class TermMatrix:
+    """
+    The sparse sentence-term matrix of a document, in coordinate form, and its sequence of
+    tokens.
+
+    Attributes
+    ----------
+    rows : np.ndarray
+        The sentence of each entry; the entries are ordered by sentence.
+    cols : np.ndarray
+        The term of each entry, unique within a sentence.
+    counts : np.ndarray
+        The number of occurrences of the term in the sentence of each entry.
+    offsets : np.ndarray
+        The index of the first entry of each sentence, followed by the number of entries.
+    tokens : np.ndarray
+        The term of each word of the document in order, or -1 for the stop words.
+    token_rows : np.ndarray
+        The sentence of each word of the document.
+    n_sentences : int
+        The number of sentences.
+    n_terms : int
+        The number of distinct stemmed terms, other than the stop words.
+    """
+
+    rows: np.ndarray
+    cols: np.ndarray
+    counts: np.ndarray
+    offsets: np.ndarray
+    tokens: np.ndarray
+    token_rows: np.ndarray
+    n_sentences: int
+    n_terms: int
+
+    def term_sums(self, weights: np.ndarray) -> np.ndarray:
+        """
+        The sum of the weights of the entries of each term.
+        """
+        # Without entries, `np.bincount` returns integers
+        return np.bincount(self.cols, weights=weights, minlength=self.n_terms).astype(float)
+
+    def sentence_sums(self, weights: np.ndarray) -> np.ndarray:
+        """
+        The sum of the weights of the entries of each sentence.
+        """
+        return np.bincount(self.rows, weights=weights, minlength=self.n_sentences).astype(float)
+
+
+class VectorSummarizer(AbstractSummarizer, ABC):
+    """
+    The base of the summarizers that run in linear time in the size of the document, scoring the
+    sentences with NumPy from the `TermMatrix` of the document.
+
+    The graph-based summarizers of `sumy` compare every pair of sentences, and its LSA summarizer
+    decomposes a dense term-sentence matrix, so their cost grows much faster than the document.
+    These summarizers normalize, filter, and stem each distinct word once, and score every
+    sentence with a few passes of `np.bincount` over the entries of the sparse matrix, so long
+    pages are summarized in milliseconds.
+    """
+
+    _stop_words: FrozenSet[str] = frozenset()
+
+    @property
+    def stop_words(self) -> FrozenSet[str]:
+        """
+        The normalized stop words, which are not terms of the matrix.
+        """
+        return self._stop_words
+
+    @stop_words.setter
+    def stop_words(self, words: Iterable[str]) -> None:
+        self._stop_words = frozenset(map(self.normalize_word, words))
+
+    def __call__(self, document: ObjectDocumentModel, sentences_count: int) -> Tuple[Sentence]:
+        """
+        The `sentences_count` best sentences of a document, in the order of the document.
+        """
+        sentences = document.sentences
+        if not sentences:
+            return ()
+        scores = self.rate_sentences(self.term_matrix(sentences), sentences_count)
+        # The best sentences, the earliest first among equal scores
+        best = np.argsort(-scores, kind="stable")[:sentences_count]
+        return tuple(sentences[index] for index in np.sort(best))
+
+    def term_matrix(self, sentences: Tuple[Sentence]) -> TermMatrix:
+        """
+        Build the `TermMatrix` of the sentences of a document, normalizing, filtering, and
+        stemming each distinct word once.
+        """
+        vocabulary: Dict[str, int] = {}
+        # The term of each distinct word, -1 for the stop words
+        terms: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[int] = []
+        tokens: List[int] = []
+        lengths: List[int] = []
+        for row, sentence in enumerate(sentences):
+            words = sentence.words
+            sentence_counts: Dict[int, int] = {}
+            for word in words:
+                term = terms.get(word)
+                if term is None:
+                    normalized = self.normalize_word(word)
+                    if normalized in self._stop_words:
+                        term = -1
+                    else:
+                        term = vocabulary.setdefault(self.stem_word(word), len(vocabulary))
+                    terms[word] = term
+                tokens.append(term)
+                if term >= 0:
+                    sentence_counts[term] = sentence_counts.get(term, 0) + 1
+            rows.extend([row] * len(sentence_counts))
+            cols.extend(sentence_counts)
+            counts.extend(sentence_counts.values())
+            lengths.append(len(words))
+        n_sentences = len(sentences)
+        sentence_rows = np.asarray(rows, dtype=np.intp)
+        return TermMatrix(
+            rows=sentence_rows,
+            cols=np.asarray(cols, dtype=np.intp),
+            counts=np.asarray(counts, dtype=np.float64),
+            offsets=np.concatenate(
+                ([0], np.cumsum(np.bincount(sentence_rows, minlength=n_sentences)))
+            ),
+            tokens=np.asarray(tokens, dtype=np.intp),
+            token_rows=np.repeat(np.arange(n_sentences), lengths),
+            n_sentences=n_sentences,
+            n_terms=len(vocabulary),
+        )
+
+    @abstractmethod
+    def rate_sentences(self, matrix: TermMatrix, sentences_count: int) -> np.ndarray:
+        """
+        The score of each sentence, the higher the better.
+        """
+
+
+class CentroidSummarizer(VectorSummarizer):
+    """
+    Ranks the sentences by the cosine similarity of their TF-IDF vector to the centroid of the
+    document, the mean of the TF-IDF vectors of its sentences, so that the sentences covering the
+    central topics of the document rank first.
+    """
+
+    def rate_sentences(self, matrix: TermMatrix, sentences_count: int) -> np.ndarray:
+        # The smoothed inverse sentence frequency, positive even for the terms of every sentence
+        sentence_frequency = np.bincount(matrix.cols, minlength=matrix.n_terms)
+        idf = np.log((1 + matrix.n_sentences) / (1 + sentence_frequency)) + 1
+        weights = matrix.counts * idf[matrix.cols]
+        centroid = matrix.term_sums(weights) / matrix.n_sentences
+        dots = matrix.sentence_sums(weights * centroid[matrix.cols])
+        norms = np.sqrt(matrix.sentence_sums(weights**2)) * np.linalg.norm(centroid)
+        return np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+
+
+class SumBasicSummarizer(VectorSummarizer):
+    """
+    SumBasic (Nenkova and Vanderwende, 2005): picks the sentence whose terms have the highest
+    mean probability in the document, then squares the probabilities of its terms, so that the
+    next pick favors the terms not covered yet, until the summary has its sentences.
+
+    Each pick is a pass over the entries of the matrix, so a summary of k sentences costs k
+    passes, whereas `sumy`'s implementation picks every sentence of the document in turn, in
+    quadratic time.
+    """
+
+    def rate_sentences(self, matrix: TermMatrix, sentences_count: int) -> np.ndarray:
+        term_counts = matrix.term_sums(matrix.counts)
+        probabilities = term_counts / max(term_counts.sum(), 1)
+        lengths = matrix.sentence_sums(matrix.counts)
+        # The order of the picks, the first pick having the highest score
+        scores = np.zeros(matrix.n_sentences)
+        picked = np.zeros(matrix.n_sentences, dtype=bool)
+        for pick in range(min(sentences_count, matrix.n_sentences)):
+            sums = matrix.sentence_sums(matrix.counts * probabilities[matrix.cols])
+            means = np.divide(sums, lengths, out=np.zeros_like(sums), where=lengths > 0)
+            means[picked] = -1
+            best = int(np.argmax(means))
+            picked[best] = True
+            scores[best] = sentences_count - pick
+            terms = matrix.cols[matrix.offsets[best] : matrix.offsets[best + 1]]
+            probabilities[terms] **= 2
+        return scores
+
+
+class LuhnSummarizer(VectorSummarizer):
+    """
+    Luhn (1958): rates each sentence by its best cluster of significant terms, the terms that
+    occur more than once in the document. A cluster is a run of words whose significant terms
+    are at most `max_gap_size` insignificant words apart, rated by the square of its number of
+    significant terms divided by its number of words. This is the rating of `sumy`'s
+    `LuhnSummarizer`, computed over the whole sequence of words at once.
+    """
+
+    max_gap_size = 4
+
+    def rate_sentences(self, matrix: TermMatrix, sentences_count: int) -> np.ndarray:
+        significant_terms = matrix.term_sums(matrix.counts) > 1
+        significant = np.zeros(len(matrix.tokens), dtype=bool)
+        content = matrix.tokens >= 0
+        significant[content] = significant_terms[matrix.tokens[content]]
+        positions = np.flatnonzero(significant)
+        scores = np.zeros(matrix.n_sentences)
+        if not len(positions):
+            return scores
+        rows = matrix.token_rows[positions]
+        # A cluster starts at the first significant word of a sentence and after every gap of at
+        # least `max_gap_size` insignificant words
+        starts = np.ones(len(positions), dtype=bool)
+        starts[1:] = (np.diff(positions) > self.max_gap_size) | (np.diff(rows) != 0)
+        first = np.flatnonzero(starts)
+        last = np.append(first[1:], len(positions)) - 1
+        significant_counts = last - first + 1
+        lengths = positions[last] - positions[first] + 1
+        ratings = np.where(significant_counts > 1, significant_counts**2 / lengths, 0.0)
+        np.maximum.at(scores, rows[first], ratings)
+        return scores
@@ -0,0 +1,434 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import logging
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+import httpcore
+import httpx
+import orjson
+
+from app.config import Settings
+from app.metrics import WEBHOOK_DELIVERY_ATTEMPTS
+from app.models.pydantic_model import DeliveryStatus
+from app.models.tortoise_model import TextSummary, TextSummarySchema, WebhookDelivery
+
+logger = logging.getLogger("uvicorn")
+
+# The headers of a delivery: its ID, which is the same for all its attempts so that receivers can
+# deduplicate them, the time of the attempt, and the signature of the time and the body
+ID_HEADER = "X-Webhook-Id"
+TIMESTAMP_HEADER = "X-Webhook-Timestamp"
+SIGNATURE_HEADER = "X-Webhook-Signature"
+# The statuses of the responses after which a delivery is retried, besides the 5xx statuses; any
+# other response that is not a 2xx is a permanent failure
+RETRIED_STATUSES = {408, 425, 429}
+# The number of due deliveries claimed at a time by a process
+DELIVERY_BATCH = 64
+# An attempt in progress holds its delivery for the timeout of the attempt and this margin, after
+# which it is due again, e.g., if the process stopped during the attempt
+LEASE_MARGIN_SECONDS = 30.0
+
+
+class CallbackForbiddenError(Exception):
+    """
+    A callback URL whose host may not receive deliveries, see `check_callback_url`.
+    """
+
+
+async def resolve(host: str) -> List[str]:
+    """
+    The IP addresses of a host name.
+
+    Raises
+    ------
+    OSError
+        If the host name does not resolve.
+    """
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+async def checked_addresses(host: str, settings: Settings) -> List[str]:
+    """
+    Resolve the host of a callback URL, checking that it may receive deliveries, so that a
+    client cannot make the service POST to itself or to its internal network (server-side
+    request forgery).
+
+    If `webhook_allowed_hosts` is set, the host must be one of them, and it is trusted wherever
+    it resolves. Otherwise, the host must be a name, not an IP address, and all its addresses
+    must be public: not loopback, private, link-local, multicast, or reserved.
+
+    Parameters
+    ----------
+    host : str
+        The host of the callback URL.
+    settings : Settings
+        The application settings, which configure the allowed hosts.
+
+    Returns
+    -------
+    List[str]
+        The addresses of the host.
+
+    Raises
+    ------
+    CallbackForbiddenError
+        If the host may not receive deliveries.
+    OSError
+        If the host does not resolve.
+    """
+    if settings.webhook_allowed_hosts:
+        if host not in {allowed.lower() for allowed in settings.webhook_allowed_hosts}:
+            raise CallbackForbiddenError(f"The host {host} is not an allowed callback host")
+        return await resolve(host)
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        pass
+    else:
+        raise CallbackForbiddenError("The callback URL must have a host name, not an IP address")
+    addresses = await resolve(host)
+    for address in addresses:
+        # Without the zone of a link-local IPv6 address, e.g., 'fe80::1%eth0'
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            raise CallbackForbiddenError(f"The host {host} resolves to the internal address {ip}")
+    return addresses
+
+
+async def check_callback_url(url: str, settings: Settings) -> None:
+    """
+    Check that a callback URL may receive deliveries when its summary is requested, see
+    `checked_addresses`. The deliveries check its host again as they connect to it, see
+    `CheckedNetworkBackend`.
+
+    Raises
+    ------
+    CallbackForbiddenError
+        If the callback URL may not receive deliveries.
+    OSError
+        If its host does not resolve.
+    """
+    await checked_addresses(httpx.URL(url).host, settings)
+
+
+class CheckedNetworkBackend(httpcore.AsyncNetworkBackend):
+    """
+    The network backend of the deliveries: each connection resolves its host once with
+    `checked_addresses` and dials one of the checked addresses, so that a host cannot resolve
+    to a public address for the check and to an internal one for the connection (DNS
+    rebinding). The host name is kept for the `Host` header and the TLS SNI and certificate.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings = settings
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[httpcore.SOCKET_OPTION]] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        addresses = await asyncio.wait_for(checked_addresses(host, self._settings), timeout)
+        for address in addresses[:-1]:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout):
+                # Try the next address, as the resolver of the system would
+                pass
+        return await self._backend.connect_tcp(
+            addresses[-1], port, timeout, local_address, socket_options
+        )
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+def delivery_transport(settings: Settings) -> httpx.AsyncHTTPTransport:
+    """
+    The transport of the deliveries, whose connections are made by a `CheckedNetworkBackend`,
+    ignoring the proxies of the environment, which would connect to the hosts unchecked.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings, which configure the deliveries.
+
+    Returns
+    -------
+    httpx.AsyncHTTPTransport
+        The transport, whose connection pool is shared by the deliveries.
+    """
+    transport = httpx.AsyncHTTPTransport(trust_env=False)
+    # httpx does not take a network backend, so the connection pool of the transport is
+    # replaced by one with the same defaults and the checked backend
+    transport._pool = httpcore.AsyncConnectionPool(
+        ssl_context=httpx.create_ssl_context(),
+        max_connections=settings.webhook_max_concurrency,
+        max_keepalive_connections=settings.webhook_max_concurrency,
+        keepalive_expiry=5.0,
+        network_backend=CheckedNetworkBackend(settings),
+    )
+    return transport
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    The signature of a delivery, the hex HMAC-SHA256 of '<timestamp>.<body>' with the secret.
+
+    Receivers recompute it from the `X-Webhook-Timestamp` header and the raw body, and reject
+    old timestamps so that a captured delivery cannot be replayed.
+    """
+    message = str(timestamp).encode() + b"." + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def backoff(attempts: int, settings: Settings) -> float:
+    """
+    The delay before the next attempt of a delivery after a number of failed attempts.
+    """
+    return min(
+        settings.webhook_backoff_seconds * 2 ** (attempts - 1), settings.webhook_max_backoff_seconds
+    )
+
+
+async def schedule(summary_id: int) -> None:
+    """
+    Make the deliveries waiting for the job of a summary due, once the job has ended, and wake
+    up the `webhook_dispatcher` of this process.
+
+    Parameters
+    ----------
+    summary_id : int
+        The ID of the summary.
+    """
+    updated = await WebhookDelivery.filter(
+        summary_id=summary_id, status=DeliveryStatus.waiting
+    ).update(status=DeliveryStatus.pending, next_attempt_at=datetime.now(timezone.utc))
+    if updated:
+        webhook_dispatcher.notify()
+
+
+async def attempt(delivery: WebhookDelivery, client: httpx.AsyncClient, settings: Settings) -> None:
+    """
+    Make an attempt of a claimed delivery, POSTing the summary as JSON, in the representation of
+    `GET /summaries/{id}/`, and record its outcome: delivered, retried after a backoff, or
+    failed once the endpoint rejects it or the attempts are exhausted. A callback URL whose host
+    no longer passes `checked_addresses` when the client connects to it fails at once, and
+    redirects are not followed.
+
+    Parameters
+    ----------
+    delivery : WebhookDelivery
+        The delivery, claimed by `deliver_due`.
+    client : httpx.AsyncClient
+        The client whose connection pool is shared by the deliveries.
+    settings : Settings
+        The application settings, which configure the signature and the retries.
+    """
+    summary = await TextSummary.filter(id=delivery.summary_id).values(
+        *TextSummarySchema.model_fields
+    )
+    if not summary:
+        # The summary was deleted in the meantime
+        await WebhookDelivery.filter(id=delivery.id).update(
+            status=DeliveryStatus.failed, last_error="The summary no longer exists"
+        )
+        WEBHOOK_DELIVERY_ATTEMPTS.labels(outcome="failed").inc()
+        return
+    body = orjson.dumps(summary[0], option=orjson.OPT_UTC_Z)
+    timestamp = int(time.time())
+    headers = {
+        "Content-Type": "application/json",
+        ID_HEADER: str(delivery.id),
+        TIMESTAMP_HEADER: str(timestamp),
+    }
+    if settings.webhook_secret:
+        headers[SIGNATURE_HEADER] = sign(settings.webhook_secret, timestamp, body)
+
+    response_status = None
+    try:
+        response = await client.post(
+            delivery.callback_url,
+            content=body,
+            headers=headers,
+            timeout=settings.webhook_timeout_seconds,
+            follow_redirects=False,
+        )
+        response_status = response.status_code
+        if response.is_success:
+            await WebhookDelivery.filter(id=delivery.id).update(
+                status=DeliveryStatus.delivered,
+                response_status=response_status,
+                last_error=None,
+                delivered_at=datetime.now(timezone.utc),
+            )
+            WEBHOOK_DELIVERY_ATTEMPTS.labels(outcome="delivered").inc()
+            return
+        error = f"The callback URL responded with status {response_status}"
+        retry = response_status >= 500 or response_status in RETRIED_STATUSES
+    except CallbackForbiddenError as exception:
+        error = f"The callback URL is not allowed: {exception}"
+        retry = False
+    except (httpx.HTTPError, OSError) as exception:
+        error = f"The request to the callback URL failed: {exception!r}"
+        retry = True
+
+    if retry and delivery.attempts < settings.webhook_max_attempts:
+        await WebhookDelivery.filter(id=delivery.id).update(
+            response_status=response_status,
+            last_error=error,
+            next_attempt_at=datetime.now(timezone.utc)
+            + timedelta(seconds=backoff(delivery.attempts, settings)),
+        )
+        WEBHOOK_DELIVERY_ATTEMPTS.labels(outcome="retried").inc()
+    else:
+        await WebhookDelivery.filter(id=delivery.id).update(
+            status=DeliveryStatus.failed, response_status=response_status, last_error=error
+        )
+        WEBHOOK_DELIVERY_ATTEMPTS.labels(outcome="failed").inc()
+
+
+async def deliver_due(client: httpx.AsyncClient, settings: Settings) -> int:
+    """
+    Claim up to `DELIVERY_BATCH` due deliveries and attempt them, at most
+    `webhook_max_concurrency` at a time.
+
+    A delivery is claimed by incrementing its number of attempts only if it has not changed, so
+    that the processes looking up the due deliveries concurrently do not attempt it twice, and
+    its next attempt is pushed back by a lease. It is claimed once it has one of the
+    `webhook_max_concurrency` slots, so that its lease does not run out while it waits for one.
+
+    Parameters
+    ----------
+    client : httpx.AsyncClient
+        The client whose connection pool is shared by the deliveries.
+    settings : Settings
+        The application settings, which configure the deliveries.
+
+    Returns
+    -------
+    int
+        The number of due deliveries found, `DELIVERY_BATCH` if there may be more.
+    """
+    now = datetime.now(timezone.utc)
+    due = (
+        await WebhookDelivery.filter(status=DeliveryStatus.pending, next_attempt_at__lte=now)
+        .order_by("next_attempt_at")
+        .limit(DELIVERY_BATCH)
+    )
+    semaphore = asyncio.Semaphore(settings.webhook_max_concurrency)
+
+    async def claim_and_attempt(delivery: WebhookDelivery) -> None:
+        # Claimed once it has a slot, so that its lease runs from the start of its attempt
+        async with semaphore:
+            lease = datetime.now(timezone.utc) + timedelta(
+                seconds=settings.webhook_timeout_seconds + LEASE_MARGIN_SECONDS
+            )
+            claimed = await WebhookDelivery.filter(
+                id=delivery.id, status=DeliveryStatus.pending, attempts=delivery.attempts
+            ).update(attempts=delivery.attempts + 1, next_attempt_at=lease)
+            if not claimed:
+                return
+            delivery.attempts += 1
+            try:
+                await attempt(delivery, client, settings)
+            except Exception as error:
+                # The lease expires and the delivery is attempted again
+                logger.warning(f"Failed to attempt the delivery {delivery.id}: {error}")
+
+    await asyncio.gather(*(claim_and_attempt(delivery) for delivery in due))
+    return len(due)
+
+
+class WebhookDispatcher(object):
+    """
+    Delivers the summaries to their callback URLs in the background of an application process,
+    with a connection pool shared by the deliveries.
+
+    It attempts the due deliveries as soon as a job of the process ends, and every
+    `webhook_poll_interval_seconds` for the retries and for the deliveries left over by another
+    process or a restart.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(
+        self, settings: Settings, transport: Optional[httpx.AsyncBaseTransport] = None
+    ) -> None:
+        """
+        Start delivering the summaries.
+
+        Parameters
+        ----------
+        settings : Settings
+            The application settings, which configure the deliveries.
+        transport : Optional[httpx.AsyncBaseTransport]
+            The transport of the client, e.g., an `httpx.MockTransport` in tests; defaults to
+            the `delivery_transport`.
+        """
+        self._client = httpx.AsyncClient(
+            transport=transport or delivery_transport(settings), trust_env=False
+        )
+        # Created in the event loop of the application
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run_forever(settings, self._wakeup))
+
+    async def stop(self) -> None:
+        """
+        Stop delivering the summaries, cancelling the attempts in progress, which are retried
+        once their lease expires.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wakeup = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def notify(self) -> None:
+        """
+        Look up the due deliveries without waiting for the next poll, if the dispatcher runs.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run_forever(self, settings: Settings, wakeup: asyncio.Event) -> None:
+        client: httpx.AsyncClient = self._client  # type: ignore[assignment]
+        while True:
+            # As the retention job, wait before the first lookup, while the application starts
+            try:
+                await asyncio.wait_for(
+                    wakeup.wait(), timeout=settings.webhook_poll_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            try:
+                while await deliver_due(client, settings) == DELIVERY_BATCH:
+                    pass
+            except Exception as error:
+                # The next poll retries
+                logger.warning(f"Failed to look up the due deliveries: {error}")
+
+
+# The dispatcher of the deliveries of this process
+webhook_dispatcher = WebhookDispatcher()
@@ -0,0 +1,106 @@
+"""
+A deterministic corpus of HTML article pages at graded sizes, built from the seed pages checked in
+under `benchmarks/html/`.
+
+Only the seed pages are checked in; the larger pages are assembled from their paragraphs with a
+fixed random seed, so every run (and every commit) benchmarks byte-identical inputs. The SHA-256
+digest of each page is reported with the results to make any change to the corpus visible.
+"""
+
+import hashlib
+import random
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+HTML_DIR = Path(__file__).parent / "html"
+
+# The graded page sizes in bytes, keyed by label
+SIZES: Dict[str, int] = {
+    "1kb": 1_000,
+    "10kb": 10_000,
+    "100kb": 100_000,
+    "1mb": 1_000_000,
+    "5mb": 5_000_000,
+}
+
+# The article paragraphs of the seed pages; shorter <p> elements are page chrome (bylines, etc.)
+PARAGRAPH_PATTERN = re.compile(r"<p>(.{200,}?)</p>")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+MINIMAL_PAGE = (
+    '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+    "<title>Benchmark article</title>\n</head>\n<body>\n<article>\n<h1>Benchmark article</h1>\n",
+    "</article>\n</body>\n</html>\n",
+)
+
+
+@lru_cache()
+def seed_pages() -> Tuple[str, ...]:
+    """
+    The checked-in seed pages, in file name order.
+    """
+    return tuple(path.read_text(encoding="utf-8") for path in sorted(HTML_DIR.glob("*.html")))
+
+
+def split_page(page: str) -> Tuple[str, List[str], str]:
+    """
+    Split a seed page into the markup before its article paragraphs, the text of the paragraphs,
+    and the markup after them.
+    """
+    matches = list(PARAGRAPH_PATTERN.finditer(page))
+    return page[: matches[0].start()], [m.group(1) for m in matches], page[matches[-1].end() :]
+
+
+def build_page(size: int, seed: int = 0) -> bytes:
+    """
+    Build an HTML article page of at least `size` bytes (and at most one paragraph more).
+
+    The page reuses the markup of a seed page around its article, except for pages too small to
+    hold it, and its article consists of paragraphs whose sentences are drawn from all seed pages
+    in a deterministic order. Long articles are split into sections with headings, as real long
+    pages are.
+
+    Parameters
+    ----------
+    size : int
+        The target size of the page in bytes.
+    seed : int
+        The seed of the page; pages of the same size and seed are identical.
+
+    Returns
+    -------
+    bytes
+        The UTF-8 encoded page.
+    """
+    rng = random.Random(f"{size}-{seed}")
+    pages = [split_page(page) for page in seed_pages()]
+    head, _, tail = pages[seed % len(pages)]
+    if len(head) + len(tail) > size // 2:
+        head, tail = MINIMAL_PAGE
+    paragraphs = [paragraph for _, page_paragraphs, _ in pages for paragraph in page_paragraphs]
+
+    parts = [head]
+    length = len(head) + len(tail)
+    count = 0
+    while length < size:
+        if count and count % 8 == 0:
+            heading = f"<h2>Part {count // 8 + 1}</h2>\n"
+            parts.append(heading)
+            length += len(heading)
+        sentences = SENTENCE_BOUNDARY.split(rng.choice(paragraphs))
+        rng.shuffle(sentences)
+        paragraph = f"<p>{' '.join(sentences)}</p>\n"
+        parts.append(paragraph)
+        length += len(paragraph)
+        count += 1
+    parts.append(tail)
+    return "".join(parts).encode("utf-8")
+
+
+def page_digest(page: bytes) -> str:
+    """
+    The hex digest of the SHA-256 hash of a page, reported with the results.
+    """
+    return hashlib.sha256(page).hexdigest()
@@ -0,0 +1,179 @@
+"""
+Calibrate the cost models of the summarization methods, which the 'auto' method uses to choose a
+method that ranks the sentences of a document within the latency budget of its job.
+
+Each method ranks the sentences of pages of the offline corpus of growing size, with the deadline
+checkpoints of a summarization job, until ranking a page takes more than `--max-seconds`. The
+time of the rank stage is then fitted to the statistics of the pages (see
+`app.cost_model.document_features`) by non-negative least squares on the relative error, so that
+the small pages weigh as much as the large ones. Each method is fitted to the features of its
+algorithm only, so the models extrapolate to pages larger than those measured with the right
+growth. The NLTK tokenizer data must be installed (`python -m nltk.downloader punkt punkt_tab`).
+
+Usage (from the project directory):
+
+    python -m benchmarks.cost_models
+    python -m benchmarks.cost_models --methods lex_rank lsa --max-seconds 2 --json > costs.json
+    SUMMARY_COST_MODELS="$(jq -c .cost_models costs.json)" uvicorn app.main:app
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from app.cost_model import CostModel, document_features
+from app.deadline import Deadline
+from app.summarizer import (
+    ExtractedArticleParser,
+    create_summarizer,
+    default_resources,
+    extract_article,
+    summarizers,
+)
+from benchmarks.corpus import build_page
+from benchmarks.summarizers import git_commit
+
+METHODS = tuple(summarizers)
+
+# The page sizes in bytes, measured in order until a page takes more than the time limit
+SIZES = (2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000, 500_000, 1_000_000, 2_000_000)
+
+# The coefficients of `CostModel` fitted for each method, from the complexity of its algorithm:
+# the graph-based methods compare every pair of sentences, LSA decomposes the term-sentence
+# matrix, and the others make a few passes over the words
+COEFFICIENTS = tuple(CostModel.model_fields)
+METHOD_COEFFICIENTS: Dict[str, Sequence[str]] = {
+    "lsa": ("base_seconds", "word_seconds", "svd_seconds"),
+    "lex_rank": ("base_seconds", "word_seconds", "pair_seconds"),
+    "text_rank": ("base_seconds", "word_seconds", "pair_seconds"),
+    "edmundson": ("base_seconds", "word_seconds", "pair_seconds"),
+}
+LINEAR_COEFFICIENTS = ("base_seconds", "word_seconds")
+
+
+def measure(method: str, size: int, seed: int, repeat: int, sentence_count: int) -> Dict[str, Any]:
+    """
+    Measure the median time a method takes to rank the sentences of a page of the corpus, and
+    the statistics of the page.
+    """
+    resources = default_resources()
+    parser = ExtractedArticleParser(
+        extract_article(build_page(size, seed), f"https://example.com/{size}/{seed}/"),
+        resources.tokenizer,
+    )
+    document = parser.document
+    words = document.words
+    latencies = []
+    for _ in range(repeat):
+        deadline = Deadline(3600)
+        summarizer = create_summarizer(method, parser, deadline, resources)
+        deadline.enter("rank")
+        start = time.perf_counter()
+        summarizer(document, sentence_count)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "method": method,
+        "bytes": size,
+        "seed": seed,
+        "sentences": len(document.sentences),
+        "words": len(words),
+        "terms": len({word.lower() for word in words}),
+        "seconds": statistics.median(latencies),
+    }
+
+
+def fit(cases: List[Dict[str, Any]], coefficients: Sequence[str]) -> CostModel:
+    """
+    Fit a cost model to the measured cases by non-negative least squares on the relative error,
+    dropping the most negative coefficient until none is.
+    """
+    columns = [COEFFICIENTS.index(name) for name in coefficients]
+    features = np.array(
+        [document_features(case["sentences"], case["words"], case["terms"]) for case in cases]
+    )[:, columns]
+    seconds = np.array([case["seconds"] for case in cases])
+    # Relative errors, with the columns scaled to unit norm for the conditioning of the solve
+    matrix = features / seconds[:, None]
+    scales = np.linalg.norm(matrix, axis=0)
+    matrix = matrix / scales
+    active = list(range(len(columns)))
+    while True:
+        solution = np.linalg.lstsq(matrix[:, active], np.ones(len(cases)), rcond=None)[0]
+        if (solution >= 0).all():
+            break
+        del active[int(np.argmin(solution))]
+    values = dict.fromkeys(COEFFICIENTS, 0.0)
+    for index, value in zip(active, solution):
+        values[coefficients[index]] = float(value / scales[index])
+    return CostModel(**values)
+
+
+def calibrate(
+    method: str, seeds: int, repeat: int, sentence_count: int, max_seconds: float
+) -> List[Dict[str, Any]]:
+    """
+    Measure a method over pages of growing size until one takes more than `max_seconds`.
+    """
+    cases = []
+    for size in SIZES:
+        measured = [measure(method, size, seed, repeat, sentence_count) for seed in range(seeds)]
+        cases.extend(measured)
+        if max(case["seconds"] for case in measured) > max_seconds:
+            break
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--seeds", type=int, default=2, help="Pages measured per size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sentence-count", type=int, default=10)
+    parser.add_argument(
+        "--max-seconds", type=float, default=5, help="Time beyond which larger pages are skipped"
+    )
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = parser.parse_args()
+
+    cases = []
+    cost_models = {}
+    for method in args.methods:
+        measured = calibrate(method, args.seeds, args.repeat, args.sentence_count, args.max_seconds)
+        model = fit(measured, METHOD_COEFFICIENTS.get(method, LINEAR_COEFFICIENTS))
+        for case in measured:
+            predicted = model.predict(case["sentences"], case["words"], case["terms"])
+            case["error"] = predicted / case["seconds"] - 1
+        cases.extend(measured)
+        cost_models[method] = model.model_dump()
+
+    if args.json:
+        results = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sentence_count": args.sentence_count,
+            "cost_models": cost_models,
+            "cases": cases,
+        }
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'method':>10} {'bytes':>9} {'sentences':>9} {'words':>8} {'terms':>7} "
+        f"{'seconds':>9} {'error':>7}"
+    )
+    for case in cases:
+        print(
+            f"{case['method']:>10} {case['bytes']:>9} {case['sentences']:>9} {case['words']:>8} "
+            f"{case['terms']:>7} {case['seconds']:>9.4f} {case['error']:>+7.1%}"
+        )
+    for method, model in cost_models.items():
+        print(method, ", ".join(f"{name}={value:.3g}" for name, value in model.items()))
+
+
+if __name__ == "__main__":
+    main()
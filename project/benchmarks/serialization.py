@@ -0,0 +1,120 @@
+"""
+Compare the cost of serializing summary rows through FastAPI's validated response path against
+the trusted orjson path used by the read endpoints.
+
+Usage (from the project directory):
+
+    python -m benchmarks.serialization --rows 1000 10000 100000 --repeat 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.api.crud import SCHEMA_FIELDS
+from app.api.responses import TrustedRowsResponse
+from app.models.tortoise_model import TextSummarySchema
+
+SummaryAdapter: TypeAdapter = TypeAdapter(List[TextSummarySchema])  # type: ignore[valid-type]
+
+
+def make_rows(n: int) -> List[Dict[str, Any]]:
+    """
+    Build `n` rows shaped like the output of `crud.get_all`, with the fields of
+    `crud.SCHEMA_FIELDS`; a field of the schema without a value here raises a KeyError.
+    """
+    created_at = datetime(2024, 9, 17, tzinfo=timezone.utc)
+    summary = "\n".join(f"This is sentence number {i} of a typical summary." for i in range(10))
+
+    def row(i: int) -> Dict[str, Any]:
+        url = f"https://example.com/articles/{i}/"
+        values = {
+            "id": i,
+            "url": url,
+            "summary": summary,
+            "summarization_method": "lsa",
+            "sentence_count": 10,
+            "created_at": created_at + timedelta(seconds=i),
+            "status": "completed",
+            "canonical_url": url.rstrip("/"),
+            "canonical_link": None,
+            "language": None,
+            "selected_method": "lsa",
+        }
+        return {field: values[field] for field in SCHEMA_FIELDS}
+
+    return [row(i) for i in range(1, n + 1)]
+
+
+def validated_path(rows: List[Dict[str, Any]]) -> bytes:
+    """
+    Mirror FastAPI's `serialize_response` for a `response_model`: validate the rows, dump them to
+    JSON-compatible Python objects, and render them with the stdlib encoder.
+    """
+    content = SummaryAdapter.dump_python(SummaryAdapter.validate_python(rows), mode="json")
+    return bytes(JSONResponse(content).body)
+
+
+def trusted_path(rows: List[Dict[str, Any]]) -> bytes:
+    """
+    Encode the rows directly with orjson, as the read endpoints do.
+    """
+    return bytes(TrustedRowsResponse(rows).body)
+
+
+def time_path(
+    path: Callable[[List[Dict[str, Any]]], bytes], rows: List[Dict], repeat: int
+) -> float:
+    """
+    Return the median wall time in seconds over `repeat` runs.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path(rows)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.rows:
+        rows = make_rows(n)
+        # Both paths must produce the same payload for the comparison to be meaningful
+        assert json.loads(validated_path(rows)) == json.loads(trusted_path(rows))
+        validated = time_path(validated_path, rows, args.repeat)
+        trusted = time_path(trusted_path, rows, args.repeat)
+        results.append(
+            {
+                "rows": n,
+                "validated_ms": validated * 1000,
+                "trusted_ms": trusted * 1000,
+                "speedup": validated / trusted,
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'rows':>8} {'validated (ms)':>15} {'trusted (ms)':>13} {'speedup':>8}")
+    for result in results:
+        print(
+            f"{result['rows']:>8} {result['validated_ms']:>15.2f} "
+            f"{result['trusted_ms']:>13.2f} {result['speedup']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Measure the import time of the application and of the summarization stack, and the startup time
+and the per-worker memory of gunicorn with and without preloading the summarization stack in the
+master process (`PRELOAD_NLP`).
+
+The memory of each process is read from `/proc/<pid>/smaps_rollup` (Linux only). RSS counts the
+pages shared copy-on-write with the master process in every worker, so compare the PSS
+(proportional set size, shared pages split between the processes sharing them) and the private
+memory of the workers instead. Before measuring, summarization jobs are sent to the workers so
+that workers without preloading import the stack as well; their pages are served from the offline
+corpus, so the NLTK tokenizer data must be installed (`python -m nltk.downloader punkt punkt_tab`).
+
+Usage (from the project directory):
+
+    python -m benchmarks.startup --workers 4
+    python -m benchmarks.startup --workers 4 --jobs 0 --json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import httpx
+import nltk
+
+from app.config import DEFAULT_RATE_LIMIT_POLICIES
+from benchmarks.load import CorpusHandler, free_port
+
+IMPORT_TIME_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, int("sumy" in sys.modules))
+"""
+
+# The fields of /proc/<pid>/smaps_rollup that are reported, in kB
+MEMORY_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+SCHEMA_SCRIPT = """
+from tortoise import Tortoise, run_async
+from app.config import get_settings
+from app.db import get_tortoise_config
+
+async def main():
+    await Tortoise.init(config=get_tortoise_config(get_settings()))
+    await Tortoise.generate_schemas(safe=True)
+
+run_async(main())
+"""
+
+STARTUP_COMPLETE = re.compile(r"\[(\d+)\] \[INFO\] Application startup complete")
+
+
+def import_time(module: str, repeat: int) -> Dict[str, Any]:
+    """
+    The median time to import a module in a fresh interpreter, and whether the import loads the
+    summarization stack.
+    """
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_TIME_SCRIPT.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        seconds, loads_summarizers = output.stdout.split()
+        times.append(float(seconds))
+    return {
+        "module": module,
+        "import_ms": statistics.median(times) * 1000,
+        "loads_summarizers": loads_summarizers == "1",
+    }
+
+
+def process_memory(pid: int) -> Dict[str, float]:
+    """
+    The memory of a process in megabytes, from `/proc/<pid>/smaps_rollup`.
+    """
+    memory = {"private_mb": 0.0}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            if name in MEMORY_FIELDS:
+                memory[MEMORY_FIELDS[name]] = int(value.split()[0]) / 1024
+    memory["private_mb"] = memory.pop("private_clean_mb") + memory.pop("private_dirty_mb")
+    return memory
+
+
+def worker_pids(master: int) -> List[int]:
+    with open(f"/proc/{master}/task/{master}/children") as file:
+        return [int(pid) for pid in file.read().split()]
+
+
+def run_gunicorn(
+    preload: bool, workers: int, jobs: int, corpus_url: str, timeout: float
+) -> Dict[str, Any]:
+    """
+    Start gunicorn, wait for every worker to complete its startup, run summarization jobs, and
+    measure the memory of the master and of each worker.
+    """
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "PRELOAD_NLP": str(preload).lower(),
+            "DATABASE_URL": f"sqlite://{directory}/startup.db",
+            # Local rate limiting that tolerates the absence of Redis, without limits
+            "RATE_LIMITER_MODE": "hybrid",
+            "RATE_LIMITER_FAIL_OPEN": "true",
+            "REDIS_ENDPOINT": "127.0.0.1:1",
+            "REDIS_PASSWORD": "",
+            "RATE_LIMIT_POLICIES": json.dumps(
+                {
+                    route: {"default": {"times": 10**9, "seconds": 1}}
+                    for route in DEFAULT_RATE_LIMIT_POLICIES
+                }
+            ),
+            "PROMETHEUS_MULTIPROC_DIR": os.path.join(directory, "metrics"),
+        }
+        # The schema is generated by the migrations in production
+        subprocess.run(
+            [sys.executable, "-c", SCHEMA_SCRIPT],
+            env=env,
+            capture_output=True,
+            check=True,
+        )
+        log_path = os.path.join(directory, "gunicorn.log")
+        with open(log_path, "w") as log:
+            start = time.perf_counter()
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "gunicorn",
+                    "app.main:app",
+                    "--bind",
+                    f"127.0.0.1:{port}",
+                    "--workers",
+                    str(workers),
+                    "-k",
+                    "uvicorn.workers.UvicornWorker",
+                ],
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        try:
+            started: Dict[str, float] = {}
+            deadline = start + timeout
+            while len(started) < workers:
+                if time.perf_counter() > deadline or server.poll() is not None:
+                    with open(log_path) as log:
+                        raise RuntimeError(f"gunicorn did not start:\n{log.read()}")
+                with open(log_path) as log:
+                    for pid in STARTUP_COMPLETE.findall(log.read()):
+                        started.setdefault(pid, time.perf_counter() - start)
+                time.sleep(0.05)
+
+            base_url = f"http://127.0.0.1:{port}"
+            ids = []
+            with httpx.Client(base_url=base_url, timeout=timeout) as client:
+                for i in range(jobs):
+                    url = f"{corpus_url}/10kb/{i}.html"
+                    ids.append(client.post("/summaries/", json={"url": url}).json()["id"])
+                # Wait for the jobs, whose workers import the stack unless it was preloaded
+                while jobs:
+                    rows = client.get("/summaries/", params={"ids": ids}).json()
+                    if all(row["summary"] for row in rows):
+                        break
+                    if time.perf_counter() > deadline + timeout:
+                        raise RuntimeError("The summarization jobs did not complete")
+                    time.sleep(0.2)
+
+            workers_memory = [process_memory(pid) for pid in worker_pids(server.pid)]
+            return {
+                "preload": preload,
+                "workers": workers,
+                "jobs": jobs,
+                "first_worker_ready_s": min(started.values()),
+                "all_workers_ready_s": max(started.values()),
+                "master": process_memory(server.pid),
+                "worker_mean": {
+                    field: statistics.mean(memory[field] for memory in workers_memory)
+                    for field in workers_memory[0]
+                },
+                "total_pss_mb": process_memory(server.pid)["pss_mb"]
+                + sum(memory["pss_mb"] for memory in workers_memory),
+            }
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{'module':>20} {'import (ms)':>11} {'loads sumy':>10}")
+    for result in report["imports"]:
+        print(
+            f"{result['module']:>20} {result['import_ms']:>11.0f} "
+            f"{str(result['loads_summarizers']):>10}"
+        )
+    print()
+    print(
+        f"{'preload':>7} {'ready (s)':>9} {'master RSS':>10} {'worker RSS':>10} "
+        f"{'worker PSS':>10} {'private':>8} {'total PSS':>9}  (MB)"
+    )
+    for result in report["gunicorn"]:
+        worker = result["worker_mean"]
+        print(
+            f"{str(result['preload']):>7} {result['all_workers_ready_s']:>9.2f} "
+            f"{result['master']['rss_mb']:>10.1f} {worker['rss_mb']:>10.1f} "
+            f"{worker['pss_mb']:>10.1f} {worker['private_mb']:>8.1f} "
+            f"{result['total_pss_mb']:>9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--jobs", type=int, help="Summarization jobs before measuring, defaults to 3 per worker"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each import measurement")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = parser.parse_args()
+    jobs = 3 * args.workers if args.jobs is None else args.jobs
+    if jobs:
+        try:
+            nltk.data.find("tokenizers/punkt_tab")
+        except LookupError:
+            parser.error("The NLTK tokenizer data is missing, see `python -m nltk.downloader`")
+
+    corpus = ThreadingHTTPServer(("127.0.0.1", 0), CorpusHandler)
+    threading.Thread(target=corpus.serve_forever, daemon=True).start()
+    corpus_url = f"http://127.0.0.1:{corpus.server_address[1]}"
+    report = {
+        "imports": [
+            import_time(module, args.repeat)
+            for module in ("app.main", "app.summarizer", "sumy.summarizers.lsa")
+        ],
+        "gunicorn": [
+            run_gunicorn(preload, args.workers, jobs, corpus_url, args.timeout)
+            for preload in (False, True)
+        ],
+    }
+    corpus.shutdown()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
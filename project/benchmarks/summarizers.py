@@ -0,0 +1,260 @@
+"""
+Benchmark every summarization method over the offline HTML corpus at graded sizes, reporting the
+throughput, the p50/p99 latency, and the peak RSS of each method and size.
+
+Each method and size runs in a fresh process, so the peak RSS of one case is not inflated by the
+previous ones and a case that exceeds the timeout can be stopped. The latency covers the offline
+pipeline of `generate_summary`: extraction, tokenization, and ranking. No network access is needed,
+but the NLTK tokenizer data must be installed (`python -m nltk.downloader punkt punkt_tab`).
+
+Usage (from the project directory):
+
+    python -m benchmarks.summarizers --sizes 1kb 10kb 100kb --repeat 5
+    python -m benchmarks.summarizers --json > results.json
+    python -m benchmarks.summarizers --baseline results.json
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.summarizer import (
+    ExtractedArticleParser,
+    create_summarizer,
+    default_resources,
+    extract_article,
+    summarizers,
+)
+from benchmarks.corpus import SIZES, build_page, page_digest
+
+METHODS = tuple(summarizers)
+
+
+def summarize_page(html: bytes, url: str, method: str, sentence_count: int) -> Tuple[str, int]:
+    """
+    Summarize an HTML page as `generate_summary` does, without fetching or storing anything.
+
+    Returns
+    -------
+    Tuple[str, int]
+        The summary and the number of sentences in the extracted article.
+    """
+    resources = default_resources()
+    parser = ExtractedArticleParser(extract_article(html, url), resources.tokenizer)
+    summarizer = create_summarizer(method, parser, resources=resources)
+    sentences = summarizer(parser.document, sentence_count)
+    return "\n".join(sentence._text for sentence in sentences), len(parser.document.sentences)
+
+
+def peak_rss_bytes() -> int:
+    """
+    The peak resident set size of the current process in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(
+    method: str,
+    size: str,
+    repeat: int,
+    warmup: int,
+    sentence_count: int,
+    memory_limit_mb: Optional[int],
+    results: multiprocessing.Queue,
+) -> None:
+    """
+    Run one method over one page size in a worker process and put the measurements on `results`.
+    """
+    try:
+        if memory_limit_mb:
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        page = build_page(SIZES[size])
+        url = f"https://example.com/{size}/"
+        for _ in range(warmup):
+            summarize_page(page, url, method, sentence_count)
+        latencies = []
+        sentences = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _, sentences = summarize_page(page, url, method, sentence_count)
+            latencies.append(time.perf_counter() - start)
+        results.put({"latencies": latencies, "sentences": sentences, "peak_rss": peak_rss_bytes()})
+    except BaseException as error:
+        results.put({"error": f"{type(error).__name__}: {error}"})
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    The nearest-rank percentile `q` (0-100) of the values.
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def benchmark(
+    method: str,
+    size: str,
+    repeat: int,
+    warmup: int,
+    sentence_count: int,
+    timeout: float,
+    memory_limit_mb: Optional[int],
+) -> Dict[str, Any]:
+    """
+    Benchmark one method over one page size in a fresh process.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The result of the case, whose `status` is 'ok', 'timeout', or 'error'.
+    """
+    page = build_page(SIZES[size])
+    result: Dict[str, Any] = {
+        "method": method,
+        "size": size,
+        "bytes": len(page),
+        "sha256": page_digest(page),
+        "repeat": repeat,
+    }
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=run_case,
+        args=(method, size, repeat, warmup, sentence_count, memory_limit_mb, results),
+    )
+    process.start()
+    deadline = time.monotonic() + timeout
+    measurements = None
+    # Poll so that a worker killed by the OS (e.g., out of memory) is not waited on until the timeout
+    while measurements is None and time.monotonic() < deadline:
+        try:
+            measurements = results.get(timeout=1.0)
+        except queue.Empty:
+            if not process.is_alive():
+                measurements = {"error": f"Worker exited with code {process.exitcode}"}
+    if process.is_alive():
+        process.terminate()
+    process.join()
+
+    if measurements is None:
+        return {**result, "status": "timeout"}
+    if "error" in measurements:
+        return {**result, "status": "error", "error": measurements["error"]}
+    latencies = measurements["latencies"]
+    mean = sum(latencies) / len(latencies)
+    return {
+        **result,
+        "status": "ok",
+        "sentences": measurements["sentences"],
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "docs_per_s": 1 / mean,
+        "mb_per_s": len(page) / mean / 1_000_000,
+        "peak_rss_mb": measurements["peak_rss"] / 1024 / 1024,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """
+    The commit the benchmark ran on, if the project is a git checkout.
+    """
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def compare(cases: List[Dict[str, Any]], baseline: Dict[str, Any]) -> None:
+    """
+    Annotate each case with the relative change of its p50 latency and peak RSS against the
+    matching case of a baseline run.
+    """
+    previous = {(case["method"], case["size"]): case for case in baseline["cases"]}
+    for case in cases:
+        before = previous.get((case["method"], case["size"]))
+        if case["status"] != "ok" or not before or before["status"] != "ok":
+            continue
+        if before["sha256"] != case["sha256"]:
+            # A different page is not a regression of the code
+            continue
+        case["p50_change"] = case["p50_ms"] / before["p50_ms"] - 1
+        case["peak_rss_change"] = case["peak_rss_mb"] / before["peak_rss_mb"] - 1
+
+
+def print_table(cases: List[Dict[str, Any]]) -> None:
+    print(
+        f"{'method':>10} {'size':>6} {'sentences':>9} {'p50 (ms)':>10} {'p99 (ms)':>10} "
+        f"{'docs/s':>8} {'MB/s':>7} {'RSS (MB)':>9} {'p50 vs base':>11}"
+    )
+    for case in cases:
+        if case["status"] != "ok":
+            detail = case.get("error", "")
+            print(f"{case['method']:>10} {case['size']:>6} {case['status']:>9} {detail}")
+            continue
+        change = f"{case['p50_change']:+.1%}" if "p50_change" in case else ""
+        print(
+            f"{case['method']:>10} {case['size']:>6} {case['sentences']:>9} "
+            f"{case['p50_ms']:>10.1f} {case['p99_ms']:>10.1f} {case['docs_per_s']:>8.2f} "
+            f"{case['mb_per_s']:>7.2f} {case['peak_rss_mb']:>9.1f} {change:>11}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--sentence-count", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per case")
+    parser.add_argument("--memory-limit-mb", type=int, help="Address space limit per case")
+    parser.add_argument("--baseline", help="Results of a previous run to compare against")
+    parser.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = parser.parse_args()
+
+    cases = [
+        benchmark(
+            method,
+            size,
+            args.repeat,
+            args.warmup,
+            args.sentence_count,
+            args.timeout,
+            args.memory_limit_mb,
+        )
+        for method in args.methods
+        for size in args.sizes
+    ]
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(cases, json.load(file))
+
+    if args.json:
+        results = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sentence_count": args.sentence_count,
+            "cases": cases,
+        }
+        print(json.dumps(results, indent=2))
+        return
+    print_table(cases)
+
+
+if __name__ == "__main__":
+    main()
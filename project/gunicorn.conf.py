@@ -0,0 +1,64 @@
+"""
+Gunicorn configuration, loaded automatically from the working directory.
+
+When `PROMETHEUS_MULTIPROC_DIR` is set, each worker writes its metrics to files in that directory,
+and `GET /metrics` aggregates them across the workers.
+
+When `PRELOAD_NLP` is true (the default), the master process imports the application and the
+summarization stack and loads the NLP resources before forking the workers, which then share those
+pages copy-on-write instead of each importing the stack on its first summarization job.
+"""
+
+import gc
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+from app.config import get_settings
+
+preload_app = get_settings().preload_nlp
+
+if preload_app:
+    # Avoid leaving freed holes in the pages that the workers will share, see `when_ready`
+    gc.disable()
+
+
+def clear_metrics_directory() -> None:
+    """
+    Clear the metric files left over from a previous run of the server.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+# Cleared as the configuration loads, since a preloaded application creates its metric files
+# before any server hook runs
+clear_metrics_directory()
+
+
+def when_ready(server) -> None:  # type: ignore[no-untyped-def]
+    """
+    Preload the summarization stack and freeze the objects of the master process before the
+    workers are forked.
+    """
+    if not preload_app:
+        return
+    from app.summarizer import preload
+
+    preload()
+    # Frozen objects are ignored by the garbage collector, so collections in the workers do not
+    # write to (and thereby copy) the shared pages
+    gc.freeze()
+    gc.enable()
+    server.log.info(f"Preloaded the summarization stack, froze {gc.get_freeze_count()} objects")
+
+
+def child_exit(server, worker) -> None:  # type: ignore[no-untyped-def]
+    """
+    Drop the live gauges of an exited worker, so they no longer count towards the aggregates.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
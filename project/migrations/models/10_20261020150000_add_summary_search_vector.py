@@ -0,0 +1,22 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # The words of the URL are separated, since the parser reads a URL as a single token. The
+    # column is generated on each monthly partition of the table as well, and the partitions
+    # created by the retention job copy its generation expression
+    return """
+        ALTER TABLE "textsummary" ADD COLUMN IF NOT EXISTS "search_vector" TSVECTOR
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english'::regconfig, coalesce("summary", '')), 'A')
+                || setweight(to_tsvector(
+                    'english'::regconfig, regexp_replace(coalesce("url", ''), '[^[:alnum:]]+', ' ', 'g')
+                ), 'B')
+            ) STORED;
+        CREATE INDEX IF NOT EXISTS "idx_textsummary_search_vector" ON "textsummary" USING GIN ("search_vector");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_textsummary_search_vector";
+        ALTER TABLE "textsummary" DROP COLUMN IF EXISTS "search_vector";"""
@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # The column is added to each monthly partition of the table as well
+    return """
+        ALTER TABLE "textsummary" ADD "language" VARCHAR(16);
+        ALTER TABLE "summarydiagnostics" ADD "language" VARCHAR(16);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "summarydiagnostics" DROP COLUMN "language";
+        ALTER TABLE "textsummary" DROP COLUMN "language";"""
@@ -0,0 +1,12 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # The column is added to each monthly partition of the table as well
+    return """
+        ALTER TABLE "textsummary" ADD "selected_method" VARCHAR(16);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "textsummary" DROP COLUMN "selected_method";"""
@@ -0,0 +1,22 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "sourcedocument" (
+    "content_hash" VARCHAR(64) NOT NULL PRIMARY KEY,
+    "content" BYTEA NOT NULL,
+    "compression" VARCHAR(16) NOT NULL,
+    "raw_size" INT NOT NULL,
+    "compressed_size" INT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+        ALTER TABLE "textsummary" ADD "source_hash" VARCHAR(64);
+        CREATE INDEX "idx_textsummary_source_hash" ON "textsummary" ("source_hash");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_textsummary_source_hash";
+        ALTER TABLE "textsummary" DROP COLUMN "source_hash";
+        DROP TABLE IF EXISTS "sourcedocument";"""
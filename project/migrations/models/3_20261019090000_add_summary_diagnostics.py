@@ -0,0 +1,22 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "summarydiagnostics" (
+    "summary_id" INT NOT NULL PRIMARY KEY,
+    "engine" VARCHAR(64),
+    "document_bytes" INT,
+    "document_sentences" INT,
+    "document_terms" INT,
+    "stage_seconds" JSONB NOT NULL,
+    "total_seconds" DOUBLE PRECISION NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+        CREATE INDEX "idx_summarydiagnostics_total_seconds" ON "summarydiagnostics" ("total_seconds");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_summarydiagnostics_total_seconds";
+        DROP TABLE IF EXISTS "summarydiagnostics";"""
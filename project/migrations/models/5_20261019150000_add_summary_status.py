@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "textsummary" ADD "status" VARCHAR(16) NOT NULL  DEFAULT 'completed';
+        UPDATE "textsummary" SET "status" = 'pending' WHERE "summary" = '';
+        UPDATE "textsummary" SET "status" = 'failed' WHERE "summary" LIKE 'Summary generation failed%';
+        ALTER TABLE "textsummary" ALTER COLUMN "status" DROP DEFAULT;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "textsummary" DROP COLUMN "status";"""
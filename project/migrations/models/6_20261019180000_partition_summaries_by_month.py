@@ -0,0 +1,72 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # The primary key of a partitioned table must include the partition key; ids remain unique
+    # since they are all drawn from the same sequence. The monthly partitions cover the existing
+    # summaries up to 3 months ahead, after which the retention job creates them (see
+    # app/retention.py)
+    return """
+        ALTER TABLE "textsummary" RENAME TO "textsummary_unpartitioned";
+        ALTER TABLE "textsummary_unpartitioned" RENAME CONSTRAINT "textsummary_pkey" TO "textsummary_unpartitioned_pkey";
+        ALTER INDEX IF EXISTS "idx_textsummary_source_hash" RENAME TO "idx_textsummary_unpartitioned_source_hash";
+        ALTER SEQUENCE "textsummary_id_seq" OWNED BY NONE;
+        CREATE TABLE "textsummary" (
+    "id" INT NOT NULL  DEFAULT nextval('textsummary_id_seq'),
+    "url" TEXT NOT NULL,
+    "summary" TEXT NOT NULL,
+    "summarization_method" TEXT,
+    "sentence_count" INT,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "source_hash" VARCHAR(64),
+    "status" VARCHAR(16) NOT NULL,
+    PRIMARY KEY ("id", "created_at")
+) PARTITION BY RANGE ("created_at");
+        COMMENT ON TABLE "textsummary" IS 'A data model representing a summarized text of a given URL. ';
+        ALTER SEQUENCE "textsummary_id_seq" OWNED BY "textsummary"."id";
+        CREATE INDEX "idx_textsummary_source_hash" ON "textsummary" ("source_hash");
+        CREATE TABLE "textsummary_default" PARTITION OF "textsummary" DEFAULT;
+        DO $$
+        DECLARE
+            partition_start TIMESTAMP := date_trunc('month', COALESCE(
+                (SELECT min("created_at") FROM "textsummary_unpartitioned"), now()
+            ) AT TIME ZONE 'UTC');
+        BEGIN
+            WHILE partition_start < date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '4 months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF "textsummary" FOR VALUES FROM (%L) TO (%L)',
+                    'textsummary_p' || to_char(partition_start, 'YYYYMM'),
+                    partition_start AT TIME ZONE 'UTC',
+                    (partition_start + INTERVAL '1 month') AT TIME ZONE 'UTC'
+                );
+                partition_start := partition_start + INTERVAL '1 month';
+            END LOOP;
+        END $$;
+        INSERT INTO "textsummary" ("id", "url", "summary", "summarization_method", "sentence_count", "created_at", "source_hash", "status")
+            SELECT "id", "url", "summary", "summarization_method", "sentence_count", "created_at", "source_hash", "status" FROM "textsummary_unpartitioned";
+        DROP TABLE "textsummary_unpartitioned";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    # Archived partitions are detached already and are kept as they are
+    return """
+        ALTER TABLE "textsummary" RENAME TO "textsummary_partitioned";
+        ALTER TABLE "textsummary_partitioned" RENAME CONSTRAINT "textsummary_pkey" TO "textsummary_partitioned_pkey";
+        ALTER INDEX "idx_textsummary_source_hash" RENAME TO "idx_textsummary_partitioned_source_hash";
+        ALTER SEQUENCE "textsummary_id_seq" OWNED BY NONE;
+        CREATE TABLE "textsummary" (
+    "id" INT NOT NULL PRIMARY KEY DEFAULT nextval('textsummary_id_seq'),
+    "url" TEXT NOT NULL,
+    "summary" TEXT NOT NULL,
+    "summarization_method" TEXT,
+    "sentence_count" INT,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "source_hash" VARCHAR(64),
+    "status" VARCHAR(16) NOT NULL
+);
+        COMMENT ON TABLE "textsummary" IS 'A data model representing a summarized text of a given URL. ';
+        ALTER SEQUENCE "textsummary_id_seq" OWNED BY "textsummary"."id";
+        CREATE INDEX "idx_textsummary_source_hash" ON "textsummary" ("source_hash");
+        INSERT INTO "textsummary" ("id", "url", "summary", "summarization_method", "sentence_count", "created_at", "source_hash", "status")
+            SELECT "id", "url", "summary", "summarization_method", "sentence_count", "created_at", "source_hash", "status" FROM "textsummary_partitioned";
+        DROP TABLE "textsummary_partitioned";"""
@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # The index is created on each monthly partition of the table as well
+    return """
+        ALTER TABLE "textsummary" ADD "canonical_url" VARCHAR(2083);
+        CREATE INDEX "idx_textsummary_canonical_url" ON "textsummary" ("canonical_url");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_textsummary_canonical_url";
+        ALTER TABLE "textsummary" DROP COLUMN "canonical_url";"""
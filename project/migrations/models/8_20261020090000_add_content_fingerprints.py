@@ -0,0 +1,25 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "contentfingerprint" (
+    "summary_id" INT NOT NULL PRIMARY KEY,
+    "simhash" BIGINT NOT NULL,
+    "band_0" INT NOT NULL,
+    "band_1" INT NOT NULL,
+    "band_2" INT NOT NULL,
+    "band_3" INT NOT NULL,
+    "summarization_method" VARCHAR(32) NOT NULL,
+    "sentence_count" INT NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+        CREATE INDEX "idx_contentfingerprint_band_0" ON "contentfingerprint" ("band_0");
+        CREATE INDEX "idx_contentfingerprint_band_1" ON "contentfingerprint" ("band_1");
+        CREATE INDEX "idx_contentfingerprint_band_2" ON "contentfingerprint" ("band_2");
+        CREATE INDEX "idx_contentfingerprint_band_3" ON "contentfingerprint" ("band_3");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "contentfingerprint";"""
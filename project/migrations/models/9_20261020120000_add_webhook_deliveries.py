@@ -0,0 +1,24 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "webhookdelivery" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "summary_id" INT NOT NULL,
+    "callback_url" VARCHAR(2083) NOT NULL,
+    "status" VARCHAR(16) NOT NULL  DEFAULT 'waiting',
+    "attempts" INT NOT NULL  DEFAULT 0,
+    "next_attempt_at" TIMESTAMPTZ,
+    "response_status" INT,
+    "last_error" TEXT,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "delivered_at" TIMESTAMPTZ
+);
+        CREATE INDEX "idx_webhookdelivery_summary_id" ON "webhookdelivery" ("summary_id");
+        CREATE INDEX "idx_webhookdelivery_status_next_attempt_at" ON "webhookdelivery" ("status", "next_attempt_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "webhookdelivery";"""
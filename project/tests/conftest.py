@@ -2,10 +2,15 @@ import os
 from typing import Generator
 
 import pytest
+
+# Without an external test database, run the application embedded: an in-memory SQLite database
+# and in-process rate limiting, so that the tests need neither PostgreSQL nor Redis
+if not os.environ.get("DATABASE_TEST_URL"):
+    os.environ.setdefault("EMBEDDED", "true")
 from starlette.testclient import TestClient
 from tortoise.contrib.fastapi import register_tortoise
 
-from app.config import Settings, get_settings
+from app.config import DEFAULT_RATE_LIMIT_POLICIES, Settings, get_settings
 from app.custom_rate_limiter import CustomRateLimiter
 from app.main import create_app
 
@@ -35,8 +40,8 @@ def test_app() -> TestClientGenerator:
     app = create_app()
     app.dependency_overrides[get_settings] = override_get_settings
     # Override all CustomRateLimiter dependencies with no-op for testing
-    app.dependency_overrides[CustomRateLimiter(times=5, seconds=60)] = lambda: True
-    app.dependency_overrides[CustomRateLimiter(times=3, seconds=60)] = lambda: True
+    for route in DEFAULT_RATE_LIMIT_POLICIES:
+        app.dependency_overrides[CustomRateLimiter(route)] = lambda: True
     with TestClient(app) as test_client:
         yield test_client
 
@@ -55,15 +60,17 @@ def test_app_with_db() -> TestClientGenerator:
     app = create_app()
     app.dependency_overrides[get_settings] = override_get_settings
     # Override all CustomRateLimiter dependencies with no-op for testing
-    app.dependency_overrides[CustomRateLimiter(times=5, seconds=60)] = lambda: True
-    app.dependency_overrides[CustomRateLimiter(times=3, seconds=60)] = lambda: True
-    register_tortoise(
-        app,
-        db_url=os.environ.get("DATABASE_TEST_URL"),
-        modules={"models": ["app.models.tortoise_model"]},
-        # True to generate schema immediately
-        generate_schemas=True,
-        add_exception_handlers=True,
-    )
+    for route in DEFAULT_RATE_LIMIT_POLICIES:
+        app.dependency_overrides[CustomRateLimiter(route)] = lambda: True
+    # In embedded mode, the application generates the schema of its own database
+    if os.environ.get("DATABASE_TEST_URL"):
+        register_tortoise(
+            app,
+            db_url=os.environ.get("DATABASE_TEST_URL"),
+            modules={"models": ["app.models.tortoise_model"]},
+            # True to generate schema immediately
+            generate_schemas=True,
+            add_exception_handlers=True,
+        )
     with TestClient(app) as test_client:
         yield test_client
@@ -0,0 +1,139 @@
+import json
+import marshal
+import os
+
+from app.api import summaries
+from app.api.custom_exceptions import (
+    AdminDisabledException,
+    AdminKeyInvalidException,
+    ProfileNotFoundException,
+    ProfilingDisabledException,
+)
+from app.config import Settings, get_settings
+
+# The admin key of the test settings, sent by the requests to the admin endpoints
+ADMIN_KEY = "admin-secret"
+ADMIN_HEADERS = {"X-Admin-Key": ADMIN_KEY}
+
+
+def profiled_settings(**kwargs) -> Settings:
+    """
+    The test settings with an admin key and the given overrides.
+    """
+    kwargs.setdefault("admin_api_key", ADMIN_KEY)
+    return Settings(
+        testing=True, database_url=os.environ.get("DATABASE_TEST_URL", None), **kwargs
+    )  # type: ignore
+
+
+class TestAdmin(object):
+    """
+    Tests for the profiling of summarization jobs and GET /admin/profiles/:id.
+    """
+
+    def test_profile_summary(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that a job requested with the `X-Profile` header is profiled and that its profile can
+        be downloaded, and that the profile is deleted along with the summary.
+        """
+
+        def rank_sentences() -> int:
+            return sum(range(1000))
+
+        async def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ):
+            rank_sentences()
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides, get_settings, lambda: profiled_settings()
+        )
+        payload = json.dumps({"url": "https://example.com/"})
+        unprofiled_id = test_app_with_db.post("/summaries/", data=payload).json()["id"]
+        response = test_app_with_db.get(f"/admin/profiles/{unprofiled_id}/", headers=ADMIN_HEADERS)
+        assert response.status_code == 404
+        assert response.json() == {"detail": ProfileNotFoundException.detail}
+
+        response = test_app_with_db.post("/summaries/", data=payload, headers={"X-Profile": "1"})
+        assert response.status_code == 201
+        summary_id = response.json()["id"]
+
+        response = test_app_with_db.get(f"/admin/profiles/{summary_id}/", headers=ADMIN_HEADERS)
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "application/octet-stream"
+        assert f"summary-{summary_id}.prof" in response.headers["Content-Disposition"]
+        # The profile is in the pstats file format, keyed by (file, line, function)
+        functions = {function for _, _, function in marshal.loads(response.content)}
+        assert {"mock_generate_summary", "rank_sentences"} <= functions
+
+        response = test_app_with_db.get(
+            f"/admin/profiles/{summary_id}/",
+            params={"format": "text", "sort": "tottime"},
+            headers=ADMIN_HEADERS,
+        )
+        assert response.status_code == 200
+        assert "rank_sentences" in response.text
+
+        test_app_with_db.delete(f"/summaries/{summary_id}/")
+        response = test_app_with_db.get(f"/admin/profiles/{summary_id}/", headers=ADMIN_HEADERS)
+        assert response.status_code == 404
+
+    def test_profiling_disabled_in_prod(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that profiling is rejected in production unless it is explicitly enabled.
+        """
+
+        async def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ):
+            return None
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+        overrides = test_app_with_db.app.dependency_overrides
+        monkeypatch.setitem(overrides, get_settings, lambda: profiled_settings(environment="prod"))
+        payload = json.dumps({"url": "https://example.com/"})
+        response = test_app_with_db.post("/summaries/", data=payload, headers={"X-Profile": "1"})
+        assert response.status_code == 403
+        assert response.json() == {"detail": ProfilingDisabledException.detail}
+        response = test_app_with_db.get("/admin/profiles/1/", headers=ADMIN_HEADERS)
+        assert response.status_code == 403
+        # Requests that do not ask for profiling are unaffected
+        assert test_app_with_db.post("/summaries/", data=payload).status_code == 201
+
+        monkeypatch.setitem(
+            overrides,
+            get_settings,
+            lambda: profiled_settings(environment="prod", profiling_enabled=True),
+        )
+        response = test_app_with_db.post("/summaries/", data=payload, headers={"X-Profile": "1"})
+        assert response.status_code == 201
+
+    def test_admin_key(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the admin endpoints require the admin key.
+        """
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides, get_settings, lambda: profiled_settings()
+        )
+        for headers in ({}, {"X-Admin-Key": "wrong"}):
+            response = test_app_with_db.get("/admin/profiles/1/", headers=headers)
+            assert response.status_code == 401
+            assert response.json() == {"detail": AdminKeyInvalidException.detail}
+        response = test_app_with_db.get(f"/admin/profiles/{2**31 - 1}/", headers=ADMIN_HEADERS)
+        assert response.status_code == 404
+
+    def test_admin_key_unset(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the admin endpoints are disabled without an admin key, whatever the request
+        sends, even where profiling is enabled.
+        """
+        settings = profiled_settings(admin_api_key=None)
+        assert settings.profiling_enabled
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides, get_settings, lambda: settings
+        )
+        for headers in ({}, {"X-Admin-Key": ""}, ADMIN_HEADERS):
+            response = test_app_with_db.get("/admin/profiles/1/", headers=headers)
+            assert response.status_code == 403
+            assert response.json() == {"detail": AdminDisabledException.detail}
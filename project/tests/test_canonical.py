@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from app.canonical import canonicalize_url, site
+from app.config import DEFAULT_TRACKING_PARAMS
+from app.deadline import Deadline
+from app.singleflight import SingleFlight
+from app.summarizer import find_canonical_link
+
+
+class TestCanonical(object):
+    """
+    Tests for the canonicalization of URLs, the canonical links of pages, and the single-flight
+    deduplication of concurrent fetches.
+    """
+
+    @pytest.mark.parametrize(
+        "url, expected_url",
+        [
+            ("HTTPS://Example.COM:443/a/", "https://example.com/a"),
+            ("http://example.com:8080/a#section", "http://example.com:8080/a"),
+            ("https://example.com", "https://example.com/"),
+            ("https://example.com//a/./b/../c/", "https://example.com/a/c"),
+            ("https://example.com/caf%c3%a9", "https://example.com/caf%C3%A9"),
+            (
+                "https://example.com/a?utm_source=x&b=2&a=1&fbclid=y",
+                "https://example.com/a?a=1&b=2",
+            ),
+            ("https://example.com/a?UTM_Medium=x&Ref_Src=y", "https://example.com/a"),
+            ("https://example.com/amp/news/a", "https://example.com/news/a"),
+            ("https://example.com/news/a/amp/", "https://example.com/news/a"),
+            ("https://example.com/news/a.amp.html", "https://example.com/news/a.html"),
+            ("https://example.com/a?amp=1&outputType=amp", "https://example.com/a"),
+            ("https://example.com/a?amp=section", "https://example.com/a?amp=section"),
+            ("https://[2001:DB8::1]:443/a", "https://[2001:db8::1]/a"),
+        ],
+    )
+    def test_canonicalize_url(self, url: str, expected_url: str) -> None:
+        """
+        Test that the variants of a URL share its canonical form.
+        """
+        assert canonicalize_url(url, DEFAULT_TRACKING_PARAMS) == expected_url
+        assert canonicalize_url(expected_url, DEFAULT_TRACKING_PARAMS) == expected_url
+
+    def test_canonicalize_url_strip_params(self) -> None:
+        """
+        Test that only the configured tracking parameters are removed.
+        """
+        url = "https://example.com/a?utm_source=x&id=1"
+        assert canonicalize_url(url, []) == "https://example.com/a?id=1&utm_source=x"
+        assert canonicalize_url(url, ["id", "utm_*"]) == "https://example.com/a"
+
+    def test_site(self) -> None:
+        """
+        Test that the mobile and AMP editions of a site belong to the same site.
+        """
+        assert (
+            site("https://amp.example.com/a") == site("https://www.example.com/") == "example.com"
+        )
+        assert site("https://m.example.co.uk/") == "example.co.uk"
+        assert site("https://www.com/") == "www.com"
+        assert site("https://news.example.com/") == "news.example.com"
+
+    @pytest.mark.parametrize(
+        "link, expected_link",
+        [
+            ("https://www.example.com/news/a", "https://www.example.com/news/a"),
+            ("/news/a", "https://amp.example.com/news/a"),
+            ("https://other.example.org/news/a", None),
+            ("javascript:alert(1)", None),
+        ],
+    )
+    def test_find_canonical_link(self, link: str, expected_link: str) -> None:
+        """
+        Test that the canonical link of a page is resolved within its site, and ignored otherwise.
+        """
+        html = (
+            f'<html><head><title>A</title><link rel="Canonical" href=" {link} "></head>'
+            '<body><link rel="canonical" href="https://example.com/body"></body></html>'
+        ).encode()
+        assert find_canonical_link(html, "https://amp.example.com/amp/news/a") == expected_link
+        assert find_canonical_link(b"", "https://example.com/") is None
+
+    def test_single_flight(self) -> None:
+        """
+        Test that concurrent calls with the same key run once and share their result or
+        exception, and that later calls run again.
+        """
+        calls = []
+
+        async def fetch(url: str) -> str:
+            calls.append(url)
+            await asyncio.sleep(0.01)
+            if url.endswith("missing"):
+                raise LookupError(url)
+            return url.upper()
+
+        async def run() -> None:
+            flights = SingleFlight()
+            results = await asyncio.gather(
+                *(flights.do("a", fetch, "https://a") for _ in range(3)),
+                flights.do("b", fetch, "https://b"),
+            )
+            assert results == ["HTTPS://A"] * 3 + ["HTTPS://B"]
+            assert calls == ["https://a", "https://b"]
+
+            results = await asyncio.gather(
+                *(flights.do("c", fetch, "https://missing") for _ in range(2)),
+                return_exceptions=True,
+            )
+            assert all(isinstance(result, LookupError) for result in results)
+            assert await flights.do("a", fetch, "https://a") == "HTTPS://A"
+            assert len(calls) == 4
+
+            # A waiter stops waiting at its timeout, without cancelling the call in flight
+            leader = asyncio.create_task(flights.do("d", fetch, "https://d"))
+            await asyncio.sleep(0)
+            with pytest.raises(asyncio.TimeoutError):
+                await flights.do("d", fetch, "https://d", timeout=0.001)
+            assert await leader == "HTTPS://D"
+
+        asyncio.run(run())
+
+    def test_single_flight_join(self) -> None:
+        """
+        Test that a caller joining a call in flight gets its arguments, e.g., to extend its
+        deadline, and that the call goes on for the other callers once its first caller stops
+        waiting.
+        """
+
+        async def fetch(deadline: Deadline) -> float:
+            await asyncio.sleep(0.05)
+            return deadline.expires_at
+
+        async def run() -> None:
+            flights = SingleFlight()
+            short, long = Deadline(0.01), Deadline(60)
+            first = asyncio.create_task(flights.do("a", fetch, short, timeout=short.remaining()))
+            await asyncio.sleep(0)
+            second = flights.do(
+                "a",
+                fetch,
+                long,
+                timeout=long.remaining(),
+                join=lambda deadline: deadline.extend(long),
+            )
+            results = await asyncio.gather(first, second, return_exceptions=True)
+            assert isinstance(results[0], asyncio.TimeoutError)
+            assert results[1] == long.expires_at == short.expires_at
+
+        asyncio.run(run())
@@ -0,0 +1,164 @@
+import functools
+import json
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from app import summarizer
+from app.api import summaries
+from app.config import Settings
+from app.cost_model import DEFAULT_COST_MODELS, CostModel, choose_method
+from app.deadline import Deadline
+from app.models.pydantic_model import SummarizationMethod
+from app.models.tortoise_model import SummaryDiagnostics
+
+WORDS = (
+    "the river flooded the town and the council met on the bridge while a storm hit the harbor "
+    "of a museum near the station"
+).split()
+
+
+def page(seed: int) -> bytes:
+    """
+    An HTML page of a random English article of plain sentences, the same for the same seed.
+    """
+    generator = random.Random(seed)
+    paragraphs = "".join(
+        "<p>"
+        + " ".join(
+            " ".join(generator.choice(WORDS) for _ in range(12)).capitalize() + "."
+            for _ in range(5)
+        )
+        + "</p>"
+        for _ in range(10)
+    )
+    return f"<html><body><article>{paragraphs}</article></body></html>".encode()
+
+
+class TestCostModel(object):
+    """
+    Tests for the cost models of the summarization methods and the 'auto' method.
+    """
+
+    def test_predict(self) -> None:
+        """
+        Test that the predicted time is the linear combination of the features of the document.
+        """
+        model = CostModel(base_seconds=1, word_seconds=0.5, pair_seconds=0.25, svd_seconds=0.5)
+        # 1 + 0.5 * 4 words + 0.25 * 2 ** 2 sentence pairs + 0.5 * 2 ** 2 * 3 terms
+        assert model.predict(sentences=2, words=4, terms=3) == 10
+
+    def test_choose_method(self) -> None:
+        """
+        Test that the first method within the budget is chosen, or the fastest one if none is.
+        """
+        cost_models = {
+            SummarizationMethod.lex_rank: CostModel(pair_seconds=1),
+            SummarizationMethod.lsa: CostModel(word_seconds=1),
+            SummarizationMethod.centroid: CostModel(base_seconds=5),
+        }
+        methods = list(cost_models)
+        # lex_rank: 9, lsa: 6, centroid: 5
+        assert choose_method(methods, cost_models, 10, 3, 6, 6) == SummarizationMethod.lex_rank
+        assert choose_method(methods, cost_models, 8, 3, 6, 6) == SummarizationMethod.lsa
+        assert choose_method(methods, cost_models, 5, 3, 6, 6) == SummarizationMethod.centroid
+        assert choose_method(methods, cost_models, 1, 3, 6, 6) == SummarizationMethod.centroid
+        assert choose_method(methods[:2], cost_models, 1, 3, 6, 6) == SummarizationMethod.lsa
+
+    @pytest.mark.parametrize(
+        "sentences, words, terms, method",
+        [
+            (80, 1456, 547, SummarizationMethod.lex_rank),
+            (830, 15724, 682, SummarizationMethod.lsa),
+            (8578, 159483, 682, SummarizationMethod.centroid),
+        ],
+    )
+    def test_default_choices(
+        self, sentences: int, words: int, terms: int, method: SummarizationMethod
+    ) -> None:
+        """
+        Test the methods chosen with the default settings for the statistics of the 10kb,
+        100kb, and 1mb pages of the benchmark corpus.
+        """
+        settings = Settings()
+        chosen = choose_method(
+            settings.auto_methods,
+            settings.summary_cost_models,
+            settings.auto_rank_budget_seconds,
+            sentences,
+            words,
+            terms,
+        )
+        assert chosen == method
+
+    def test_settings(self) -> None:
+        """
+        Test that the configured cost models are merged with the default ones, and that 'auto'
+        cannot choose itself.
+        """
+        settings = Settings(summary_cost_models={"lsa": {"base_seconds": 1}})  # type: ignore
+        assert settings.summary_cost_models[SummarizationMethod.lsa] == CostModel(base_seconds=1)
+        lex_rank = settings.summary_cost_models[SummarizationMethod.lex_rank]
+        assert lex_rank == DEFAULT_COST_MODELS[SummarizationMethod.lex_rank]
+        with pytest.raises(ValidationError):
+            Settings(auto_methods=["lsa", "auto"])  # type: ignore
+        with pytest.raises(ValidationError):
+            Settings(auto_methods=[])
+
+    def test_auto_summary(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that a job of the 'auto' method records the method it chose on its summary, and
+        that a reused summary keeps it.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        monkeypatch.setattr(summarizer, "fetch_url", lambda url, deadline: page(0))
+
+        def summarize(url: str, sentence_count: int) -> dict:
+            payload = {"url": url, "summarization_method": "auto", "sentence_count": sentence_count}
+            id = test_app_with_db.post("/summaries/", data=json.dumps(payload)).json()["id"]
+            test_app_with_db.portal.call(
+                functools.partial(
+                    summarizer.generate_summary,
+                    id,
+                    url,
+                    SummarizationMethod.auto,
+                    sentence_count,
+                    deadline=Deadline(60),
+                )
+            )
+            return test_app_with_db.get(f"/summaries/{id}/").json() | {"id": id}
+
+        def engine(id: int) -> str:
+            async def get() -> str:
+                return (await SummaryDiagnostics.get(summary_id=id)).engine
+
+            return test_app_with_db.portal.call(get)
+
+        # A short article fits the budget of the preferred method
+        preferred = summarize("https://example.com/auto", 5)
+        assert preferred["status"] == "completed", preferred["summary"]
+        assert preferred["summarization_method"] == "auto"
+        assert preferred["selected_method"] == "lex_rank"
+        assert engine(preferred["id"]) == "sumy.LexRankSummarizer"
+
+        # A reused summary keeps the method that ranked its sentences
+        payload = {
+            "url": "https://example.com/auto",
+            "summarization_method": "auto",
+            "sentence_count": 5,
+        }
+        reused_id = test_app_with_db.post("/summaries/", data=json.dumps(payload)).json()["id"]
+        reused = test_app_with_db.get(f"/summaries/{reused_id}/").json()
+        assert reused["status"] == "completed" and reused["selected_method"] == "lex_rank"
+
+        # A method predicted to be too slow is passed over
+        settings = Settings(
+            auto_methods=["lsa", "luhn"],  # type: ignore
+            summary_cost_models={"lsa": {"base_seconds": 10}},  # type: ignore
+        )
+        monkeypatch.setattr(summarizer, "get_settings", lambda: settings)
+        fallback = summarize("https://example.com/auto-fallback", 6)
+        assert fallback["status"] == "completed", fallback["summary"]
+        assert fallback["selected_method"] == "luhn"
+        assert len(fallback["summary"].split("\n")) == 6
@@ -0,0 +1,307 @@
+import asyncio
+import os
+import uuid
+from typing import Awaitable, Callable, Dict
+from urllib.parse import quote
+
+import httpx
+import pytest
+import redis.asyncio as redis
+from fastapi import Depends, FastAPI
+from fastapi_limiter import FastAPILimiter
+from pydantic import ValidationError
+from starlette.requests import Request
+
+from app.config import DEFAULT_RATE_LIMIT_POLICIES, Settings
+from app.custom_rate_limiter import (
+    CustomRateLimiter,
+    HybridRateLimitState,
+    MemoryRateLimitState,
+    RateLimitHeadersMiddleware,
+    client_identity,
+    sliding_window_check,
+)
+
+
+def run_with_redis(redis_url: str, test: Callable[[], Awaitable[None]]) -> None:
+    """
+    Run an async test with FastAPILimiter initialized against the given Redis URL.
+    """
+
+    async def main() -> None:
+        connection = redis.from_url(redis_url, encoding="utf8", socket_connect_timeout=1)
+        FastAPILimiter.redis = connection
+        FastAPILimiter.prefix = "test-limiter"
+        try:
+            await test()
+        finally:
+            await connection.aclose()
+            FastAPILimiter.redis = None
+
+    asyncio.run(main())
+
+
+@pytest.fixture(scope="module")
+def redis_url() -> str:
+    """
+    The URL of the Redis instance used by the application, built the same way as in `app.db`.
+    """
+    if not os.getenv("REDIS_ENDPOINT"):
+        pytest.skip("Redis is not configured, e.g., in embedded mode")
+    password = quote(os.getenv("REDIS_PASSWORD", ""), safe="")
+    return f"redis://:{password}@{os.getenv('REDIS_ENDPOINT')}"
+
+
+class TestCustomRateLimiter(object):
+    """
+    Tests for the rate limit policies, the sliding window, and the hybrid local-plus-Redis mode.
+    """
+
+    def test_hashable_and_comparable(self) -> None:
+        """
+        Test that limiters of the same route are interchangeable as dependency override keys.
+        """
+        overrides = {CustomRateLimiter("create_summary"): "override"}
+        assert CustomRateLimiter("create_summary") in overrides
+        assert CustomRateLimiter("read_summary") not in overrides
+
+    def test_policies_merged_with_defaults(self) -> None:
+        """
+        Test that configured route policies are merged with the defaults of the other routes.
+        """
+        settings = Settings(
+            rate_limit_policies={
+                "create_summary": {
+                    "default": {"times": 2, "seconds": 10},
+                    "pro": {"times": 100, "seconds": 10},
+                }
+            }
+        )  # type: ignore
+        assert settings.rate_limit_policies["create_summary"]["pro"].times == 100
+        assert settings.rate_limit_policies["read_summary"] == (
+            DEFAULT_RATE_LIMIT_POLICIES["read_summary"]
+        )
+        # Every route needs a policy for the clients without an API key
+        with pytest.raises(ValidationError):
+            Settings(
+                rate_limit_policies={"create_summary": {"pro": {"times": 100, "seconds": 10}}}
+            )  # type: ignore
+
+    def test_client_identity(self) -> None:
+        """
+        Test that clients with a recognized API key get its tier and others are keyed by the IP
+        address appended to `X-Forwarded-For` by the trusted proxies.
+        """
+        settings = Settings(rate_limit_api_keys={"secret-key": "pro"})  # type: ignore
+
+        def request(headers: dict) -> Request:
+            raw_headers = [
+                (name.lower().encode(), value.encode()) for name, value in headers.items()
+            ]
+            scope = {"type": "http", "headers": raw_headers, "client": ("10.0.0.1", 1234)}
+            return Request(scope)
+
+        tier, client = client_identity(request({"X-API-Key": "secret-key"}), settings)
+        assert tier == "pro"
+        # The raw key is never used as part of a Redis key
+        assert client.startswith("key:") and "secret-key" not in client
+        assert client_identity(request({"X-API-Key": "unknown"}), settings) == (
+            "default",
+            "ip:10.0.0.1",
+        )
+        # The leftmost entries are sent by the client, so rotating them does not change its identity
+        for forwarded in ("10.0.0.2", "1.2.3.4, 10.0.0.2", "5.6.7.8, 1.2.3.4, 10.0.0.2"):
+            assert client_identity(request({"X-Forwarded-For": forwarded}), settings) == (
+                "default",
+                "ip:10.0.0.2",
+            )
+        # Behind two proxies, the client is the address appended by the outer one
+        settings = Settings(trusted_proxy_hops=2)  # type: ignore
+        headers = {"X-Forwarded-For": "5.6.7.8, 1.2.3.4, 10.0.0.2"}
+        assert client_identity(request(headers), settings) == ("default", "ip:1.2.3.4")
+        # A header with fewer entries than proxies did not come through all of them
+        headers = {"X-Forwarded-For": "1.2.3.4"}
+        assert client_identity(request(headers), settings) == ("default", "ip:10.0.0.1")
+        settings = Settings(trusted_proxy_hops=0)  # type: ignore
+        assert client_identity(request(headers), settings) == ("default", "ip:10.0.0.1")
+
+    def test_sliding_window(self, redis_url) -> None:
+        """
+        Test that the sliding window admits up to the limit and reports the remaining hits.
+        """
+
+        async def test() -> None:
+            key = f"key-{uuid.uuid4()}"
+            for remaining in (2, 1, 0):
+                assert await sliding_window_check(key, times=3, milliseconds=60000) == (
+                    remaining,
+                    0,
+                )
+            remaining, retry_after = await sliding_window_check(key, times=3, milliseconds=60000)
+            assert remaining == 0
+            # The hits keep counting after the current window ends, in proportion to their
+            # overlap with the sliding window, so the wait can exceed a window
+            assert 0 < retry_after <= 2 * 60000
+
+        run_with_redis(redis_url, test)
+
+    def test_sliding_window_weights_previous_window(self, redis_url) -> None:
+        """
+        Test that the hits of the previous window count in proportion to their overlap with the
+        sliding window.
+        """
+
+        async def test() -> None:
+            key = f"key-{uuid.uuid4()}"
+            seconds, microseconds = await FastAPILimiter.redis.time()  # type: ignore[union-attr]
+            # A window twice as long as the epoch makes the current window the first one, with
+            # the sliding window overlapping half of the previous window
+            milliseconds = 2 * (seconds * 1000 + microseconds // 1000)
+            await FastAPILimiter.redis.set(f"{key}:-1", 10)  # type: ignore[union-attr]
+            for remaining in (4, 3, 2, 1, 0):
+                assert await sliding_window_check(key, 10, milliseconds) == (remaining, 0)
+            remaining, retry_after = await sliding_window_check(key, 10, milliseconds)
+            assert retry_after > 0
+
+        run_with_redis(redis_url, test)
+
+    def test_memory_sliding_window(self, monkeypatch) -> None:
+        """
+        Test that the in-process limiter of embedded runs counts hits in the same sliding window
+        as the Redis script, and drops the counters of expired windows.
+        """
+        state = MemoryRateLimitState()
+        now = 1_000_000_000_000
+        monkeypatch.setattr("app.custom_rate_limiter.time.time", lambda: now / 1000)
+        for remaining in (2, 1, 0):
+            assert state.check("key", times=3, milliseconds=60000) == (remaining, 0)
+        remaining, retry_after = state.check("key", times=3, milliseconds=60000)
+        assert remaining == 0
+        assert 0 < retry_after <= 2 * 60000
+
+        # Half a window later, the 3 hits of the previous window count as 1.5
+        now += 60000 + 30000 - now % 60000
+        assert state.check("key", times=3, milliseconds=60000) == (0, 0)
+        assert state.check("key", times=3, milliseconds=60000)[1] > 0
+
+        # Both windows have expired
+        now += 3 * 60000
+        assert state.check("other", times=3, milliseconds=60000) == (2, 0)
+        assert all(key.startswith("other:") for key in state.counters)
+
+    def test_embedded_mode(self) -> None:
+        """
+        Test that embedded runs always use the in-process limiter, since they have no Redis.
+        """
+        assert Settings(embedded=False).rate_limiter_mode == "redis"  # type: ignore
+        assert Settings(embedded=True, rate_limiter_mode="hybrid").rate_limiter_mode == (
+            "memory"
+        )  # type: ignore
+
+    def test_rate_limit_headers(self, redis_url) -> None:
+        """
+        Test that the limit headers are returned, including on endpoints returning a Response.
+        """
+        app = FastAPI()
+        app.add_middleware(RateLimitHeadersMiddleware)
+
+        @app.get("/", dependencies=[Depends(CustomRateLimiter("read_summary"))])
+        async def read() -> Dict[str, str]:
+            return {"status": "ok"}
+
+        async def test() -> None:
+            transport = httpx.ASGITransport(app=app)
+            # A unique client address so that the test does not share a window with other runs
+            headers = {"X-Forwarded-For": f"test-{uuid.uuid4()}"}
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for remaining in ("2", "1", "0"):
+                    response = await client.get("/", headers=headers)
+                    assert response.status_code == 200
+                    assert response.headers["X-RateLimit-Limit"] == "3"
+                    assert response.headers["X-RateLimit-Remaining"] == remaining
+                    assert "Retry-After" not in response.headers
+                response = await client.get("/", headers=headers)
+                assert response.status_code == 429
+                assert response.headers["X-RateLimit-Remaining"] == "0"
+                assert 0 < int(response.headers["Retry-After"]) <= 2 * 60
+
+        run_with_redis(redis_url, test)
+
+    def test_hybrid_local_hits_below_threshold(self) -> None:
+        """
+        Test that hits below the sync threshold are allowed without contacting Redis.
+        """
+        state = HybridRateLimitState()
+
+        async def test() -> None:
+            key = f"key-{uuid.uuid4()}"
+            # The first hit of a window consults Redis, which is unreachable
+            with pytest.raises((redis.RedisError, OSError)):
+                await state.check(key, times=10, milliseconds=60000, threshold=0.5)
+            # With a limit of 10 and a threshold of 0.5, the next 3 hits are purely local
+            for _ in range(3):
+                assert await state.check(key, times=10, milliseconds=60000, threshold=0.5) == 0
+            # The fifth hit is close to the limit and needs Redis again
+            with pytest.raises((redis.RedisError, OSError)):
+                await state.check(key, times=10, milliseconds=60000, threshold=0.5)
+            # The failed hits are still counted locally so they are flushed once Redis is back
+            assert state.buckets[key].pending == 5
+            # Unless the limiter fails closed, which rejects them
+            with pytest.raises((redis.RedisError, OSError)):
+                await state.check(key, times=10, milliseconds=60000, threshold=0.5, fail_open=False)
+            assert state.buckets[key].pending == 5
+
+        # Nothing listens on port 1, so any Redis call fails
+        run_with_redis("redis://localhost:1", test)
+
+    def test_hybrid_shared_limit(self, redis_url) -> None:
+        """
+        Test that two processes share the limit through the batched syncs and the near-limit checks.
+        """
+        first, second = HybridRateLimitState(), HybridRateLimitState()
+
+        async def test() -> None:
+            key = f"key-{uuid.uuid4()}"
+            for _ in range(3):
+                assert await first.check(key, times=5, milliseconds=60000, threshold=0.8) == 0
+            # The local hits are only visible to other processes after a sync
+            await first.sync()
+            assert first.buckets[key].synced == 3
+            assert first.buckets[key].pending == 0
+            # The second process reconciles with Redis on its first hit and near the limit
+            assert await second.check(key, times=5, milliseconds=60000, threshold=0.8) == 0
+            assert await second.check(key, times=5, milliseconds=60000, threshold=0.8) == 0
+            # The limit is now reached, which the second process knows without asking Redis
+            assert second.buckets[key].synced == 5
+            assert await second.check(key, times=5, milliseconds=60000, threshold=0.8) > 0
+            # The first process learns about the second process's hits on its next sync
+            await first.sync()
+            assert await first.check(key, times=5, milliseconds=60000, threshold=0.8) > 0
+
+        run_with_redis(redis_url, test)
+
+    def test_hybrid_concurrent_flushes(self, redis_url) -> None:
+        """
+        Test that a sync and a near-limit check in flight at the same time flush each pending
+        hit once.
+        """
+        state = HybridRateLimitState()
+
+        async def test() -> None:
+            key = f"key-{uuid.uuid4()}"
+            # The first hit reconciles with Redis, the next 3 are local
+            for _ in range(4):
+                assert await state.check(key, times=6, milliseconds=60000, threshold=0.8) == 0
+            bucket = state.buckets[key]
+            assert (bucket.synced, bucket.pending) == (1, 3)
+            # The fifth hit is close to the limit and flushes the pending hits as the sync does
+            _, retry_after = await asyncio.gather(
+                state.sync(), state.check(key, times=6, milliseconds=60000, threshold=0.8)
+            )
+            assert retry_after == 0
+            window = next(iter(await FastAPILimiter.redis.keys(f"{key}:*")))
+            assert int(await FastAPILimiter.redis.get(window)) == 5
+            assert (bucket.synced, bucket.in_flight, bucket.pending) == (5, 0, 0)
+            assert await state.check(key, times=6, milliseconds=60000, threshold=0.8) == 0
+
+        run_with_redis(redis_url, test)
@@ -0,0 +1,42 @@
+import pytest
+
+from app import document_store
+
+
+class TestDocumentStore(object):
+    """
+    Tests for the serialization and compression of stored source documents.
+    """
+
+    main_text = [
+        [("Title of the article", ("h1",)), ("First sentence with", None), ("bold", ("b",))],
+        [("A second paragraph that repeats itself. " * 50, None)],
+    ]
+
+    def test_round_trip(self) -> None:
+        """
+        Test that an extracted article survives serialization and compression unchanged.
+        """
+        raw = document_store.serialize_article(self.main_text)
+        compressed = document_store.compress(raw, level=6)
+        assert len(compressed) < len(raw)
+        restored = document_store.deserialize_article(
+            document_store.decompress(compressed, document_store.COMPRESSION)
+        )
+        assert restored == self.main_text
+
+    def test_serialization_is_stable(self) -> None:
+        """
+        Test that identical articles serialize to identical bytes so they deduplicate by hash.
+        """
+        copy = [list(paragraph) for paragraph in self.main_text]
+        assert document_store.serialize_article(copy) == document_store.serialize_article(
+            self.main_text
+        )
+
+    def test_unsupported_compression(self) -> None:
+        """
+        Test that decompressing with an unknown codec raises a ValueError.
+        """
+        with pytest.raises(ValueError):
+            document_store.decompress(b"", "lz4")
@@ -0,0 +1,130 @@
+import json
+import random
+
+from app import summarizer
+from app.api import summaries
+from app.deadline import Deadline
+from app.fingerprint import (
+    MAX_DISTANCE,
+    bands,
+    hamming_distance,
+    simhash,
+    to_signed,
+    to_unsigned,
+)
+from app.models.pydantic_model import SummarizationMethod
+
+WORDS = (
+    "market council river budget station report energy harbor school vote bridge union "
+    "festival museum storm election railway hospital factory court garden tower"
+).split()
+
+
+def article(seed: int, paragraphs: int = 20) -> str:
+    """
+    A random article of plain sentences, the same for the same seed.
+    """
+    generator = random.Random(seed)
+    return "\n".join(
+        " ".join(
+            " ".join(generator.choice(WORDS) for _ in range(12)).capitalize() + "."
+            for _ in range(5)
+        )
+        for _ in range(paragraphs)
+    )
+
+
+def page(text: str, site: str) -> bytes:
+    """
+    An HTML page publishing an article on a site.
+    """
+    paragraphs = "".join(f"<p>{paragraph}</p>" for paragraph in text.split("\n"))
+    return (
+        f"<html><head><title>{site}</title></head><body><article>{paragraphs}"
+        f"<p>Syndicated by {site} news.</p></article></body></html>"
+    ).encode()
+
+
+class TestFingerprint(object):
+    """
+    Tests for the SimHash fingerprints of articles and the reuse of the summaries of
+    near-duplicate articles.
+    """
+
+    def test_simhash(self) -> None:
+        """
+        Test that near-duplicate texts have close fingerprints and that different texts do not.
+        """
+        text = article(1)
+        fingerprint = simhash(text)
+        assert fingerprint is not None and 0 <= fingerprint < 2**64
+        assert simhash(text) == fingerprint
+        # Letter case and punctuation do not matter
+        assert simhash(text.upper().replace(".", "!")) == fingerprint
+        assert hamming_distance(simhash(text + "\nRead more on example.com."), fingerprint) <= 3
+        assert hamming_distance(simhash(article(2)), fingerprint) > 10
+        assert simhash("Too short to be fingerprinted.") is None
+
+    def test_bands(self) -> None:
+        """
+        Test that fingerprints differing in at most `MAX_DISTANCE` bits share a band, and that
+        fingerprints round-trip through their signed representation.
+        """
+        fingerprint = simhash(article(1))
+        generator = random.Random(0)
+        for _ in range(100):
+            flipped = fingerprint
+            for bit in generator.sample(range(64), MAX_DISTANCE):
+                flipped ^= 1 << bit
+            assert set(enumerate(bands(flipped))) & set(enumerate(bands(fingerprint)))
+        for value in (0, 1, 2**63 - 1, 2**63, 2**64 - 1, fingerprint):
+            assert -(2**63) <= to_signed(value) < 2**63
+            assert to_unsigned(to_signed(value)) == value
+
+    def test_near_duplicate_reuse(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the job of a near-duplicate article reuses the completed summary with the same
+        method and sentence count instead of ranking the sentences again.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        text = article(3)
+        pages = {
+            "https://first.example.com/a": page(text, "first.example.com"),
+            "https://second.example.org/b": page(text, "second.example.org"),
+            "https://third.example.net/c": page(text, "third.example.net"),
+        }
+        monkeypatch.setattr(summarizer, "fetch_url", lambda url, deadline: pages[url])
+
+        def summarize(url: str, sentence_count: int) -> dict:
+            payload = {"url": url, "sentence_count": sentence_count}
+            summary_id = test_app_with_db.post("/summaries/", data=json.dumps(payload)).json()["id"]
+            test_app_with_db.portal.call(
+                summarizer.generate_summary,
+                summary_id,
+                url,
+                SummarizationMethod.lsa,
+                sentence_count,
+                None,
+                Deadline(60),
+            )
+            summary = test_app_with_db.get(f"/summaries/{summary_id}/").json()
+            diagnostics = test_app_with_db.get(f"/summaries/{summary_id}/diagnostics/").json()
+            return summary | {"engine": diagnostics["engine"]}
+
+        first = summarize("https://first.example.com/a", 5)
+        assert first["status"] == "completed", first["summary"]
+        assert first["engine"] == "sumy.LsaSummarizer"
+
+        second = summarize("https://second.example.org/b", 5)
+        assert second["engine"] == f"near_duplicate:{first['id']}"
+        assert second["summary"] == first["summary"]
+
+        # Another sentence count is ranked
+        assert summarize("https://second.example.org/b", 6)["engine"] == "sumy.LsaSummarizer"
+
+        # The summaries of deleted or edited summaries are not reused
+        test_app_with_db.delete(f"/summaries/{second['id']}/")
+        payload = {"url": "https://first.example.com/a", "update_summary": "Edited"}
+        response = test_app_with_db.put(f"/summaries/{first['id']}/", data=json.dumps(payload))
+        assert response.status_code == 200
+        assert summarize("https://third.example.net/c", 5)["engine"] == "sumy.LsaSummarizer"
@@ -0,0 +1,136 @@
+import functools
+import json
+import random
+from typing import List, Optional
+
+import pytest
+
+from app import summarizer
+from app.api import summaries
+from app.deadline import Deadline
+from app.languages import (
+    LanguageCache,
+    LanguageResources,
+    detect_language,
+    load_resources,
+)
+from app.models.pydantic_model import Language, SummarizationMethod
+
+TEXTS = {
+    "english": "The council said that the budget of the city was not ready, and it is late.",
+    "french": "Le conseil a dit que le budget de la ville est en retard et pas prêt pour les élus.",
+    "german": "Der Rat sagte, dass der Haushalt der Stadt nicht fertig ist und sich verspätet.",
+    "spanish": "El consejo dijo que el presupuesto de la ciudad no está listo y que se retrasa.",
+    "ukrainian": "Рада сказала, що бюджет міста не готовий, і це від початку було відомо.",
+}
+
+UKRAINIAN_WORDS = (
+    "рада міста бюджет річка станція звіт енергія школа міст вибори лікарня завод суд сад "
+    "вежа музей і та на що не з до це як від але"
+).split()
+
+
+def article(seed: int) -> str:
+    """
+    A random Ukrainian article of plain sentences, the same for the same seed.
+    """
+    generator = random.Random(seed)
+    return "\n".join(
+        " ".join(
+            " ".join(generator.choice(UKRAINIAN_WORDS) for _ in range(10)).capitalize() + "."
+            for _ in range(5)
+        )
+        for _ in range(10)
+    )
+
+
+class TestLanguages(object):
+    """
+    Tests for the detection of the language of the articles and the cache of the NLP resources
+    of the languages.
+    """
+
+    @pytest.mark.parametrize("language", TEXTS)
+    def test_detect_language(self, language: str) -> None:
+        """
+        Test that the language of an article is detected from its function words.
+        """
+        main_text = [[(TEXTS[language], ())]]
+        assert detect_language(main_text, "english") == language
+
+    def test_detect_language_default(self) -> None:
+        """
+        Test that the default language is kept for articles without enough function words.
+        """
+        assert detect_language([], "german") == "german"
+        assert detect_language([[("Quokka 2024, wombat 17!", ())]], "german") == "german"
+
+    def test_cache_bounded(self) -> None:
+        """
+        Test that the resources of a language are loaded once while they are cached, and that
+        the least recently used languages are evicted beyond the size of the cache.
+        """
+        loaded: List[str] = []
+
+        def loader(language: str) -> LanguageResources:
+            loaded.append(language)
+            return load_resources(language)
+
+        cache = LanguageCache(loader)
+        english = cache.get("english", 2)
+        assert english.stemmer("summaries") == "summari" and "the" in english.stop_words
+        ukrainian = cache.get("ukrainian", 2)
+        assert "що" in ukrainian.stop_words
+        assert cache.get("english", 2) is english
+        assert cache.languages == ["ukrainian", "english"] and loaded == ["english", "ukrainian"]
+        # Shrinking the cache evicts the least recently used language
+        assert cache.get("english", 1) is english
+        assert cache.languages == ["english"]
+        assert cache.get("ukrainian", 1) is not ukrainian
+        assert loaded == ["english", "ukrainian", "ukrainian"]
+
+    def test_summary_language(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that a job summarizes an article in its detected language unless the request sets
+        it, and that summaries are only reused for requests of the same language.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        url = "https://uk.example.com/news"
+        html = "".join(f"<p>{paragraph}</p>" for paragraph in article(1).split("\n"))
+        page = f"<html><body><article>{html}</article></body></html>".encode()
+        monkeypatch.setattr(summarizer, "fetch_url", lambda url, deadline: page)
+
+        def summarize(language: Optional[str] = None) -> dict:
+            payload = {"url": url, "sentence_count": 5, "language": language}
+            response = test_app_with_db.post("/summaries/", data=json.dumps(payload)).json()
+            assert response["language"] == language
+            test_app_with_db.portal.call(
+                functools.partial(
+                    summarizer.generate_summary,
+                    response["id"],
+                    url,
+                    SummarizationMethod.lex_rank,
+                    5,
+                    deadline=Deadline(60),
+                    language=Language(language) if language else None,
+                )
+            )
+            summary = test_app_with_db.get(f"/summaries/{response['id']}/").json()
+            diagnostics = test_app_with_db.get(f"/summaries/{response['id']}/diagnostics/")
+            return summary | {"detected": diagnostics.json()["language"]}
+
+        detected = summarize()
+        assert detected["status"] == "completed", detected["summary"]
+        assert detected["language"] is None and detected["detected"] == "ukrainian"
+        assert len(detected["summary"].split("\n")) == 5
+
+        requested = summarize("english")
+        assert requested["status"] == "completed", requested["summary"]
+        assert requested["language"] == requested["detected"] == "english"
+
+        # A request of the same language reuses the latest summary of that language, without a job
+        for language, summary in ((None, detected), ("english", requested)):
+            payload = {"url": url, "sentence_count": 5, "language": language}
+            response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+            reused = test_app_with_db.get(f"/summaries/{response.json()['id']}/").json()
+            assert reused["status"] == "completed" and reused["summary"] == summary["summary"]
@@ -0,0 +1,114 @@
+import json
+
+import nltk
+from prometheus_client import REGISTRY
+
+from app import summarizer
+from app.api import summaries
+from app.deadline import Deadline
+from app.metrics import get_registry
+from app.models.pydantic_model import SummarizationMethod
+
+
+def sample(name: str, **labels: str) -> float:
+    """
+    The current value of a metric sample in the default registry, 0 if it was never recorded.
+    """
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetrics(object):
+    """
+    Tests for the request, pipeline stage, and job metrics exposed at GET /metrics.
+    """
+
+    def test_request_latency_by_route(self, test_app) -> None:
+        """
+        Test that request latency is labelled by route template, with unknown paths grouped.
+        """
+        labels = {"method": "GET", "route": "/summaries/{id}/", "status": "422"}
+        before = sample("http_request_duration_seconds_count", **labels)
+        unmatched = {"method": "GET", "route": "unmatched", "status": "404"}
+        before_unmatched = sample("http_request_duration_seconds_count", **unmatched)
+        test_app.get("/summaries/0/")
+        test_app.get("/no-such-path")
+        assert sample("http_request_duration_seconds_count", **labels) == before + 1
+        assert sample("http_request_duration_seconds_count", **unmatched) == before_unmatched + 1
+
+        response = test_app.get("/metrics")
+        assert response.status_code == 200
+        assert 'route="/summaries/{id}/"' in response.text
+        assert "/no-such-path" not in response.text
+
+    def test_summary_jobs(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that scheduled summarization jobs leave the queue and in-flight gauges once done.
+        """
+        jobs = []
+
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
+            # The job is no longer queued while it runs
+            jobs.append(
+                (sample("summary_jobs_queued", lane="normal"), sample("summary_jobs_in_progress"))
+            )
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+        queued = sample("summary_jobs_queued", lane="normal")
+        in_progress = sample("summary_jobs_in_progress")
+        waits = sample("summary_job_wait_seconds_count", lane="normal")
+
+        response = test_app_with_db.post(
+            "/summaries/", data=json.dumps({"url": "https://yahoo.com/"})
+        )
+        assert response.status_code == 201
+        assert jobs == [(queued, in_progress + 1)]
+        assert sample("summary_jobs_queued", lane="normal") == queued
+        assert sample("summary_jobs_in_progress") == in_progress
+        assert sample("summary_job_wait_seconds_count", lane="normal") == waits + 1
+
+    def test_pipeline_stages(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the stages of the summarization pipeline are timed per method.
+        """
+
+        def mock_fetch_url(url: str, deadline: Deadline) -> bytes:
+            raise OSError("unreachable")
+
+        monkeypatch.setattr(summarizer, "fetch_url", mock_fetch_url)
+        monkeypatch.setattr(nltk.data, "find", lambda resource: resource)
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        response = test_app_with_db.post(
+            "/summaries/", data=json.dumps({"url": "https://example.com/"})
+        )
+        stages = {
+            stage: sample("summary_stage_seconds_count", stage=stage, method="text_rank")
+            for stage in ("fetch", "extract", "db_update")
+        }
+        # Run on the event loop of the application, where the database connection lives
+        test_app_with_db.portal.call(
+            summarizer.generate_summary,
+            response.json()["id"],
+            "https://example.com/",
+            SummarizationMethod.text_rank,
+            5,
+        )
+        after = {
+            stage: sample("summary_stage_seconds_count", stage=stage, method="text_rank")
+            for stage in stages
+        }
+        # The failed fetch is timed, the skipped extraction is not, and the failure is recorded
+        assert after == {
+            "fetch": stages["fetch"] + 1,
+            "extract": stages["extract"],
+            "db_update": stages["db_update"] + 1,
+        }
+
+    def test_multiprocess_registry(self, monkeypatch, tmp_path) -> None:
+        """
+        Test that the metrics are aggregated from the worker files in multiprocess mode.
+        """
+        assert get_registry() is REGISTRY
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        assert get_registry() is not REGISTRY
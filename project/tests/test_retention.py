@@ -0,0 +1,196 @@
+import asyncio
+import importlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from tortoise import connections
+
+from app import retention
+from app.api import summaries
+from app.config import Settings
+from app.db import PRIMARY_CONNECTION
+from app.models.tortoise_model import SourceDocument, SummaryDiagnostics, TextSummary
+from app.retention import (
+    RetentionReport,
+    RetentionScheduler,
+    add_months,
+    list_partitions,
+    month_start,
+    partition_name,
+    run_retention,
+)
+
+migration = importlib.import_module(
+    "migrations.models.6_20261019180000_partition_summaries_by_month"
+)
+# The migrations applied after migration 6, which are reverted while it is applied in the tests
+later_migrations = [
+    importlib.import_module(f"migrations.models.{path.stem}")
+    for path in sorted(
+        Path(migration.__file__).parent.glob("*_*.py"),
+        key=lambda path: int(path.stem.split("_")[0]),
+    )
+    if int(path.stem.split("_")[0]) > 6
+]
+
+
+async def reapply(connection, step: str) -> None:
+    """
+    Apply the upgrade or downgrade of migration 6 to a database at the latest migration,
+    reverting the later migrations before it and reapplying them after it.
+    """
+    for later_migration in reversed(later_migrations):
+        await connection.execute_script(await later_migration.downgrade(connection))
+    await connection.execute_script(await getattr(migration, step)(connection))
+    for later_migration in later_migrations:
+        await connection.execute_script(await later_migration.upgrade(connection))
+
+
+def create_summaries(test_app_with_db, monkeypatch, count: int) -> list:
+    """
+    Create summaries without running their jobs, and return their IDs.
+    """
+
+    def mock_generate_summary(
+        summary_id, url, summarization_method, sentence_count, **kwargs
+    ) -> None:
+        return None
+
+    monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+    payload = json.dumps({"url": "https://example.com/"})
+    return [test_app_with_db.post("/summaries/", data=payload).json()["id"] for _ in range(count)]
+
+
+class TestRetention(object):
+    """
+    Tests for the retention job and the monthly partitions of the summaries table.
+    """
+
+    def test_months(self) -> None:
+        """
+        Test the month arithmetic of the partitions, in UTC.
+        """
+        moment = datetime(2026, 11, 30, 23, 30, tzinfo=timezone(timedelta(hours=-2)))
+        assert month_start(moment) == datetime(2026, 12, 1, tzinfo=timezone.utc)
+        assert add_months(month_start(moment), 1) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+        assert add_months(month_start(moment), -12) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+        assert partition_name(month_start(moment)) == "textsummary_p202612"
+
+    def test_scheduler(self, monkeypatch) -> None:
+        """
+        Test that the scheduler runs the retention job periodically until it is stopped, and that
+        a failed run does not stop it.
+        """
+        runs = []
+
+        async def mock_run_retention(settings: Settings) -> RetentionReport:
+            runs.append(settings)
+            if len(runs) == 1:
+                raise OSError("The database is unreachable")
+            return RetentionReport()
+
+        monkeypatch.setattr(retention, "run_retention", mock_run_retention)
+
+        async def run() -> None:
+            scheduler = RetentionScheduler()
+            await scheduler.start(Settings(retention_interval_seconds=0.01))  # type: ignore
+            await asyncio.sleep(0.1)
+            await scheduler.stop()
+
+        asyncio.run(run())
+        assert len(runs) >= 2
+        count = len(runs)
+        asyncio.run(asyncio.sleep(0.05))
+        assert len(runs) == count
+
+    def test_retention_disabled(self, test_app_with_db) -> None:
+        """
+        Test that nothing is deleted without a configured retention.
+        """
+        report = test_app_with_db.portal.call(run_retention, Settings())
+        assert not (report.expired or report.deleted_summaries or report.deleted_documents)
+
+    def test_delete_expired_summaries(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the expired summaries of an unpartitioned table are deleted in bulk with their
+        diagnostics, and that the expired source documents no longer referenced are deleted.
+        """
+        expired_id, kept_id = create_summaries(test_app_with_db, monkeypatch, 2)
+        now = datetime.now(timezone.utc)
+
+        async def setup() -> None:
+            old = now - timedelta(days=40)
+            await TextSummary.filter(id=expired_id).update(created_at=old, source_hash="a" * 64)
+            for summary_id in (expired_id, kept_id):
+                await SummaryDiagnostics.create(summary_id=summary_id, total_seconds=1.0)
+            for content_hash in ("a" * 64, "b" * 64):
+                await SourceDocument.create(
+                    content_hash=content_hash,
+                    content=b"",
+                    compression="zlib",
+                    raw_size=0,
+                    compressed_size=0,
+                )
+            await SourceDocument.filter(content_hash="a" * 64).update(created_at=old)
+
+        test_app_with_db.portal.call(setup)
+        settings = Settings(summary_retention_days=30)  # type: ignore
+        report = test_app_with_db.portal.call(run_retention, settings)
+        assert report.deleted_summaries >= 1
+        assert report.deleted_documents == 1
+        assert test_app_with_db.get(f"/summaries/{expired_id}/").status_code == 404
+        assert test_app_with_db.get(f"/summaries/{kept_id}/").status_code == 200
+        response = test_app_with_db.get(f"/summaries/{expired_id}/diagnostics/")
+        assert response.status_code == 404
+        assert test_app_with_db.get(f"/summaries/{kept_id}/diagnostics/").status_code == 200
+
+    @pytest.mark.skipif(
+        not os.environ.get("DATABASE_TEST_URL", "").startswith("postgres"),
+        reason="Partitioning requires PostgreSQL",
+    )
+    def test_partitions(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that migration 6 partitions the summaries table by month on PostgreSQL, and that
+        the retention job creates the partitions ahead of time and drops the expired ones.
+        """
+        (expired_id,) = create_summaries(test_app_with_db, monkeypatch, 1)
+        now = datetime.now(timezone.utc)
+        old = now - timedelta(days=100)
+
+        async def partition() -> dict:
+            connection = connections.get(PRIMARY_CONNECTION)
+            await TextSummary.filter(id=expired_id).update(created_at=old)
+            await SummaryDiagnostics.create(summary_id=expired_id, total_seconds=1.0)
+            await reapply(connection, "upgrade")
+            return await list_partitions(connection)
+
+        async def unpartition() -> None:
+            connection = connections.get(PRIMARY_CONNECTION)
+            await reapply(connection, "downgrade")
+
+        partitions = test_app_with_db.portal.call(partition)
+        try:
+            assert partition_name(month_start(old)) in partitions
+            assert partition_name(add_months(month_start(now), 3)) in partitions
+            # The summaries are served from the partitioned table
+            assert test_app_with_db.get(f"/summaries/{expired_id}/").status_code == 200
+
+            settings = Settings(  # type: ignore
+                summary_retention_days=30,
+                summary_retention_mode="drop",
+                summary_partition_premake_months=4,
+            )
+            report = test_app_with_db.portal.call(run_retention, settings)
+            assert report.created == [partition_name(add_months(month_start(now), 4))]
+            assert partition_name(month_start(old)) in report.expired
+            assert partition_name(month_start(now)) not in report.expired
+            assert test_app_with_db.get(f"/summaries/{expired_id}/").status_code == 404
+            response = test_app_with_db.get(f"/summaries/{expired_id}/diagnostics/")
+            assert response.status_code == 404
+            (summary_id,) = create_summaries(test_app_with_db, monkeypatch, 1)
+            assert test_app_with_db.get(f"/summaries/{summary_id}/").status_code == 200
+        finally:
+            test_app_with_db.portal.call(unpartition)
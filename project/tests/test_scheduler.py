@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+from typing import List
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.api import summaries
+from app.config import Settings, get_settings
+from app.scheduler import JobScheduler
+
+WEIGHTS = {"fast": 8.0, "normal": 4.0, "bulk": 1.0}
+
+
+def sample(name: str, **labels: str) -> float:
+    """
+    The current value of a metric sample in the default registry, 0 if it was never recorded.
+    """
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def run_jobs(scheduler: JobScheduler, jobs: List[tuple], concurrency: int) -> List[str]:
+    """
+    Submit jobs of (name, lane, tenant) while the slots are taken, then release the slots and
+    return the names of the jobs in the order they ran.
+    """
+    order = []
+    release = asyncio.Event()
+
+    async def hold() -> None:
+        async with scheduler.run(scheduler.submit("normal", "holder", 4.0), concurrency):
+            await release.wait()
+
+    async def run(name: str, job) -> None:
+        async with scheduler.run(job, concurrency):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    holders = [asyncio.create_task(hold()) for _ in range(concurrency)]
+    await asyncio.sleep(0)
+    tasks = [
+        asyncio.create_task(run(name, scheduler.submit(lane, tenant, WEIGHTS[lane])))
+        for name, lane, tenant in jobs
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*holders, *tasks)
+    return order
+
+
+class TestScheduler(object):
+    """
+    Tests for the weighted fair scheduling of the summarization jobs across tenants and lanes.
+    """
+
+    def test_fair_across_tenants(self) -> None:
+        """
+        Test that the backlog of a tenant does not delay the jobs of the other tenants.
+        """
+        backlog = [(f"a{i}", "normal", "a") for i in range(6)]
+        jobs = backlog + [("b0", "normal", "b"), ("c0", "normal", "c"), ("b1", "normal", "b")]
+        order = asyncio.run(run_jobs(JobScheduler(), jobs, concurrency=1))
+        assert order[:3] == ["a0", "b0", "c0"]
+        assert order.index("b1") < order.index("a2")
+        assert order.index("a5") == len(order) - 1
+
+    def test_lane_weights(self) -> None:
+        """
+        Test that the backlogs of the lanes share the slots in proportion to their weights, and
+        that an interactive job gets ahead of a backlog.
+        """
+        jobs = [(f"bulk{i}", "bulk", "a") for i in range(8)]
+        jobs += [(f"normal{i}", "normal", "a") for i in range(8)]
+        jobs += [("fast", "fast", "b")]
+        order = asyncio.run(run_jobs(JobScheduler(), jobs, concurrency=2))
+        assert order.index("fast") <= 2
+        # The normal lane has 4 times the weight of the bulk lane
+        first = order[:10]
+        assert sum(name.startswith("normal") for name in first) >= 6
+        assert any(name.startswith("bulk") for name in first)
+
+    def test_cancelled_job(self) -> None:
+        """
+        Test that a job cancelled while it waits leaves the queue without taking a slot.
+        """
+
+        async def run() -> None:
+            scheduler = JobScheduler()
+            queued = sample("summary_jobs_queued", lane="bulk")
+            release = asyncio.Event()
+
+            async def hold() -> None:
+                async with scheduler.run(scheduler.submit("normal", "a", 4.0), 1):
+                    await release.wait()
+
+            async def wait() -> None:
+                async with scheduler.run(scheduler.submit("bulk", "b", 1.0), 1):
+                    pytest.fail("The cancelled job ran")
+
+            holder = asyncio.create_task(hold())
+            waiter = asyncio.create_task(wait())
+            await asyncio.sleep(0)
+            assert sample("summary_jobs_queued", lane="bulk") == queued + 1
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert sample("summary_jobs_queued", lane="bulk") == queued
+            release.set()
+            await holder
+            assert scheduler.running == 0
+
+        asyncio.run(run())
+
+    @pytest.mark.parametrize("priority, lane", [("interactive", "fast"), ("bulk", "bulk")])
+    def test_job_priority(self, test_app_with_db, monkeypatch, priority: str, lane: str) -> None:
+        """
+        Test that the priority of a request selects the lane of its job.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        waits = sample("summary_job_wait_seconds_count", lane=lane)
+        payload = {"url": f"https://{priority}.example.com/", "priority": priority}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 201
+        assert response.json()["priority"] == priority
+        assert sample("summary_job_wait_seconds_count", lane=lane) == waits + 1
+
+    def test_linear_time_method_lane(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the jobs of a linear-time method run in the fast lane.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        waits = sample("summary_job_wait_seconds_count", lane="fast")
+        payload = {"url": "https://luhn.example.com/", "summarization_method": "luhn"}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 201
+        assert sample("summary_job_wait_seconds_count", lane="fast") == waits + 1
+
+    def test_admit(self) -> None:
+        """
+        Test that jobs are rejected beyond the maximum number of jobs in flight or the maximum
+        estimated wait, with a Retry-After computed from the measured duration of the jobs, and
+        that an admitted job is counted in flight until it is submitted or its reservation is
+        released.
+        """
+
+        async def run() -> None:
+            scheduler = JobScheduler()
+            assert scheduler.admit(2, 60.0, 1) is None
+            assert scheduler.in_flight == 1
+            async with scheduler.run(scheduler.submit("normal", "a", 4.0, reserved=True), 1):
+                await asyncio.sleep(0.05)
+            assert scheduler.in_flight == 0
+            assert 0.05 <= scheduler.service_seconds < 1
+            scheduler.submit("normal", "a", 4.0)
+            assert scheduler.in_flight == 1
+            assert scheduler.admit(2, 60.0, 1) is None
+            assert scheduler.in_flight == 2
+            assert scheduler.admit(2, 60.0, 1) == ("in_flight", 1)
+            scheduler.submit("normal", "a", 4.0, reserved=True)
+            assert scheduler.in_flight == 2
+            # Each of the 2 jobs ahead takes about 0.05 seconds
+            assert scheduler.estimated_wait(1) == pytest.approx(2 * scheduler.service_seconds)
+            assert scheduler.admit(10, 0.01, 1) == ("queue_wait", 1)
+            assert scheduler.admit(10, 0.01, 4) is None
+            assert scheduler.admit(10, 0, 1) is None
+            assert scheduler.in_flight == 4
+            scheduler.cancel_reservation()
+            scheduler.cancel_reservation()
+            assert scheduler.in_flight == 2
+
+        asyncio.run(run())
+
+    def test_saturated(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that a new job is rejected with a 503 response and a Retry-After header while the
+        process is saturated, without creating its summary.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        scheduler = JobScheduler()
+        monkeypatch.setattr(summaries, "job_scheduler", scheduler)
+        rejected = sample("summary_jobs_rejected_total", reason="in_flight")
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides,
+            get_settings,
+            lambda: Settings(
+                testing=True,
+                database_url=os.environ.get("DATABASE_TEST_URL", None),
+                summary_max_in_flight_jobs=2,
+            ),
+        )
+        for _ in range(2):
+            scheduler.submit("normal", "a", 4.0)
+        payload = {"url": "https://saturated.example.com/"}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        assert sample("summary_jobs_rejected_total", reason="in_flight") == rejected + 1
+        urls = [summary["url"] for summary in test_app_with_db.get("/summaries/").json()]
+        assert payload["url"] not in urls
+
+    def test_saturated_burst(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that a burst of concurrent requests admits no more jobs than the in-flight cap,
+        although the requests await the database between their admission and the submission of
+        their job.
+        """
+        scheduler = JobScheduler()
+        monkeypatch.setattr(summaries, "job_scheduler", scheduler)
+        # The jobs stay queued, so that every admitted job is in flight until the end
+        monkeypatch.setattr(summaries, "run_summary_job", lambda *args, **kwargs: None)
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides,
+            get_settings,
+            lambda: Settings(
+                testing=True,
+                database_url=os.environ.get("DATABASE_TEST_URL", None),
+                summary_max_in_flight_jobs=3,
+            ),
+        )
+
+        async def burst() -> List[int]:
+            transport = httpx.ASGITransport(app=test_app_with_db.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                responses = await asyncio.gather(
+                    *(
+                        client.post("/summaries/", json={"url": f"https://burst.example.com/{i}"})
+                        for i in range(8)
+                    )
+                )
+            return sorted(response.status_code for response in responses)
+
+        assert test_app_with_db.portal.call(burst) == [201] * 3 + [503] * 5
+        assert scheduler.in_flight == 3
+
+    def test_reservation_released(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the slot of an admitted job is released if its request fails before the job
+        is submitted.
+        """
+        scheduler = JobScheduler()
+        monkeypatch.setattr(summaries, "job_scheduler", scheduler)
+
+        async def post(*args, **kwargs) -> int:
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(summaries.crud, "post", post)
+        with pytest.raises(RuntimeError):
+            test_app_with_db.post("/summaries/", data=json.dumps({"url": "https://failed.com/"}))
+        assert scheduler.in_flight == 0
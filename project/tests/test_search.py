@@ -0,0 +1,113 @@
+import importlib
+from typing import List
+
+import pytest
+from tortoise import connections
+
+from app.db import PRIMARY_CONNECTION
+from app.models.tortoise_model import TextSummary
+
+migration = importlib.import_module("migrations.models.10_20261020150000_add_summary_search_vector")
+
+
+def is_postgres() -> bool:
+    """
+    Whether the tests run on PostgreSQL, where the search is ranked.
+    """
+    return connections.get(PRIMARY_CONNECTION).capabilities.dialect == "postgres"
+
+
+def search_ids(test_app_with_db, q: str, limit: int) -> List[List[int]]:
+    """
+    Search for a query page by page, and return the IDs of the results of each page.
+    """
+    pages = []
+    params = {"q": q, "limit": limit}
+    while True:
+        response = test_app_with_db.get("/summaries/search", params=params)
+        assert response.status_code == 200
+        pages.append([summary["id"] for summary in response.json()["results"]])
+        if response.json()["next_cursor"] is None:
+            return pages
+        params["cursor"] = response.json()["next_cursor"]
+
+
+class TestSearch(object):
+    """
+    Tests for the full-text search over the summaries.
+    """
+
+    @pytest.fixture(autouse=True)
+    def search_vector(self, test_app_with_db) -> None:
+        """
+        Add the search vector of migration 10 to a PostgreSQL schema generated from the models.
+        """
+
+        async def upgrade() -> None:
+            connection = connections.get(PRIMARY_CONNECTION)
+            await connection.execute_script(await migration.upgrade(connection))
+
+        if test_app_with_db.portal.call(is_postgres):
+            test_app_with_db.portal.call(upgrade)
+
+    def create(self, test_app_with_db, url: str, summary: str) -> int:
+        """
+        Create a completed summary, and return its ID.
+        """
+
+        async def create() -> int:
+            return (await TextSummary.create(url=url, summary=summary, status="completed")).id
+
+        return test_app_with_db.portal.call(create)
+
+    def test_search_pages(self, test_app_with_db) -> None:
+        """
+        Test that the pages of the results cover every matching summary once.
+        """
+        ids = [
+            self.create(
+                test_app_with_db,
+                f"https://example.com/{index}",
+                f"The quokkas of island {index} were counted again this year.",
+            )
+            for index in range(5)
+        ]
+        self.create(test_app_with_db, "https://example.com/other", "Nothing to see here.")
+        pages = search_ids(test_app_with_db, "quokkas", 2)
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert sorted(id for page in pages for id in page) == ids
+        # Every word must match
+        assert search_ids(test_app_with_db, "quokkas island 3", 10) == [[ids[3]]]
+        assert search_ids(test_app_with_db, "quokkas wombats", 10) == [[]]
+
+    def test_search_rank(self, test_app_with_db) -> None:
+        """
+        Test that the summaries matching in their text rank before those matching in their URL
+        only, on PostgreSQL.
+        """
+        if not test_app_with_db.portal.call(is_postgres):
+            pytest.skip("The search is only ranked on PostgreSQL")
+        url_match = self.create(test_app_with_db, "https://pangolin.example.com/", "A story.")
+        text_match = self.create(
+            test_app_with_db, "https://example.com/a", "Pangolins are the most trafficked mammals."
+        )
+        assert search_ids(test_app_with_db, "pangolin", 10) == [[text_match, url_match]]
+        assert search_ids(test_app_with_db, "pangolins -trafficked", 10) == [[url_match]]
+
+    @pytest.mark.parametrize(
+        "params, status_code",
+        [
+            ({}, 422),
+            ({"q": ""}, 422),
+            ({"q": "quokkas", "limit": 0}, 422),
+            ({"q": "quokkas", "limit": 101}, 422),
+            ({"q": "quokkas", "cursor": "not-a-cursor"}, 400),
+            ({"q": "quokkas", "cursor": "WyJhIiwgMV0"}, 400),
+        ],
+    )
+    def test_search_invalid(self, test_app_with_db, params: dict, status_code: int) -> None:
+        """
+        Test that invalid queries, limits, and cursors are rejected.
+        """
+        response = test_app_with_db.get("/summaries/search", params=params)
+        assert response.status_code == status_code
@@ -1,10 +1,23 @@
+import asyncio
+import functools
 import json
+import os
+import time
 from sys import maxsize
 
+import nltk
 import pytest
 
+from app import summarizer
 from app.api import summaries
-from app.api.custom_exceptions import SummaryNotFoundException
+from app.api.custom_exceptions import (
+    DiagnosticsNotFoundException,
+    SummaryNotFoundException,
+)
+from app.config import Settings, get_settings
+from app.deadline import Deadline
+from app.models.pydantic_model import MAX_DEADLINE_SECONDS, SummarizationMethod
+from app.models.tortoise_model import TextSummary
 
 
 class TestSummary(object):
@@ -48,7 +61,9 @@ class TestSummary(object):
         """
 
         # Monkeypatch the generate summary function
-        def mock_generate_summary(summary_id, url, summarization_method, sentence_count) -> None:
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
             return None
 
         monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
@@ -128,9 +143,11 @@ class TestSummary(object):
                         {
                             "type": "enum",
                             "loc": ["body", "summarization_method"],
-                            "msg": "Input should be 'lsa', 'lex_rank', 'text_rank' or 'edmundson'",
+                            "msg": "Input should be 'lsa', 'lex_rank', 'text_rank', 'edmundson', 'centroid', 'sum_basic', 'luhn' or 'auto'",
                             "input": "invalid_summarizer",
-                            "ctx": {"expected": "'lsa', 'lex_rank', 'text_rank' or 'edmundson'"},
+                            "ctx": {
+                                "expected": "'lsa', 'lex_rank', 'text_rank', 'edmundson', 'centroid', 'sum_basic', 'luhn' or 'auto'"
+                            },
                         }
                     ]
                 },
@@ -187,7 +204,9 @@ class TestSummary(object):
         """
 
         # Monkeypatch the generate summary function
-        def mock_generate_summary(summary_id, url, summarization_method, sentence_count) -> None:
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
             return None
 
         monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
@@ -213,6 +232,7 @@ class TestSummary(object):
         assert response_data["sentence_count"] == payload["sentence_count"]
         # The created_at fields should exist (and summary is an empty string initially)
         assert response_data["created_at"]
+        assert response_data["status"] == "pending"
 
     @pytest.mark.parametrize(
         "id, expected_status_code, expected_response",
@@ -258,7 +278,9 @@ class TestSummary(object):
         """
 
         # Monkeypatch the generate summary function
-        def mock_generate_summary(summary_id, url, summarization_method, sentence_count) -> None:
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
             return None
 
         monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
@@ -281,13 +303,97 @@ class TestSummary(object):
         # Ensure that the newly created text summary is among the list of text summaries
         assert (len(list(filter(lambda summary_schema: summary_schema["id"] == summary_id, response_list))) == 1)  # fmt: skip
 
+    def test_read_summaries_by_ids(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test for read_all_summaries with a list of ids on the happy path.
+        """
+
+        # Monkeypatch the generate summary function
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
+            return None
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+
+        summary_ids = [
+            test_app_with_db.post(
+                "/summaries/", data=json.dumps({"url": f"https://example.com/{i}/"})
+            ).json()["id"]
+            for i in range(3)
+        ]
+
+        # Query two of the summaries along with a non-existent id (the largest 32-bit integer)
+        response = test_app_with_db.get(
+            "/summaries/", params={"ids": [summary_ids[2], summary_ids[0], 2**31 - 1]}
+        )
+        assert response.status_code == 200
+        response_list = response.json()
+        # Non-existent ids are omitted and the rows are ordered by id
+        assert [summary["id"] for summary in response_list] == [summary_ids[0], summary_ids[2]]
+        assert response_list[0]["url"] == "https://example.com/0/"
+
+    def test_remove_summaries(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test for remove_summaries on the happy path.
+        """
+
+        # Monkeypatch the generate summary function
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
+            return None
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+
+        summary_ids = [
+            test_app_with_db.post(
+                "/summaries/", data=json.dumps({"url": f"https://example.org/{i}/"})
+            ).json()["id"]
+            for i in range(2)
+        ]
+
+        response = test_app_with_db.post(
+            "/summaries/delete", data=json.dumps({"ids": summary_ids + [2**31 - 1]})
+        )
+        assert response.status_code == 200
+        # The deleted rows are returned
+        assert [summary["id"] for summary in response.json()] == summary_ids
+        # The rows no longer exist
+        for summary_id in summary_ids:
+            assert test_app_with_db.get(f"/summaries/{summary_id}/").status_code == 404
+
+    @pytest.mark.parametrize(
+        "payload, expected_error_type",
+        [
+            # At least one id is required
+            ({"ids": []}, "too_short"),
+            # Ids must be positive
+            ({"ids": [0]}, "greater_than"),
+            # At most 100 ids are allowed
+            ({"ids": list(range(1, 102))}, "too_long"),
+        ],
+        scope="function",
+    )
+    def test_remove_summaries_invalid_request(
+        self, test_app_with_db, payload, expected_error_type
+    ) -> None:
+        """
+        Test for remove_summaries with invalid request payloads.
+        """
+        response = test_app_with_db.post("/summaries/delete", data=json.dumps(payload))
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["type"] == expected_error_type
+
     def test_remove_summary(self, test_app_with_db, monkeypatch) -> None:
         """
         Test for remove_summary on the happy path.
         """
 
         # Monkeypatch the generate summary function
-        def mock_generate_summary(summary_id, url, summarization_method, sentence_count) -> None:
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
             return None
 
         monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
@@ -351,13 +457,312 @@ class TestSummary(object):
         assert response.status_code == expected_status_code
         assert response.json() == expected_response
 
+    def test_resummarize_summary(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test for resummarize_summary on the happy path.
+        """
+        generated = []
+
+        # Monkeypatch the generate summary function to record the arguments of each job
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, source_hash=None, **kwargs
+        ) -> None:
+            generated.append((summary_id, url, source_hash))
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+
+        payload = {"url": "https://www.djangoproject.com/"}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        summary_id = response.json()["id"]
+
+        response = test_app_with_db.post(
+            f"/summaries/{summary_id}/resummarize/",
+            data=json.dumps({"summarization_method": "text_rank", "sentence_count": 8}),
+        )
+        assert response.status_code == 201
+        response_data = response.json()
+        # A new record is created for the same url with the new summarization options
+        assert response_data["id"] != summary_id
+        assert response_data["url"] == payload["url"]
+        assert response_data["summarization_method"] == "text_rank"
+        assert response_data["sentence_count"] == 8
+        assert generated[-1] == (response_data["id"], payload["url"], None)
+
+    def test_resummarize_summary_invalid_id(self, test_app_with_db) -> None:
+        """
+        Test for resummarize_summary when a non-existent id is passed.
+        """
+        response = test_app_with_db.post(f"/summaries/{maxsize}/resummarize/", data=json.dumps({}))
+        assert response.status_code == 404
+        assert response.json() == {"detail": SummaryNotFoundException.detail}
+
+    def test_create_summary_reuse(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that a new summary of a variant of a recently summarized url reuses its completed
+        summary without running a job, or its stored source document with other options.
+        """
+        generated = []
+
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
+            generated.append((summary_id, kwargs["source_hash"], kwargs["canonical_url"]))
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+        canonical_url = "https://reuse.example.com/news/a?id=7"
+        payload = {"url": "https://reuse.example.com/news/a/?id=7&utm_source=feed#top"}
+        summary_id = test_app_with_db.post("/summaries/", data=json.dumps(payload)).json()["id"]
+        assert generated == [(summary_id, None, canonical_url)]
+        assert test_app_with_db.get(f"/summaries/{summary_id}/").json()["canonical_url"] == (
+            canonical_url
+        )
+        test_app_with_db.portal.call(
+            functools.partial(
+                TextSummary.filter(id=summary_id).update,
+                summary="Cached summary",
+                source_hash="c" * 64,
+                status="completed",
+            )
+        )
+
+        payload = {"url": "HTTPS://Reuse.example.com/amp/news/a?fbclid=x&id=7"}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 201
+        assert len(generated) == 1
+        reused = test_app_with_db.get(f"/summaries/{response.json()['id']}/").json()
+        assert reused["summary"] == "Cached summary"
+        assert reused["status"] == "completed"
+
+        payload["sentence_count"] = 8
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert generated[-1] == (response.json()["id"], "c" * 64, canonical_url)
+
+        # Reuse is disabled with a zero TTL
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides,
+            get_settings,
+            lambda: Settings(  # type: ignore
+                testing=True,
+                database_url=os.environ.get("DATABASE_TEST_URL", None),
+                summary_cache_ttl_seconds=0,
+            ),
+        )
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert generated[-1] == (response.json()["id"], None, canonical_url)
+
+    def test_canonical_link_not_reused(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the canonical link declared by a fetched page is recorded apart from the
+        canonical URL of its summary, so that a page of a shared host cannot have its summary
+        reused for another author's page of the host.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        victim_url = "https://shared.example.com/@victim/post"
+        attacker_url = "https://shared.example.com/@attacker/post"
+        sentences = " ".join(
+            f"The council of town number {i} met on the bridge to discuss the flood."
+            for i in range(20)
+        )
+        html = (
+            f'<html><head><link rel="canonical" href="{victim_url}"></head>'
+            f"<body><article><p>{sentences}</p></article></body></html>"
+        ).encode()
+        monkeypatch.setattr(summarizer, "fetch_url", lambda url, deadline: html)
+        payload = {"url": attacker_url, "summarization_method": "luhn", "sentence_count": 5}
+        summary_id = test_app_with_db.post("/summaries/", data=json.dumps(payload)).json()["id"]
+        test_app_with_db.portal.call(
+            functools.partial(
+                summarizer.generate_summary,
+                summary_id,
+                attacker_url,
+                SummarizationMethod.luhn,
+                5,
+                deadline=Deadline(60),
+                canonical_url=attacker_url,
+            )
+        )
+        summary = test_app_with_db.get(f"/summaries/{summary_id}/").json()
+        assert summary["status"] == "completed", summary["summary"]
+        assert summary["canonical_url"] == attacker_url
+        assert summary["canonical_link"] == victim_url
+
+        payload["url"] = victim_url
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        victim = test_app_with_db.get(f"/summaries/{response.json()['id']}/").json()
+        assert victim["status"] == "pending" and victim["canonical_url"] == victim_url
+
+    def test_shared_fetch_deadlines(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that concurrent jobs for the same article fetch it once, within the latest of
+        their deadlines, while each job waits within its own deadline and records its own wait
+        as its fetch stage.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        url = "https://shared-fetch.example.com/"
+        sentences = " ".join(f"The ferry number {i} crossed the river at dawn." for i in range(20))
+        fetches = []
+
+        def mock_fetch_url(url: str, deadline: Deadline) -> bytes:
+            fetches.append(url)
+            time.sleep(0.2)
+            deadline.check()
+            return f"<html><body><article><p>{sentences}</p></article></body></html>".encode()
+
+        monkeypatch.setattr(summarizer, "fetch_url", mock_fetch_url)
+        payload = {"url": url, "summarization_method": "luhn", "sentence_count": 5}
+        ids = [
+            test_app_with_db.post("/summaries/", data=json.dumps(payload)).json()["id"]
+            for _ in range(2)
+        ]
+
+        async def run() -> None:
+            await asyncio.gather(
+                *(
+                    summarizer.generate_summary(
+                        id,
+                        url,
+                        SummarizationMethod.luhn,
+                        5,
+                        deadline=Deadline(seconds),
+                        canonical_url=url,
+                    )
+                    for id, seconds in zip(ids, (0.05, 30))
+                )
+            )
+
+        test_app_with_db.portal.call(run)
+        assert fetches == [url]
+        short, long = (test_app_with_db.get(f"/summaries/{id}/").json() for id in ids)
+        assert short["status"] == "timed_out" and "fetch stage" in short["summary"]
+        assert long["status"] == "completed", long["summary"]
+        short, long = (test_app_with_db.get(f"/summaries/{id}/diagnostics/").json() for id in ids)
+        assert short["stage_seconds"]["fetch"] < 0.2 <= long["stage_seconds"]["fetch"]
+
+    def test_read_summary_diagnostics(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test for read_summary_diagnostics once a summarization job has completed, and that the
+        diagnostics are deleted along with the summary.
+        """
+
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
+            return None
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+        response = test_app_with_db.post(
+            "/summaries/", data=json.dumps({"url": "https://example.com/"})
+        )
+        summary_id = response.json()["id"]
+        # No diagnostics are recorded until the job completes
+        response = test_app_with_db.get(f"/summaries/{summary_id}/diagnostics/")
+        assert response.status_code == 404
+        assert response.json() == {"detail": DiagnosticsNotFoundException.detail}
+
+        # Run a job that fails to fetch the article, on the event loop of the application
+        def mock_fetch_url(url: str, deadline: Deadline) -> bytes:
+            raise OSError("unreachable")
+
+        monkeypatch.setattr(summarizer, "fetch_url", mock_fetch_url)
+        monkeypatch.setattr(nltk.data, "find", lambda resource: resource)
+        test_app_with_db.portal.call(
+            summarizer.generate_summary,
+            summary_id,
+            "https://example.com/",
+            SummarizationMethod.lsa,
+            10,
+        )
+
+        assert test_app_with_db.get(f"/summaries/{summary_id}/").json()["status"] == "failed"
+        response = test_app_with_db.get(f"/summaries/{summary_id}/diagnostics/")
+        assert response.status_code == 200
+        diagnostics = response.json()
+        assert diagnostics["summary_id"] == summary_id
+        # The job stopped at the fetch, so the later stages and statistics are missing
+        assert set(diagnostics["stage_seconds"]) == {"fetch", "db_update"}
+        assert diagnostics["engine"] is None
+        assert diagnostics["document_bytes"] is None
+        assert diagnostics["total_seconds"] >= sum(diagnostics["stage_seconds"].values())
+        assert diagnostics["created_at"]
+
+        test_app_with_db.delete(f"/summaries/{summary_id}/")
+        response = test_app_with_db.get(f"/summaries/{summary_id}/diagnostics/")
+        assert response.status_code == 404
+
+    def test_summary_deadline(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the deadline of a request is passed to its job, and that a job whose deadline
+        passes is stopped at its next checkpoint and marked as timed out.
+        """
+        deadlines = []
+
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, deadline=None, **kwargs
+        ) -> None:
+            deadlines.append(deadline)
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+        payload = {"url": "https://example.com/", "deadline_seconds": 5}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 201
+        assert response.json()["deadline_seconds"] == 5
+        summary_id = response.json()["id"]
+        assert deadlines[0].seconds == 5
+        for deadline_seconds in (0, MAX_DEADLINE_SECONDS + 1):
+            payload = {"url": "https://example.com/", "deadline_seconds": deadline_seconds}
+            response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+            assert response.status_code == 422
+
+        # Run the job against an origin that is still sending the page when the deadline passes
+        def mock_fetch_url(url: str, deadline: Deadline) -> bytes:
+            deadline.expires_at = time.monotonic()
+            deadline.check()
+            return b""
+
+        monkeypatch.setattr(summarizer, "fetch_url", mock_fetch_url)
+        monkeypatch.setattr(nltk.data, "find", lambda resource: resource)
+        test_app_with_db.portal.call(
+            functools.partial(summarizer.generate_summary, deadline=deadlines[0]),
+            summary_id,
+            "https://example.com/",
+            SummarizationMethod.lsa,
+            10,
+        )
+        response = test_app_with_db.get(f"/summaries/{summary_id}/").json()
+        assert response["status"] == "timed_out"
+        assert response["summary"].startswith(
+            "Summary generation timed out during the fetch stage after 5s"
+        )
+        # The job is not started once its deadline has passed in the queue
+        test_app_with_db.portal.call(
+            functools.partial(summarizer.generate_summary, deadline=Deadline(0)),
+            summary_id,
+            "https://example.com/",
+            SummarizationMethod.lsa,
+            10,
+        )
+        response = test_app_with_db.get(f"/summaries/{summary_id}/").json()
+        assert response["summary"].startswith("Summary generation timed out during the queued")
+
+    def test_read_summary_diagnostics_invalid_id(self, test_app_with_db) -> None:
+        """
+        Test for read_summary_diagnostics when a non-existent or invalid id is passed.
+        """
+        response = test_app_with_db.get(f"/summaries/{2**31 - 1}/diagnostics/")
+        assert response.status_code == 404
+        assert response.json() == {"detail": DiagnosticsNotFoundException.detail}
+        response = test_app_with_db.get("/summaries/0/diagnostics/")
+        assert response.status_code == 422
+
     def test_update_summary(self, test_app_with_db, monkeypatch) -> None:
         """
         Test for update_summary on the happy path.
         """
 
         # Monkeypatch the generate summary function
-        def mock_generate_summary(summary_id, url, summarization_method, sentence_count) -> None:
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
             return None
 
         monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
@@ -6,7 +6,10 @@ from typing import Dict, List, Union
 import pytest
 
 from app.api import crud, summaries
-from app.api.custom_exceptions import SummaryNotFoundException
+from app.api.custom_exceptions import (
+    DiagnosticsNotFoundException,
+    SummaryNotFoundException,
+)
 from app.models import pydantic_model
 
 
@@ -22,13 +25,21 @@ class TestSummaryUnit(object):
         """
 
         # Monkeypatch the generate summary function
-        def mock_generate_summary(summary_id, url, summarization_method, sentence_count) -> None:
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, **kwargs
+        ) -> None:
             return None
 
         monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
 
-        # Monkeypatch the crud function
-        async def mock_post(payload: pydantic_model.SummaryPayloadSchema) -> int:
+        # Monkeypatch the crud functions
+        async def mock_find_reusable(canonical_url: str, *args) -> Dict:
+            assert canonical_url == "https://google.com/"
+            return {"summary": None, "source_hash": None, "selected_method": None}
+
+        monkeypatch.setattr(crud, "find_reusable", mock_find_reusable)
+
+        async def mock_post(payload: pydantic_model.SummaryPayloadSchema, **kwargs) -> int:
             return 1
 
         monkeypatch.setattr(crud, "post", mock_post)
@@ -38,7 +49,13 @@ class TestSummaryUnit(object):
             "summarization_method": "lsa",
             "sentence_count": 5,
         }
-        expected_response = {"id": 1} | test_request_payload
+        expected_response = {
+            "id": 1,
+            "deadline_seconds": 120.0,
+            "priority": "normal",
+            "callback_url": None,
+            "language": None,
+        } | test_request_payload
         # This should be a SummaryResponseSchema instance
         response = test_app.post("/summaries/", data=json.dumps(test_request_payload))
 
@@ -110,9 +127,11 @@ class TestSummaryUnit(object):
                         {
                             "type": "enum",
                             "loc": ["body", "summarization_method"],
-                            "msg": "Input should be 'lsa', 'lex_rank', 'text_rank' or 'edmundson'",
+                            "msg": "Input should be 'lsa', 'lex_rank', 'text_rank', 'edmundson', 'centroid', 'sum_basic', 'luhn' or 'auto'",
                             "input": "invalid_summarizer",
-                            "ctx": {"expected": "'lsa', 'lex_rank', 'text_rank' or 'edmundson'"},
+                            "ctx": {
+                                "expected": "'lsa', 'lex_rank', 'text_rank', 'edmundson', 'centroid', 'sum_basic', 'luhn' or 'auto'"
+                            },
                         }
                     ]
                 },
@@ -283,6 +302,63 @@ class TestSummaryUnit(object):
         assert response.status_code == 200
         assert response.json() == test_summaries
 
+    def test_read_summaries_by_ids_unit(self, test_app, monkeypatch) -> None:
+        """
+        Test for read_all_summaries with a list of ids on the happy path.
+        """
+        test_summaries = [
+            {
+                "id": id,
+                "url": "https://google.com/",
+                "summary": "google",
+                "summarization_method": "lsa",
+                "sentence_count": 7,
+                "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            }
+            for id in (4, 9)
+        ]
+
+        async def mock_get_many(ids: List[int]) -> List[Dict]:
+            assert ids == [9, 4]
+            return test_summaries
+
+        monkeypatch.setattr(crud, "get_many", mock_get_many)
+
+        response = test_app.get("/summaries/?ids=9&ids=4")
+        assert response.status_code == 200
+        assert response.json() == test_summaries
+
+    def test_read_summaries_by_ids_invalid_unit(self, test_app) -> None:
+        """
+        Test for read_all_summaries with non-positive ids.
+        """
+        response = test_app.get("/summaries/?ids=1&ids=0")
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["query", "ids", 1]
+
+    def test_remove_summaries_unit(self, test_app, monkeypatch) -> None:
+        """
+        Test for remove_summaries on the happy path.
+        """
+        test_record = {
+            "id": 3,
+            "url": "https://www.python.org/",
+            "summary": "python programming",
+            "summarization_method": "lex_rank",
+            "sentence_count": 10,
+            "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+
+        # Only one of the two ids exists
+        async def mock_delete_many(ids: List[int]) -> List[Dict]:
+            return [test_record]
+
+        monkeypatch.setattr(crud, "delete_many", mock_delete_many)
+
+        response = test_app.post("/summaries/delete", data=json.dumps({"ids": [3, 5]}))
+        assert response.status_code == 200
+        assert response.json() == [test_record]
+
     def test_remove_summary_unit(self, test_app, monkeypatch) -> None:
         """
         Test for remove_summary on the happy path.
@@ -293,6 +369,11 @@ class TestSummaryUnit(object):
             "summary": "python programming",
             "summarization_method": "lex_rank",
             "sentence_count": 10,
+            "status": "completed",
+            "canonical_url": "https://www.python.org/",
+            "canonical_link": None,
+            "language": None,
+            "selected_method": "lex_rank",
             "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
         }
 
@@ -358,6 +439,110 @@ class TestSummaryUnit(object):
         assert response.status_code == expected_status_code
         assert response.json() == expected_response
 
+    def test_resummarize_summary_unit(self, test_app, monkeypatch) -> None:
+        """
+        Test for resummarize_summary on the happy path, reusing the stored source document.
+        """
+        generated = []
+
+        def mock_generate_summary(
+            summary_id, url, summarization_method, sentence_count, source_hash=None, **kwargs
+        ) -> None:
+            generated.append((summary_id, source_hash))
+
+        monkeypatch.setattr(summaries, "generate_summary", mock_generate_summary)
+
+        async def mock_get_source(id: int) -> Dict:
+            return {
+                "url": "https://google.com/",
+                "source_hash": "a" * 64,
+                "canonical_url": "https://google.com/",
+            }
+
+        monkeypatch.setattr(crud, "get_source", mock_get_source)
+
+        async def mock_post(
+            payload: pydantic_model.SummaryPayloadSchema,
+            source_hash: Union[str, None] = None,
+            canonical_url: Union[str, None] = None,
+        ) -> int:
+            assert source_hash == "a" * 64
+            assert canonical_url == "https://google.com/"
+            return 2
+
+        monkeypatch.setattr(crud, "post", mock_post)
+
+        async def mock_get_document_size(source_hash: str) -> int:
+            return 1 << 20
+
+        monkeypatch.setattr(crud, "get_document_size", mock_get_document_size)
+
+        response = test_app.post(
+            "/summaries/1/resummarize/",
+            data=json.dumps({"summarization_method": "edmundson", "sentence_count": 6}),
+        )
+        assert response.status_code == 201
+        assert response.json() == {
+            "id": 2,
+            "url": "https://google.com/",
+            "summarization_method": "edmundson",
+            "sentence_count": 6,
+            "deadline_seconds": 120.0,
+            "priority": "normal",
+            "callback_url": None,
+            "language": None,
+        }
+        assert generated == [(2, "a" * 64)]
+
+    def test_resummarize_summary_invalid_id_unit(self, test_app, monkeypatch) -> None:
+        """
+        Test for resummarize_summary when a non-existent id is passed.
+        """
+
+        async def mock_get_source(id: int) -> None:
+            return None
+
+        monkeypatch.setattr(crud, "get_source", mock_get_source)
+        response = test_app.post(f"/summaries/{maxsize}/resummarize/", data=json.dumps({}))
+        assert response.status_code == SummaryNotFoundException.status_code
+        assert response.json() == {"detail": SummaryNotFoundException.detail}
+
+    def test_read_summary_diagnostics_unit(self, test_app, monkeypatch) -> None:
+        """
+        Test for read_summary_diagnostics on the happy path.
+        """
+        test_diagnostics = {
+            "summary_id": 1,
+            "engine": "sumy.LsaSummarizer",
+            "document_bytes": 20480,
+            "document_sentences": 120,
+            "document_terms": 950,
+            "stage_seconds": {"fetch": 0.5, "extract": 0.1, "tokenize": 0.05, "rank": 0.2},
+            "total_seconds": 0.9,
+            "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+
+        async def mock_get_diagnostics(id: int) -> Dict:
+            return test_diagnostics
+
+        monkeypatch.setattr(crud, "get_diagnostics", mock_get_diagnostics)
+        response = test_app.get("/summaries/1/diagnostics/")
+        assert response.status_code == 200
+        assert response.json() == test_diagnostics
+
+    def test_read_summary_diagnostics_invalid_id_unit(self, test_app, monkeypatch) -> None:
+        """
+        Test for read_summary_diagnostics when no diagnostics are recorded for the id.
+        """
+
+        async def mock_get_diagnostics(id: int) -> None:
+            return None
+
+        monkeypatch.setattr(crud, "get_diagnostics", mock_get_diagnostics)
+        response = test_app.get(f"/summaries/{maxsize}/diagnostics/")
+        assert response.status_code == DiagnosticsNotFoundException.status_code
+        assert response.json() == {"detail": DiagnosticsNotFoundException.detail}
+
     def test_update_summary_unit(self, test_app, monkeypatch) -> None:
         """
         Test for update_summary on the happy path.
@@ -376,6 +561,11 @@ class TestSummaryUnit(object):
             ],  # New summary from update payload request body,
             "summarization_method": "lsa",
             "sentence_count": 12,
+            "status": "completed",
+            "canonical_url": None,
+            "canonical_link": None,
+            "language": None,
+            "selected_method": None,
             "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
         }
 
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+
+import pytest
+from sumy.summarizers._summarizer import AbstractSummarizer
+
+from app.deadline import Deadline, DeadlineExceeded
+from app.models.pydantic_model import SummarizationMethod
+from app.summarizer import create_summarizer, load_summarizer_class, summarizers
+
+
+class TestSummarizer(object):
+    """
+    Tests for the lazy loading of the summarization stack.
+    """
+
+    def test_app_does_not_import_summarization_stack(self) -> None:
+        """
+        Test that importing the application does not import sumy, nltk, or numpy, which are only
+        imported by the first summarization job (or preloaded by the gunicorn master).
+        """
+        script = (
+            "import sys; import app.main; "
+            "print(sorted(m for m in ('sumy', 'nltk', 'numpy') if m in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+        assert output.stdout.strip() == "[]"
+
+    def test_load_summarizer_class(self) -> None:
+        """
+        Test that every summarization method but 'auto' resolves to its sumy summarizer class.
+        """
+        methods = {method.value for method in SummarizationMethod}
+        assert set(summarizers) == methods - {SummarizationMethod.auto.value}
+        for summarizer_name, path in summarizers.items():
+            summarizer_class = load_summarizer_class(summarizer_name)
+            assert issubclass(summarizer_class, AbstractSummarizer)
+            assert f"{summarizer_class.__module__}.{summarizer_class.__name__}" == path
+
+    def test_create_summarizer_deadline(self) -> None:
+        """
+        Test that the summarizers check the deadline of the job for every stemmed word and, for the
+        graph-based summarizers, for every pair of sentences.
+        """
+        deadline = Deadline(60)
+        summarizer = create_summarizer("lex_rank", None, deadline)  # type: ignore
+        assert summarizer.stem_word("Summaries") == "summari"
+        deadline.enter("rank")
+        deadline.expires_at = 0
+        with pytest.raises(DeadlineExceeded) as error:
+            summarizer.stem_word("Summaries")
+        assert error.value.stage == "rank"
+        with pytest.raises(DeadlineExceeded):
+            summarizer.cosine_similarity([], [], {}, {}, {})
+        # Without a deadline, the summarizer is unchanged
+        assert "cosine_similarity" not in vars(create_summarizer("lex_rank", None))  # type: ignore
@@ -0,0 +1,133 @@
+import random
+
+import pytest
+from sumy.nlp.stemmers import Stemmer
+from sumy.nlp.tokenizers import Tokenizer
+from sumy.parsers.plaintext import PlaintextParser
+from sumy.summarizers.luhn import LuhnSummarizer as SumyLuhnSummarizer
+from sumy.utils import get_stop_words
+
+from app.deadline import Deadline, DeadlineExceeded
+from app.models.pydantic_model import LINEAR_TIME_METHODS
+from app.summarizer import create_summarizer
+from app.vector_summarizers import (
+    CentroidSummarizer,
+    LuhnSummarizer,
+    SumBasicSummarizer,
+    VectorSummarizer,
+)
+
+WORDS = (
+    "the river flooded the town and the council met on the bridge while a storm hit the harbor "
+    "of a museum near the station"
+).split()
+
+
+def parse(text: str):
+    """
+    The sumy document of a plain text in English.
+    """
+    return PlaintextParser.from_string(text, Tokenizer("english")).document
+
+
+def summarize(summarizer_class, text: str, sentences_count: int) -> list:
+    """
+    The sentences of the summary of a plain text in English.
+    """
+    summarizer = summarizer_class(Stemmer("english"))
+    summarizer.stop_words = get_stop_words("english")
+    return [str(sentence) for sentence in summarizer(parse(text), sentences_count)]
+
+
+class TestVectorSummarizers(object):
+    """
+    Tests for the linear-time summarizers over a sparse sentence-term matrix.
+    """
+
+    def test_luhn_matches_sumy(self) -> None:
+        """
+        Test that the vectorized Luhn summarizer picks the same sentences as sumy's.
+        """
+        generator = random.Random(0)
+        text = " ".join(
+            " ".join(generator.choice(WORDS) for _ in range(generator.randint(4, 20))).capitalize()
+            + "."
+            for _ in range(60)
+        )
+        document = parse(text)
+        reference = SumyLuhnSummarizer(Stemmer("english"))
+        reference.stop_words = get_stop_words("english")
+        for sentences_count in (1, 5, 10):
+            expected = [str(sentence) for sentence in reference(document, sentences_count)]
+            assert summarize(LuhnSummarizer, text, sentences_count) == expected
+
+    def test_centroid(self) -> None:
+        """
+        Test that the sentences closest to the central topics of the document rank first.
+        """
+        text = (
+            "The river flooded the town. "
+            "Pandas eat bamboo in the mountains. "
+            "The town council met after the river flooded. "
+            "Rescuers left the flooded town by the river. "
+            "The flooded river closed the town bridge."
+        )
+        summary = summarize(CentroidSummarizer, text, 3)
+        assert len(summary) == 3 and "Pandas eat bamboo in the mountains." not in summary
+        # The sentences keep the order of the document
+        assert summary == sorted(summary, key=text.index)
+
+    def test_sum_basic_redundancy(self) -> None:
+        """
+        Test that SumBasic does not pick a sentence whose terms are already covered.
+        """
+        text = (
+            "The river flooded the river town. "
+            "The river flooded the river town. "
+            "The council met on the bridge. "
+            "A storm hit the harbor."
+        )
+        summary = summarize(SumBasicSummarizer, text, 2)
+        assert summary == ["The river flooded the river town.", "The council met on the bridge."]
+
+    @pytest.mark.parametrize(
+        "summarizer_class", [CentroidSummarizer, SumBasicSummarizer, LuhnSummarizer]
+    )
+    def test_degenerate_documents(self, summarizer_class) -> None:
+        """
+        Test that empty documents and documents of stop words only are summarized.
+        """
+        assert summarize(summarizer_class, "", 3) == []
+        assert summarize(summarizer_class, "It is what it is. And so on.", 3) == [
+            "It is what it is.",
+            "And so on.",
+        ]
+        assert summarize(summarizer_class, "A single sentence about rivers.", 10) == [
+            "A single sentence about rivers."
+        ]
+
+    def test_rate_sentences_abstract(self) -> None:
+        """
+        Test that a summarizer without `rate_sentences` cannot be created.
+        """
+
+        class UnratedSummarizer(VectorSummarizer):
+            pass
+
+        with pytest.raises(TypeError):
+            UnratedSummarizer(Stemmer("english"))
+
+    @pytest.mark.parametrize("method", sorted(method.value for method in LINEAR_TIME_METHODS))
+    def test_deadline(self, method: str) -> None:
+        """
+        Test that the linear-time summarizers check the deadline of the job for the stemmed
+        words.
+        """
+        document = parse("The river flooded the town. The council met on the bridge.")
+        deadline = Deadline(60)
+        summarizer = create_summarizer(method, None, deadline)  # type: ignore
+        assert len(summarizer(document, 1)) == 1
+        deadline.enter("rank")
+        deadline.expires_at = 0
+        with pytest.raises(DeadlineExceeded):
+            summarizer(document, 1)
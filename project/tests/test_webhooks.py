@@ -0,0 +1,376 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import socket
+from typing import Callable, Dict, Iterator, List
+
+import httpx
+import pytest
+
+from app import webhooks
+from app.api import summaries
+from app.config import Settings, get_settings
+from app.models.pydantic_model import DeliveryStatus
+from app.models.tortoise_model import WebhookDelivery
+from app.webhooks import (
+    ID_HEADER,
+    SIGNATURE_HEADER,
+    TIMESTAMP_HEADER,
+    backoff,
+    deliver_due,
+    delivery_transport,
+    sign,
+    webhook_dispatcher,
+)
+
+SECRET = "webhook-secret"
+# The addresses of the host names of the tests, resolved by `resolve`
+PUBLIC_ADDRESS = "93.184.215.14"
+ADDRESSES = {
+    "hooks.example.com": [PUBLIC_ADDRESS, "2606:2800:21f:cb07:6820:80da:af6b:8b2c"],
+    "internal.example.com": ["10.0.0.5"],
+    "localhost.example.com": ["127.0.0.1"],
+    "mixed.example.com": [PUBLIC_ADDRESS, "fe80::1%eth0"],
+}
+
+
+def webhook_settings(**kwargs) -> Settings:
+    """
+    The test settings, with a webhook secret and retries without backoff.
+    """
+    return Settings(
+        testing=True,
+        database_url=os.environ.get("DATABASE_TEST_URL", None),
+        webhook_secret=SECRET,
+        webhook_backoff_seconds=0,
+        **kwargs,
+    )
+
+
+def get_delivery(test_app_with_db, summary_id: int) -> WebhookDelivery:
+    """
+    The delivery of a summary.
+    """
+    return test_app_with_db.portal.call(
+        functools.partial(WebhookDelivery.get, summary_id=summary_id)
+    )
+
+
+def recorder(statuses: List[int], requests: List[httpx.Request]) -> httpx.MockTransport:
+    """
+    A transport that records the requests and responds with the given statuses in turn.
+    """
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(statuses[min(len(requests), len(statuses)) - 1])
+
+    return httpx.MockTransport(handler)
+
+
+class Receiver(object):
+    """
+    An HTTP server on a local port, in the event loop of the application, which records the
+    requests it receives and responds to them with a 200.
+    """
+
+    def __init__(self, test_app_with_db) -> None:
+        self.requests: List[bytes] = []
+        self._portal = test_app_with_db.portal
+        self._server = self._portal.call(
+            functools.partial(asyncio.start_server, self._handle, "127.0.0.1", 0)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = re.search(rb"content-length: *(\d+)", head, re.IGNORECASE)
+        body = await reader.readexactly(int(length.group(1)) if length else 0)
+        self.requests.append(head + body)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    def close(self) -> None:
+        async def close() -> None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        self._portal.call(close)
+
+
+class TestWebhooks(object):
+    """
+    Tests for the delivery of the summaries to the callback URLs of their requests.
+    """
+
+    @pytest.fixture(autouse=True)
+    def no_dispatcher(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Stop the dispatcher of the application, so that the tests attempt the deliveries.
+        """
+        monkeypatch.setattr(summaries, "generate_summary", lambda *args, **kwargs: None)
+        test_app_with_db.portal.call(webhook_dispatcher.stop)
+
+    @pytest.fixture(autouse=True)
+    def addresses(self, monkeypatch) -> Dict[str, List[str]]:
+        """
+        Resolve the host names of the tests from `ADDRESSES` instead of the DNS; the returned
+        mapping can be changed by a test.
+        """
+        addresses = {host: list(resolved) for host, resolved in ADDRESSES.items()}
+
+        async def resolve(host: str) -> List[str]:
+            if host not in addresses:
+                raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+            return addresses[host]
+
+        monkeypatch.setattr(webhooks, "resolve", resolve)
+        return addresses
+
+    @pytest.fixture
+    def receiver(self, test_app_with_db) -> Iterator[Receiver]:
+        """
+        A local HTTP server receiving the deliveries.
+        """
+        receiver = Receiver(test_app_with_db)
+        yield receiver
+        receiver.close()
+
+    def create_summary(self, test_app_with_db, callback_url: str) -> int:
+        """
+        Create a summary with a callback URL, and end its job.
+        """
+        payload = {"url": "https://example.com/article", "callback_url": callback_url}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 201
+        assert response.json()["callback_url"] == callback_url
+        summary_id = response.json()["id"]
+        delivery = get_delivery(test_app_with_db, summary_id)
+        assert delivery.status == DeliveryStatus.waiting
+        test_app_with_db.portal.call(webhooks.schedule, summary_id)
+        return summary_id
+
+    def deliver(
+        self, test_app_with_db, transport: httpx.AsyncBaseTransport, settings: Settings
+    ) -> Callable[[], int]:
+        """
+        A function attempting the due deliveries with a client of the transport.
+        """
+
+        async def run() -> int:
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await deliver_due(client, settings)
+
+        return lambda: test_app_with_db.portal.call(run)
+
+    def test_sign(self) -> None:
+        """
+        Test that the signature covers the timestamp and the body.
+        """
+        signature = sign(SECRET, 1700000000, b'{"id": 1}')
+        assert signature.startswith("sha256=") and len(signature) == 7 + 64
+        assert sign(SECRET, 1700000000, b'{"id": 1}') == signature
+        assert sign(SECRET, 1700000001, b'{"id": 1}') != signature
+        assert sign(SECRET, 1700000000, b'{"id": 2}') != signature
+        assert sign("other", 1700000000, b'{"id": 1}') != signature
+
+    def test_backoff(self) -> None:
+        """
+        Test that the delay between the attempts doubles up to the maximum.
+        """
+        settings = Settings(webhook_backoff_seconds=2, webhook_max_backoff_seconds=30)
+        assert [backoff(attempts, settings) for attempts in range(1, 7)] == [2, 4, 8, 16, 30, 30]
+
+    def test_retried_delivery(self, test_app_with_db) -> None:
+        """
+        Test that a delivery is retried after a server error, with the same ID and a valid
+        signature, until it is delivered.
+        """
+        summary_id = self.create_summary(test_app_with_db, "https://hooks.example.com/retried")
+        requests: List[httpx.Request] = []
+        deliver = self.deliver(test_app_with_db, recorder([503, 200], requests), webhook_settings())
+        assert deliver() == 1
+        delivery = get_delivery(test_app_with_db, summary_id)
+        assert delivery.status == DeliveryStatus.pending
+        assert delivery.attempts == 1 and delivery.response_status == 503
+        assert deliver() == 1
+        delivery = get_delivery(test_app_with_db, summary_id)
+        assert delivery.status == DeliveryStatus.delivered
+        assert delivery.attempts == 2 and delivery.delivered_at is not None
+        assert deliver() == 0
+
+        assert len(requests) == 2
+        for request in requests:
+            assert str(request.url) == "https://hooks.example.com/retried"
+            assert request.headers[ID_HEADER] == str(delivery.id)
+            timestamp = int(request.headers[TIMESTAMP_HEADER])
+            assert request.headers[SIGNATURE_HEADER] == sign(SECRET, timestamp, request.content)
+            body = json.loads(request.content)
+            assert body["id"] == summary_id and body["url"] == "https://example.com/article"
+
+    @pytest.mark.parametrize("statuses, attempts", [([404], 1), ([500, 502, 503], 3)])
+    def test_failed_delivery(self, test_app_with_db, statuses: List[int], attempts: int) -> None:
+        """
+        Test that a delivery fails at once if the endpoint rejects it, and otherwise once its
+        attempts are exhausted.
+        """
+        summary_id = self.create_summary(test_app_with_db, "https://hooks.example.com/failed")
+        requests: List[httpx.Request] = []
+        settings = webhook_settings(webhook_max_attempts=3)
+        deliver = self.deliver(test_app_with_db, recorder(statuses, requests), settings)
+        while deliver():
+            pass
+        delivery = get_delivery(test_app_with_db, summary_id)
+        assert delivery.status == DeliveryStatus.failed
+        assert delivery.attempts == attempts == len(requests)
+        assert delivery.response_status == statuses[-1]
+
+    def test_leased_batch(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that the deliveries of a batch waiting for a slot are not claimed yet, so that
+        their lease does not run out before their attempt and another process polling in the
+        meantime does not attempt them twice.
+        """
+        monkeypatch.setattr(webhooks, "LEASE_MARGIN_SECONDS", 0)
+        summary_ids = [
+            self.create_summary(test_app_with_db, f"https://hooks.example.com/leased/{i}")
+            for i in range(3)
+        ]
+        requests: List[httpx.Request] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            await asyncio.sleep(0.2)
+            return httpx.Response(200)
+
+        # Each attempt takes 0.2 seconds of a lease of 0.3 seconds, one at a time
+        settings = webhook_settings(webhook_max_concurrency=1, webhook_timeout_seconds=0.3)
+
+        async def run() -> None:
+            async def poll_later(client: httpx.AsyncClient) -> int:
+                await asyncio.sleep(0.35)
+                return await deliver_due(client, settings)
+
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                await asyncio.gather(deliver_due(client, settings), poll_later(client))
+
+        test_app_with_db.portal.call(run)
+        ids = sorted(request.headers[ID_HEADER] for request in requests)
+        deliveries = [get_delivery(test_app_with_db, summary_id) for summary_id in summary_ids]
+        assert ids == sorted(str(delivery.id) for delivery in deliveries)
+        for delivery in deliveries:
+            assert delivery.status == DeliveryStatus.delivered and delivery.attempts == 1
+
+    def test_dispatcher(self, test_app_with_db) -> None:
+        """
+        Test that the dispatcher delivers a summary as soon as its job ends, and that the
+        delivery is deleted with its summary.
+        """
+        requests: List[httpx.Request] = []
+        test_app_with_db.portal.call(
+            webhook_dispatcher.start, webhook_settings(), recorder([200], requests)
+        )
+        summary_id = self.create_summary(test_app_with_db, "https://hooks.example.com/dispatched")
+
+        async def delivered() -> None:
+            while (await WebhookDelivery.get(summary_id=summary_id)).status != "delivered":
+                await asyncio.sleep(0.01)
+
+        test_app_with_db.portal.call(asyncio.wait_for, delivered(), 5)
+        assert len(requests) == 1
+
+        test_app_with_db.delete(f"/summaries/{summary_id}/")
+        assert not test_app_with_db.portal.call(
+            WebhookDelivery.filter(summary_id=summary_id).exists
+        )
+
+    @pytest.mark.parametrize(
+        "callback_url",
+        [
+            "http://127.0.0.1:8004/summaries/",
+            "http://[::1]/hook",
+            "http://169.254.169.254/latest/meta-data/",
+            "https://93.184.215.14/hook",
+            "https://internal.example.com/hook",
+            "https://localhost.example.com/hook",
+            "https://mixed.example.com/hook",
+            "https://unresolved.example.com/hook",
+        ],
+    )
+    def test_forbidden_callback_url(self, test_app_with_db, callback_url: str) -> None:
+        """
+        Test that a callback URL whose host is an IP address, or resolves to a loopback,
+        private, or link-local address, or does not resolve, is rejected with a 422 response,
+        without creating its summary.
+        """
+        payload = {"url": "https://example.com/forbidden", "callback_url": callback_url}
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 422
+        urls = [summary["url"] for summary in test_app_with_db.get("/summaries/").json()]
+        assert payload["url"] not in urls
+
+    def test_allowed_hosts(self, test_app_with_db, monkeypatch) -> None:
+        """
+        Test that only the allowed hosts are accepted if they are set, and delivered to wherever
+        they resolve.
+        """
+        settings = webhook_settings(webhook_allowed_hosts=["Internal.example.com"])
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides, get_settings, lambda: settings
+        )
+        summary_id = self.create_summary(test_app_with_db, "https://internal.example.com/hook")
+        requests: List[httpx.Request] = []
+        assert self.deliver(test_app_with_db, recorder([200], requests), settings)() == 1
+        assert get_delivery(test_app_with_db, summary_id).status == DeliveryStatus.delivered
+        assert len(requests) == 1
+        payload = {
+            "url": "https://example.com/article",
+            "callback_url": "https://hooks.example.com/",
+        }
+        response = test_app_with_db.post("/summaries/", data=json.dumps(payload))
+        assert response.status_code == 422
+        assert "not an allowed callback host" in response.json()["detail"]
+
+    def test_rebound_callback_url(self, test_app_with_db, addresses, receiver) -> None:
+        """
+        Test that a delivery fails without connecting if the host of its callback URL resolves
+        to an internal address by the time of the attempt, and is retried if it does not
+        resolve.
+        """
+        callback_url = f"http://hooks.example.com:{receiver.port}/rebound"
+        summary_id = self.create_summary(test_app_with_db, callback_url)
+        settings = webhook_settings()
+        deliver = self.deliver(test_app_with_db, delivery_transport(settings), settings)
+        del addresses["hooks.example.com"]
+        assert deliver() == 1
+        delivery = get_delivery(test_app_with_db, summary_id)
+        assert delivery.status == DeliveryStatus.pending and delivery.attempts == 1
+        addresses["hooks.example.com"] = ["127.0.0.1"]
+        assert deliver() == 1
+        delivery = get_delivery(test_app_with_db, summary_id)
+        assert delivery.status == DeliveryStatus.failed and delivery.attempts == 2
+        assert "internal address 127.0.0.1" in delivery.last_error
+        assert receiver.requests == []
+
+    def test_checked_connection(self, test_app_with_db, addresses, receiver, monkeypatch) -> None:
+        """
+        Test that a delivery connects to the address its host resolved to when checked, keeping
+        the host name in the Host header.
+        """
+        # A host name known to the resolver of the tests only
+        addresses["hooks.internal"] = ["127.0.0.1"]
+        settings = webhook_settings(webhook_allowed_hosts=["hooks.internal"])
+        monkeypatch.setitem(
+            test_app_with_db.app.dependency_overrides, get_settings, lambda: settings
+        )
+        callback_url = f"http://hooks.internal:{receiver.port}/hook"
+        summary_id = self.create_summary(test_app_with_db, callback_url)
+        assert self.deliver(test_app_with_db, delivery_transport(settings), settings)() == 1
+        delivery = get_delivery(test_app_with_db, summary_id)
+        assert delivery.status == DeliveryStatus.delivered, delivery.last_error
+        [request] = receiver.requests
+        assert request.startswith(b"POST /hook HTTP/1.1\r\n")
+        assert f"host: hooks.internal:{receiver.port}\r\n".encode() in request.lower()